@@ -3,6 +3,7 @@ from pathlib import Path
 import re
 import subprocess
 import sys
+import time
 
 sys.path.insert(
     0, str((Path(__file__).resolve().parents[1] / 'test')))
@@ -40,18 +41,18 @@ def run_wasm(code, cls):
     return runtime
 
 
-def run_all(hostpython, code):
-    a = run_native(hostpython, code)
-    print("native:", a)
+def run_all(hostpython, code, native=True):
+    result = {}
+    if native:
+        a = run_native(hostpython, code)
+        print("native:", a)
+        result['native'] = a
     b = run_wasm(code, conftest.FirefoxWrapper)
     print("firefox:", b)
     c = run_wasm(code, conftest.ChromeWrapper)
     print("chrome:", c)
-    result = {
-        'native': a,
-        'firefox': b,
-        'chrome': c
-    }
+    result['firefox'] = b
+    result['chrome'] = c
     return result
 
 
@@ -91,6 +92,113 @@ def get_numpy_benchmarks():
         yield name, content
 
 
+PYTHON2JS_BENCHMARKS = {
+    'python2js_list_float': 'data = [float(i) for i in range(100000)]',
+    'python2js_list_int': 'data = list(range(100000))',
+    'python2js_list_str': 'data = [str(i) for i in range(100000)]',
+    'python2js_records': (
+        "data = [{'x': i, 'y': float(i), 'name': str(i)} "
+        "for i in range(10000)]"),
+    'python2js_nested': (
+        'data = [[[float(i)] * 10 for i in range(100)] for j in range(100)]'),
+}
+
+
+def get_python2js_benchmarks():
+    # These time the Python to Javascript conversion of `data`, which happens
+    # when it is passed as an argument to a Javascript function. They only
+    # make sense in the browser, so there is no native timing.
+    for name, setup in PYTHON2JS_BENCHMARKS.items():
+        yield name, (
+            setup + "\n"
+            "from js import Array\n"
+            "from timeit import Timer\n"
+            "t = Timer(lambda: Array.isArray(data))\n"
+            "r = t.repeat(11, 1)\n"
+            "print(sum(r) / len(r))\n")
+
+
+PARALLEL_WORKERS = (1, 2, 4)
+PARALLEL_RUNS = 8
+
+
+def get_parallel_benchmarks(workers):
+    # These run each numpy benchmark PARALLEL_RUNS times with a
+    # pyodide.WorkerPoolExecutor of the given number of workers, and time
+    # them on the main thread, to show how they scale with more workers. The
+    # first call in each worker loads it, and isn't timed.
+    root = Path('../numpy-benchmarks/benchmarks')
+    for filename in root.iterdir():
+        name = filename.name
+        if name in SKIP:
+            continue
+        content = parse_numpy_benchmark(filename)
+        content += (
+            "def bench(i):\n"
+            "    ns = {{}}\n"
+            "    exec(setup + '\\nfrom __main__ import {}', ns)\n"
+            "    exec(run, ns)\n".format(name))
+        yield name, (
+            "setup_code = {!r}\n"
+            "exec(setup_code)\n"
+            "import time\n"
+            "import pyodide\n"
+            "executor = pyodide.WorkerPoolExecutor(\n"
+            "    {workers}, url='webworker_dev.js', setup=setup_code,\n"
+            "    packages=['numpy'])\n"
+            "async def main():\n"
+            "    await executor.map_async(bench, range({workers}))\n"
+            "    start = time.perf_counter()\n"
+            "    await executor.map_async(bench, range({runs}))\n"
+            "    print(time.perf_counter() - start)\n"
+            "    executor.shutdown()\n"
+            "pyodide.run_async(main())\n".format(
+                content, workers=workers, runs=PARALLEL_RUNS))
+
+
+def run_wasm_parallel(code, cls, timeout=600):
+    s = cls()
+    try:
+        s.load_package('numpy')
+        s.run_js(
+            "window.done = false;\n"
+            "let script = document.createElement('script');\n"
+            "script.src = 'webworker_client.js';\n"
+            "script.onload = () => { window.done = true; };\n"
+            "document.head.appendChild(script);\n")
+        s.wait_until_packages_loaded()
+        s.run(code)
+        # The runtime is printed once all the calls are done
+        end = time.time() + timeout
+        while True:
+            try:
+                runtime = float(s.logs[-1])
+                break
+            except (IndexError, ValueError):
+                if time.time() > end:
+                    print('\n'.join(s.logs))
+                    raise
+                time.sleep(1)
+    finally:
+        s.driver.quit()
+    return runtime
+
+
+def run_all_parallel(name):
+    result = {}
+    for browser, cls in [('firefox', conftest.FirefoxWrapper),
+                         ('chrome', conftest.ChromeWrapper)]:
+        for workers in PARALLEL_WORKERS:
+            code = dict(get_parallel_benchmarks(workers))[name]
+            a = run_wasm_parallel(code, cls)
+            print(f"{browser}, {workers} workers:", a)
+            result[f'{browser}_{workers}'] = a
+        for workers in PARALLEL_WORKERS[1:]:
+            speedup = result[f'{browser}_1'] / result[f'{browser}_{workers}']
+            print(f"{browser}, {workers} workers speedup:", speedup)
+    return result
+
+
 def get_benchmarks():
     yield from get_pystone_benchmarks()
     yield from get_numpy_benchmarks()
@@ -101,6 +209,12 @@ def main(hostpython):
     for k, v in get_benchmarks():
         print(k)
         results[k] = run_all(hostpython, v)
+    for k, v in get_python2js_benchmarks():
+        print(k)
+        results[k] = run_all(hostpython, v, native=False)
+    for k, v in get_parallel_benchmarks(1):
+        print(k, 'parallel')
+        results[k + '_parallel'] = run_all_parallel(k)
     return results
 
 
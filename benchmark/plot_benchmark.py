@@ -11,6 +11,9 @@ with open(sys.argv[-2]) as fp:
 
 results = []
 for k, v in content.items():
+    if 'native' not in v:
+        # Browser-only benchmarks can't be compared to native
+        continue
     results.append((k, v['firefox'] / v['native'], v['chrome'] / v['native']))
 results.sort(key=lambda x: x[1], reverse=True)
 
@@ -0,0 +1,159 @@
+/* Native benchmark of the python2js cycle cache.
+ *
+ * Walks the data of the python2js_* benchmarks the way python2js does,
+ * doing only the cache work, with both the old cache (a dict keyed by
+ * PyLong(pointer), consulted for every object) and the PointerMap from
+ * src/python2js.c (collections only, plus interned dictionary keys).
+ *
+ * Build and run it with benchmark/python2js_cycle_cache.py, which extracts
+ * the PointerMap code from src/python2js.c into pointer_map.c.
+ */
+
+#include <Python.h>
+#include <stdint.h>
+#include <time.h>
+
+#include "pointer_map.c"
+
+#define REPEAT 20
+
+static int
+old_walk(PyObject* x, PyObject* cache)
+{
+  PyObject* id = PyLong_FromSize_t((size_t)x);
+  PyObject* found = PyDict_GetItem(cache, id);
+  Py_DECREF(id);
+  if (found != NULL) {
+    return 1;
+  }
+  if (!PyList_Check(x) && !PyDict_Check(x)) {
+    return 1;
+  }
+
+  PyObject* key = PyLong_FromSize_t((size_t)x);
+  PyObject* value = PyLong_FromLong(1);
+  PyDict_SetItem(cache, key, value);
+  Py_DECREF(value);
+
+  int count = 0;
+  if (PyList_Check(x)) {
+    for (Py_ssize_t i = 0; i < PyList_GET_SIZE(x); ++i) {
+      count += old_walk(PyList_GET_ITEM(x, i), cache);
+    }
+  } else {
+    PyObject *pykey, *pyvalue;
+    Py_ssize_t pos = 0;
+    while (PyDict_Next(x, &pos, &pykey, &pyvalue)) {
+      count += old_walk(pykey, cache);
+      count += old_walk(pyvalue, cache);
+    }
+  }
+
+  PyDict_DelItem(cache, key);
+  Py_DECREF(key);
+  return count;
+}
+
+static int
+new_walk(PyObject* x, PointerMap* collections, PointerMap* keys)
+{
+  int value;
+  if (collections->size != 0 && x != Py_None && !PyLong_Check(x) &&
+      !PyFloat_Check(x) && !PyUnicode_Check(x) && !PyBytes_Check(x)) {
+    if (_pointer_map_get(collections, x, &value)) {
+      return 1;
+    }
+  }
+  if (!PyList_Check(x) && !PyDict_Check(x)) {
+    return 1;
+  }
+
+  _pointer_map_add(collections, x, 1);
+
+  int count = 0;
+  if (PyList_Check(x)) {
+    for (Py_ssize_t i = 0; i < PyList_GET_SIZE(x); ++i) {
+      count += new_walk(PyList_GET_ITEM(x, i), collections, keys);
+    }
+  } else {
+    PyObject *pykey, *pyvalue;
+    Py_ssize_t pos = 0;
+    while (PyDict_Next(x, &pos, &pykey, &pyvalue)) {
+      if (!_pointer_map_get(keys, pykey, &value)) {
+        count += new_walk(pykey, collections, keys);
+        _pointer_map_add(keys, pykey, 1);
+      }
+      count += new_walk(pyvalue, collections, keys);
+    }
+  }
+
+  _pointer_map_remove(collections, x);
+  return count;
+}
+
+static double
+now(void)
+{
+  struct timespec t;
+  clock_gettime(CLOCK_MONOTONIC, &t);
+  return t.tv_sec + t.tv_nsec * 1e-9;
+}
+
+int
+main(int argc, char** argv)
+{
+  Py_Initialize();
+
+  PyObject* globals = PyDict_New();
+  PyDict_SetItemString(globals, "__builtins__", PyEval_GetBuiltins());
+
+  printf("%-22s %9s %9s %8s\n", "benchmark", "before", "after", "speedup");
+  // Arguments come in pairs: the benchmark name and the code that sets up
+  // its `data`
+  for (int i = 1; i + 1 < argc; i += 2) {
+    PyObject* result =
+      PyRun_String(argv[i + 1], Py_file_input, globals, globals);
+    if (result == NULL) {
+      PyErr_Print();
+      return 1;
+    }
+    Py_DECREF(result);
+    PyObject* data = PyDict_GetItemString(globals, "data");
+    Py_INCREF(data);
+
+    double best_old = 1e9, best_new = 1e9;
+    for (int j = 0; j < REPEAT; ++j) {
+      PyObject* cache = PyDict_New();
+      double start = now();
+      old_walk(data, cache);
+      double elapsed = now() - start;
+      Py_DECREF(cache);
+      if (elapsed < best_old) {
+        best_old = elapsed;
+      }
+
+      PointerMap collections, keys;
+      _pointer_map_init(&collections);
+      _pointer_map_init(&keys);
+      start = now();
+      new_walk(data, &collections, &keys);
+      elapsed = now() - start;
+      _pointer_map_free(&collections);
+      _pointer_map_free(&keys);
+      if (elapsed < best_new) {
+        best_new = elapsed;
+      }
+    }
+
+    printf("%-22s %6.2f ms %6.2f ms %7.1fx\n",
+           argv[i],
+           best_old * 1e3,
+           best_new * 1e3,
+           best_old / best_new);
+    Py_DECREF(data);
+  }
+
+  Py_DECREF(globals);
+  Py_Finalize();
+  return 0;
+}
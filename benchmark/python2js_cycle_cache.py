@@ -0,0 +1,59 @@
+"""
+Natively benchmark the python2js cycle cache.
+
+The python2js_* benchmarks in benchmark.py need a browser. This instead
+compiles python2js_cycle_cache.c against the host Python, with the PointerMap
+code taken from src/python2js.c, and times only the cache work python2js does
+over the same data, before and after it moved to PointerMap.
+
+Usage: python benchmark/python2js_cycle_cache.py [hostpython-config]
+"""
+
+from pathlib import Path
+import re
+import subprocess
+import sys
+import tempfile
+
+from benchmark import PYTHON2JS_BENCHMARKS
+
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def extract_pointer_map(source):
+    # The struct definition, and the definitions of the _pointer_map_*
+    # functions (not their forward declarations, which end with ';')
+    struct = re.search(
+        r'^#define POINTER_MAP_INLINE_BITS.*?^} PointerMap;$',
+        source, re.M | re.S).group(0)
+    functions = re.findall(
+        r'^static \w+\*?\n_pointer_map_\w+\([^)]*\)\n{\n.*?^}$',
+        source, re.M | re.S)
+    return '\n\n'.join([struct] + functions) + '\n'
+
+
+def build(build_dir, python_config):
+    source = (ROOT / 'src' / 'python2js.c').read_text()
+    (build_dir / 'pointer_map.c').write_text(extract_pointer_map(source))
+    flags = subprocess.check_output(
+        [python_config, '--includes', '--ldflags', '--embed']).decode().split()
+    binary = build_dir / 'python2js_cycle_cache'
+    subprocess.check_call(
+        ['gcc', '-O2', '-I', str(build_dir),
+         str(Path(__file__).resolve().parent / 'python2js_cycle_cache.c'),
+         '-o', str(binary)] + flags)
+    return binary
+
+
+def main(python_config='python3-config'):
+    with tempfile.TemporaryDirectory() as build_dir:
+        binary = build(Path(build_dir), python_config)
+        args = []
+        for name, setup in PYTHON2JS_BENCHMARKS.items():
+            args += [name, setup]
+        subprocess.check_call([str(binary)] + args)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,170 @@
+"""
+The pool of web workers behind `pyodide.WorkerPoolExecutor`. It is kept apart
+from the pyodide module, which is imported at startup, so that its imports are
+only paid for when it is used.
+"""
+
+import concurrent.futures
+import itertools
+import pickle
+
+from pyodide import BufferCopy, gather
+
+
+def _worker_call():
+    # Runs a call pickled by WorkerPoolExecutor.submit, in a web worker. Both
+    # the result and any exception are pickled and returned.
+    from js import pyodideCall
+    fn, args, kwargs = pickle.loads(pyodideCall)
+    try:
+        result = (True, fn(*args, **kwargs))
+    except BaseException as e:
+        result = (False, e)
+    try:
+        data = pickle.dumps(result)
+    except Exception as e:
+        data = pickle.dumps((False, RuntimeError(
+            'Could not pickle the result: {!r}'.format(e))))
+    return BufferCopy(data)
+
+
+def _call_chunk(fn, chunk):
+    return [fn(*args) for args in chunk]
+
+
+class _WorkerFuture(concurrent.futures.Future):
+    """
+    A future for a call run by a `WorkerPoolExecutor`, which can be awaited in
+    a coroutine run by a `Task`.
+    """
+
+    def __init__(self):
+        super().__init__()
+        # A Javascript promise that settles once the future is done
+        self._promise = None
+
+    def result(self, timeout=None):
+        self._check_done()
+        return super().result(0)
+
+    def exception(self, timeout=None):
+        self._check_done()
+        return super().exception(0)
+
+    def _check_done(self):
+        # The main thread of the browser can't block
+        if not self.done():
+            raise concurrent.futures.TimeoutError(
+                'The call is still running. Await the future in a coroutine '
+                'run by pyodide.run_async instead of waiting for it.')
+
+    def __await__(self):
+        if not self.done():
+            yield self._promise
+        return self.result()
+
+
+class WorkerPoolExecutor(concurrent.futures.Executor):
+    """
+    An executor that runs calls in parallel in a pool of *max_workers* web
+    workers, each with its own Python interpreter. *url* is the location of
+    webworker.js, and the Javascript PyodideWorkerPool of webworker_client.js
+    must be loaded.
+
+    Calls and their results are pickled, so functions are passed by name, and
+    must be importable in the workers. *setup* is Python code that is run in
+    the `__main__` module of each worker before any call, for example to
+    define the functions that are called, and *packages* are loaded in each
+    worker beforehand. If either fails, all calls fail with that error.
+
+    Futures can't be waited for on the main thread of the browser. Their
+    `result()` raises `concurrent.futures.TimeoutError` until they are done.
+    They can be awaited in a coroutine run by `run_async`, or given a done
+    callback.
+    """
+
+    def __init__(self, max_workers=None, url='webworker.js', setup=None,
+                 packages=()):
+        from js import Promise, PyodideWorkerPool, navigator
+        if max_workers is None:
+            max_workers = navigator.hardwareConcurrency or 4
+        self._pool = PyodideWorkerPool.new(max_workers, url)
+        self._pending = 0
+        self._shutdown = False
+        # Settles once the packages are loaded and the setup code has run in
+        # every worker. Calls wait for it, so that they fail if either did.
+        ready = []
+        if packages:
+            ready.append(self._pool.loadPackageOnAll(list(packages)))
+        if setup is not None:
+            ready.append(self._pool.runPythonOnAll(setup))
+        self._ready = Promise.all(ready)
+
+    def submit(self, fn, *args, **kwargs):
+        if self._shutdown:
+            raise RuntimeError('cannot schedule new futures after shutdown')
+        future = _WorkerFuture()
+
+        def on_done(data):
+            ok, value = pickle.loads(data)
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(value)
+            self._finish_call()
+
+        def on_error(error):
+            future.set_exception(RuntimeError(str(error)))
+            self._finish_call()
+
+        def on_setup_error(error):
+            future.set_exception(RuntimeError(
+                'Could not set up the workers: {}'.format(error)))
+            self._finish_call()
+
+        def call(result):
+            return self._pool.call(data).then(on_done, on_error)
+
+        data = BufferCopy(pickle.dumps((fn, args, kwargs)))
+        self._pending += 1
+        future.set_running_or_notify_cancel()
+        future._promise = self._ready.then(call, on_setup_error)
+        return future
+
+    def _submit_chunks(self, fn, iterables, chunksize):
+        items = list(zip(*iterables))
+        chunksize = max(1, int(chunksize))
+        return [self.submit(_call_chunk, fn, items[i:i + chunksize])
+                for i in range(0, len(items), chunksize)]
+
+    def map(self, fn, *iterables, timeout=None, chunksize=1):
+        """
+        Runs *fn* on the items of *iterables* in the workers, sending
+        *chunksize* items to a worker at a time, and returns an iterator of
+        the results. The results can only be iterated over once all the
+        calls are done; see `map_async`.
+        """
+        futures = self._submit_chunks(fn, iterables, chunksize)
+        return itertools.chain.from_iterable(f.result() for f in futures)
+
+    async def map_async(self, fn, *iterables, chunksize=1):
+        """
+        Same as `map`, as a coroutine to be awaited for the list of results.
+        """
+        futures = self._submit_chunks(fn, iterables, chunksize)
+        return list(itertools.chain.from_iterable(await gather(*futures)))
+
+    def _finish_call(self):
+        self._pending -= 1
+        if self._shutdown and self._pending == 0:
+            self._pool.terminate()
+
+    def shutdown(self, wait=True):
+        """
+        Stops accepting calls, and terminates the workers once the pending
+        calls are done. This never blocks.
+        """
+        if not self._shutdown:
+            self._shutdown = True
+            if self._pending == 0:
+                self._pool.terminate()
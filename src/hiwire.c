@@ -1,17 +1,28 @@
 #include <emscripten.h>
 
 EM_JS(void, hiwire_setup, (), {
-  var hiwire = { objects : {}, counter : 1 };
+  // Javascript values referenced from C are stored in a dense array, and their
+  // ids are indices into it. Released slots are put on a free list and reused,
+  // so allocating and releasing an id are both O(1), and the array never turns
+  // into a sparse (dictionary mode) object. Id 0 is never handed out.
+  var FREE_SLOT = {};
+  var hiwire =
+    { objects : [undefined], freelist : [], live : 0, highWaterMark : 0 };
 
   Module.hiwire_new_value = function(jsval)
   {
-    var objects = hiwire.objects;
-    while (hiwire.counter in objects) {
-      hiwire.counter = (hiwire.counter + 1) & 0x7fffffff;
+    var idval;
+    if (hiwire.freelist.length > 0) {
+      idval = hiwire.freelist.pop();
+      hiwire.objects[idval] = jsval;
+    } else {
+      idval = hiwire.objects.length;
+      hiwire.objects.push(jsval);
+    }
+    hiwire.live++;
+    if (hiwire.live > hiwire.highWaterMark) {
+      hiwire.highWaterMark = hiwire.live;
     }
-    var idval = hiwire.counter;
-    objects[idval] = jsval;
-    hiwire.counter = (hiwire.counter + 1) & 0x7fffffff;
     return idval;
   };
 
@@ -19,8 +30,92 @@ EM_JS(void, hiwire_setup, (), {
 
   Module.hiwire_decref = function(idval)
   {
+    // Releasing an id twice must not put it on the free list twice, or it
+    // would later be handed out for two different values.
     var objects = hiwire.objects;
-    delete objects[idval];
+    // clang-format off
+    if (idval <= 0 || idval >= objects.length || objects[idval] === FREE_SLOT) {
+      // clang-format on
+      return;
+    }
+    objects[idval] = FREE_SLOT;
+    hiwire.freelist.push(idval);
+    hiwire.live--;
+  };
+
+  // Statistics about the ids in use, to help track down leaks. This is part
+  // of the public API.
+  Module.hiwireStats = function()
+  {
+    return {
+      live : hiwire.live,
+      highWaterMark : hiwire.highWaterMark,
+      capacity : hiwire.objects.length - 1
+    };
+  };
+
+  // Builds a string from a typed array of character codes. Calling `func` on
+  // a whole slice at once is much faster than appending one character at a
+  // time, but the number of arguments to a function is limited, so long
+  // strings are converted in chunks.
+  var STRING_CHUNK_SIZE = 0x2000;
+  Module.hiwire_string_from_units = function(func, units)
+  {
+    if (units.length <= STRING_CHUNK_SIZE) {
+      return func.apply(null, units);
+    }
+    var chunks = [];
+    for (var i = 0; i < units.length; i += STRING_CHUNK_SIZE) {
+      chunks.push(func.apply(null, units.subarray(i, i + STRING_CHUNK_SIZE)));
+    }
+    return chunks.join('');
+  };
+
+  // We build with -s TEXTDECODER=0, so UTF8ToString decodes one byte at a
+  // time. Use a TextDecoder directly where there is one.
+  // clang-format off
+  if (typeof TextDecoder !== 'undefined') {
+    // clang-format on
+    Module.hiwire_utf8_decoder = new TextDecoder('utf-8');
+  }
+
+  // Indexed by the *_TYPE constants in hiwire.h
+  // clang-format off
+  Module.hiwire_typedarray_classes = [
+    undefined,
+    Int8Array,
+    Uint8Array,
+    Uint8ClampedArray,
+    Int16Array,
+    Uint16Array,
+    Int32Array,
+    Uint32Array,
+    Float32Array,
+    Float64Array,
+    (typeof BigInt64Array !== 'undefined') ? BigInt64Array : undefined,
+    (typeof BigUint64Array !== 'undefined') ? BigUint64Array : undefined
+  ];
+  // clang-format on
+
+  // Takes the values of an array of n ids at ptr, releasing the ids
+  Module.hiwire_take_args = function(ptr, n)
+  {
+    var values = new Array(n);
+    for (var i = 0; i < n; ++i) {
+      var id = Module.HEAP32[(ptr >> 2) + i];
+      values[i] = Module.hiwire_get_value(id);
+      Module.hiwire_decref(id);
+    }
+    return values;
+  };
+
+  // The bytes viewed by a typed array, DataView or ArrayBuffer
+  Module.hiwire_byte_view = function(jsobj)
+  {
+    if (ArrayBuffer.isView(jsobj)) {
+      return new Uint8Array(jsobj.buffer, jsobj.byteOffset, jsobj.byteLength);
+    }
+    return new Uint8Array(jsobj);
   };
 });
 
@@ -37,38 +132,44 @@ EM_JS(int, hiwire_double, (double val), {
 });
 
 EM_JS(int, hiwire_string_ucs4, (int ptr, int len), {
-  var jsstr = "";
   var idx = ptr / 4;
-  for (var i = 0; i < len; ++i) {
-    jsstr += String.fromCharCode(Module.HEAPU32[idx + i]);
-  }
+  var jsstr = Module.hiwire_string_from_units(
+    String.fromCodePoint, Module.HEAPU32.subarray(idx, idx + len));
   return Module.hiwire_new_value(jsstr);
 });
 
 EM_JS(int, hiwire_string_ucs2, (int ptr, int len), {
-  var jsstr = "";
   var idx = ptr / 2;
-  for (var i = 0; i < len; ++i) {
-    jsstr += String.fromCharCode(Module.HEAPU16[idx + i]);
-  }
+  var jsstr = Module.hiwire_string_from_units(
+    String.fromCharCode, Module.HEAPU16.subarray(idx, idx + len));
   return Module.hiwire_new_value(jsstr);
 });
 
 EM_JS(int, hiwire_string_ucs1, (int ptr, int len), {
-  var jsstr = "";
-  var idx = ptr;
-  for (var i = 0; i < len; ++i) {
-    jsstr += String.fromCharCode(Module.HEAPU8[idx + i]);
-  }
+  var jsstr = Module.hiwire_string_from_units(
+    String.fromCharCode, Module.HEAPU8.subarray(ptr, ptr + len));
   return Module.hiwire_new_value(jsstr);
 });
 
 EM_JS(int, hiwire_string_utf8, (int ptr), {
-  return Module.hiwire_new_value(UTF8ToString(ptr));
+  var end = Module.HEAPU8.indexOf(0, ptr);
+  var jsstr;
+  // clang-format off
+  if (Module.hiwire_utf8_decoder !== undefined) {
+    // clang-format on
+    var bytes = Module.HEAPU8.subarray(ptr, end);
+    jsstr = Module.hiwire_utf8_decoder.decode(bytes);
+  } else {
+    jsstr = UTF8ToString(ptr);
+  }
+  return Module.hiwire_new_value(jsstr);
 });
 
 EM_JS(int, hiwire_string_ascii, (int ptr), {
-  return Module.hiwire_new_value(AsciiToString(ptr));
+  var end = Module.HEAPU8.indexOf(0, ptr);
+  var units = Module.HEAPU8.subarray(ptr, end);
+  var jsstr = Module.hiwire_string_from_units(String.fromCharCode, units);
+  return Module.hiwire_new_value(jsstr);
 });
 
 EM_JS(int, hiwire_bytes, (int ptr, int len), {
@@ -107,9 +208,24 @@ EM_JS(void, hiwire_push_object_pair, (int idobj, int idkey, int idval), {
   jsobj[jskey] = jsval;
 });
 
+EM_JS(void,
+      hiwire_push_object_pairs,
+      (int idobj, int ptrkeys, int ptrvals, int n),
+      {
+        var jsobj = Module.hiwire_get_value(idobj);
+        var keys = ptrkeys / 4;
+        var vals = ptrvals / 4;
+        for (var i = 0; i < n; ++i) {
+          var idval = Module.HEAP32[vals + i];
+          var jskey = Module.hiwire_get_value(Module.HEAP32[keys + i]);
+          jsobj[jskey] = Module.hiwire_get_value(idval);
+          Module.hiwire_decref(idval);
+        }
+      });
+
 EM_JS(int, hiwire_get_global, (int idname), {
   var jsname = UTF8ToString(idname);
-  return Module.hiwire_new_value(window[jsname]);
+  return Module.hiwire_new_value(self[jsname]);
 });
 
 EM_JS(int, hiwire_get_member_string, (int idobj, int idkey), {
@@ -172,6 +288,32 @@ EM_JS(void, hiwire_call_member, (int idobj, int ptrname, int idargs), {
   return Module.hiwire_new_value(jsobj[jsname].apply(jsobj, jsargs));
 });
 
+EM_JS(int,
+      hiwire_call_bound,
+      (int idfunc, int idthis, int ptrargs, int nargs),
+      {
+        var jsfunc = Module.hiwire_get_value(idfunc);
+        var jsthis = Module.hiwire_get_value(idthis);
+        var jsargs = Module.hiwire_take_args(ptrargs, nargs);
+        return Module.hiwire_new_value(jsfunc.apply(jsthis, jsargs));
+      });
+
+EM_JS(int, hiwire_construct, (int idclass, int ptrargs, int nargs), {
+  var jsclass = Module.hiwire_get_value(idclass);
+  var jsargs = Module.hiwire_take_args(ptrargs, nargs);
+  jsargs.unshift(null);
+  var bound = Function.prototype.bind.apply(jsclass, jsargs);
+  return Module.hiwire_new_value(new bound());
+});
+
+EM_JS(int, hiwire_member_equals, (int idobj, int idkey, int idval), {
+  var jsobj = Module.hiwire_get_value(idobj);
+  var jskey = Module.hiwire_get_value(idkey);
+  // clang-format off
+  return jsobj[jskey] === Module.hiwire_get_value(idval) ? 1 : 0;
+  // clang-format on
+});
+
 EM_JS(void, hiwire_new, (int idobj, int idargs), {
   function newCall(Cls)
   {
@@ -256,8 +398,71 @@ EM_JS(int, hiwire_get_byteLength, (int idobj), {
 
 EM_JS(int, hiwire_copy_to_ptr, (int idobj, int ptr), {
   var jsobj = Module.hiwire_get_value(idobj);
-  Module.HEAPU8.set(new Uint8Array(jsobj.buffer), ptr);
-});
+  Module.HEAPU8.set(Module.hiwire_byte_view(jsobj), ptr);
+});
+
+EM_JS(int, hiwire_copy_from_ptr, (int idobj, int ptr), {
+  var bytes = Module.hiwire_byte_view(Module.hiwire_get_value(idobj));
+  bytes.set(Module.HEAPU8.subarray(ptr, ptr + bytes.length));
+});
+
+EM_JS(int,
+      hiwire_get_shape,
+      (int idobj, int ptrshape, int ptrstrides, int maxndim),
+      {
+        var jsobj = Module.hiwire_get_value(idobj);
+        var shape = jsobj['shape'];
+        // clang-format off
+        if (shape === undefined || shape === null) {
+          return 0;
+        }
+        var ndim = shape.length;
+        if (!(ndim >= 1 && ndim <= maxndim)) {
+          return -1;
+        }
+        var strides = jsobj['strides'];
+        if (strides === undefined || strides === null) {
+          strides = new Array(ndim);
+          var stride = 1;
+          for (var i = ndim - 1; i >= 0; --i) {
+            strides[i] = stride;
+            stride *= shape[i];
+          }
+        } else if (strides.length !== ndim) {
+          return -1;
+        }
+        // clang-format on
+
+        // Make sure every element lies inside the array
+        var itemsize = jsobj.BYTES_PER_ELEMENT || 1;
+        var length = jsobj.byteLength / itemsize;
+        var first = 0;
+        var last = 0;
+        var empty = false;
+        for (var i = 0; i < ndim; ++i) {
+          var n = shape[i];
+          var s = strides[i];
+          if (!Number.isInteger(n) || !Number.isInteger(s) || n < 0) {
+            return -1;
+          }
+          if (n == 0) {
+            empty = true;
+          } else if (s < 0) {
+            first += s * (n - 1);
+          } else {
+            last += s * (n - 1);
+          }
+        }
+        if (!empty && (first < 0 || last >= length)) {
+          return -1;
+        }
+
+        for (var i = 0; i < ndim; ++i) {
+          Module.HEAP32[(ptrshape >> 2) + i] = shape[i];
+          Module.HEAP32[(ptrstrides >> 2) + i] = strides[i];
+        }
+        return ndim;
+      });
 
 EM_JS(int, hiwire_get_dtype, (int idobj), {
   var jsobj = Module.hiwire_get_value(idobj);
@@ -289,9 +494,38 @@ EM_JS(int, hiwire_get_dtype, (int idobj), {
     case 'Float64Array':
       dtype = 9; // FLOAT64_TYPE;
       break;
+    case 'BigInt64Array':
+      dtype = 10; // INT64_TYPE;
+      break;
+    case 'BigUint64Array':
+      dtype = 11; // UINT64_TYPE;
+      break;
     default:
       dtype = 3; // UINT8CLAMPED_TYPE;
       break;
   }
   return dtype;
 });
+
+EM_JS(int, hiwire_typedarray_copy, (int dtype, int ptr, int len), {
+  var cls = Module.hiwire_typedarray_classes[dtype];
+  // clang-format off
+  if (cls === undefined) {
+    // clang-format on
+    return -1;
+  }
+  // Slicing HEAPU8 gives a fresh, properly aligned ArrayBuffer in one copy
+  var buffer = Module.HEAPU8.slice(ptr, ptr + len).buffer;
+  return Module.hiwire_new_value(new cls(buffer));
+});
+
+EM_JS(int, hiwire_typedarray_view, (int dtype, int ptr, int len), {
+  var cls = Module.hiwire_typedarray_classes[dtype];
+  // clang-format off
+  if (cls === undefined) {
+    // clang-format on
+    return -1;
+  }
+  var length = len / cls.BYTES_PER_ELEMENT;
+  return Module.hiwire_new_value(new cls(Module.HEAPU8.buffer, ptr, length));
+});
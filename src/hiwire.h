@@ -173,6 +173,16 @@ hiwire_object();
 void
 hiwire_push_object_pair(int idobj, int idkey, int idval);
 
+/**
+ * Add n key/value pairs to a Javascript object.
+ *
+ * ptrkeys and ptrvals point to arrays of n ids each. The references to the
+ * values are stolen, and released once they have been added to the object.
+ * The references to the keys are not.
+ */
+void
+hiwire_push_object_pairs(int idobj, int ptrkeys, int ptrvals, int n);
+
 /**
  * Throws a new Error object with the given message.
  *
@@ -278,6 +288,23 @@ hiwire_call(int idobj, int idargs);
 int
 hiwire_call_member(int idobj, int ptrname, int idargs);
 
+/**
+ * Call a function with the given `this`.
+ *
+ * ptrargs points to an array of nargs ids of the arguments. The references to
+ * the arguments are stolen.
+ *
+ * Returns: New reference
+ */
+int
+hiwire_call_bound(int idfunc, int idthis, int ptrargs, int nargs);
+
+/**
+ * Returns 1 if obj[key] is val, compared with ===.
+ */
+int
+hiwire_member_equals(int idobj, int idkey, int idval);
+
 /**
  * Calls the constructor of a class object.
  *
@@ -288,6 +315,17 @@ hiwire_call_member(int idobj, int ptrname, int idargs);
 int
 hiwire_new(int idobj, int idargs);
 
+/**
+ * Calls the constructor of a class object.
+ *
+ * ptrargs points to an array of nargs ids of the arguments. The references to
+ * the arguments are stolen.
+ *
+ * Returns: New reference
+ */
+int
+hiwire_construct(int idclass, int ptrargs, int nargs);
+
 /**
  * Returns the value of the `length` member on a Javascript object.
  *
@@ -402,12 +440,33 @@ int
 hiwire_get_byteOffset(int idobj);
 
 /**
- * Copies the buffer contents of a given typed array or buffer into the memory
- * at ptr.
+ * Copies the bytes viewed by a given typed array, or the contents of a given
+ * buffer, into the memory at ptr.
  */
 int
 hiwire_copy_to_ptr(int idobj, int ptr);
 
+/**
+ * Copies the memory at ptr back into the bytes viewed by a given typed array,
+ * or the contents of a given buffer. The reverse of hiwire_copy_to_ptr.
+ */
+int
+hiwire_copy_from_ptr(int idobj, int ptr);
+
+/**
+ * Reads the optional `shape` and `strides` members of a typed array, as set on
+ * typed arrays converted from Numpy arrays. Strides are measured in elements.
+ * If there is a shape but no strides, the array is taken to be C-contiguous.
+ *
+ * The shape and strides are written to the arrays of maxndim Py_ssize_t's at
+ * ptrshape and ptrstrides.
+ *
+ * Returns: the number of dimensions, 0 if the typed array has no shape, or -1
+ * if the shape or strides are invalid or reach outside of the typed array.
+ */
+int
+hiwire_get_shape(int idobj, int ptrshape, int ptrstrides, int maxndim);
+
 #define INT8_TYPE 1
 #define UINT8_TYPE 2
 #define UINT8CLAMPED_TYPE 3
@@ -417,14 +476,43 @@ hiwire_copy_to_ptr(int idobj, int ptr);
 #define UINT32_TYPE 7
 #define FLOAT32_TYPE 8
 #define FLOAT64_TYPE 9
+#define INT64_TYPE 10
+#define UINT64_TYPE 11
 
 /**
  * Get a data type identifier for a given typedarray.
  *
  * It will be one of INT8_TYPE, UINT8_TYPE, UINT8CLAMPED_TYPE, INT16_TYPE,
- * UINT16_TYPE, INT32_TYPE, UINT32_TYPE, FLOAT32_TYPE, FLOAT64_TYPE.
+ * UINT16_TYPE, INT32_TYPE, UINT32_TYPE, FLOAT32_TYPE, FLOAT64_TYPE,
+ * INT64_TYPE, UINT64_TYPE.
  */
 int
 hiwire_get_dtype(int idobj);
 
+/**
+ * Create a new Javascript TypedArray of the given data type (one of the
+ * *_TYPE constants above), holding a copy of the len bytes at ptr.
+ *
+ * The data is copied with a single bulk copy, so the result remains valid
+ * after the Python object is freed or the WASM heap grows.
+ *
+ * Returns: New reference, or -1 if the data type is not supported by the
+ * Javascript engine (e.g. INT64_TYPE without BigInt64Array).
+ */
+int
+hiwire_typedarray_copy(int dtype, int ptr, int len);
+
+/**
+ * Create a new Javascript TypedArray of the given data type (one of the
+ * *_TYPE constants above), viewing the len bytes at ptr.
+ *
+ * The data is not copied. ptr must be aligned to the item size of the data
+ * type.
+ *
+ * Returns: New reference, or -1 if the data type is not supported by the
+ * Javascript engine (e.g. INT64_TYPE without BigInt64Array).
+ */
+int
+hiwire_typedarray_view(int dtype, int ptr, int len);
+
 #endif /* HIWIRE_H */
@@ -9,9 +9,9 @@
 // bubble out to Python
 
 int
-_js2python_string(char* val)
+_js2python_string(char* val, int length)
 {
-  return (int)PyUnicode_FromString(val);
+  return (int)PyUnicode_FromStringAndSize(val, length);
 }
 
 int
@@ -49,10 +49,11 @@ _js2python_pyproxy(PyObject* val)
 }
 
 int
-_js2python_memoryview(int id)
+_js2python_memoryview(PyObject* jsproxy)
 {
-  PyObject* jsproxy = JsProxy_cnew(id);
-  return (int)PyMemoryView_FromObject(jsproxy);
+  PyObject* result = PyMemoryView_FromObject(jsproxy);
+  Py_DECREF(jsproxy);
+  return (int)result;
 }
 
 int
@@ -61,6 +62,90 @@ _js2python_jsproxy(int id)
   return (int)JsProxy_cnew(id);
 }
 
+int
+_js2python_cached_jsproxy(PyObject* jsproxy)
+{
+  Py_INCREF(jsproxy);
+  return (int)jsproxy;
+}
+
+// Used by the deep conversion, Module.js2python_deep. Functions that return a
+// new Python object return 0 on error, with a Python exception set.
+
+int
+_js2python_list_new(int length)
+{
+  return (int)PyList_New(length);
+}
+
+// Steals the reference to item
+void
+_js2python_list_set(PyObject* list, int index, PyObject* item)
+{
+  PyList_SET_ITEM(list, index, item);
+}
+
+int
+_js2python_float_list(double* values, int length)
+{
+  PyObject* list = PyList_New(length);
+  if (list == NULL) {
+    return 0;
+  }
+  for (int i = 0; i < length; ++i) {
+    PyObject* item = PyFloat_FromDouble(values[i]);
+    if (item == NULL) {
+      Py_DECREF(list);
+      return 0;
+    }
+    PyList_SET_ITEM(list, i, item);
+  }
+  return (int)list;
+}
+
+int
+_js2python_dict_new()
+{
+  return (int)PyDict_New();
+}
+
+// Borrows the reference to key, and steals the one to value. Returns -1 on
+// error.
+int
+_js2python_dict_set(PyObject* dict, PyObject* key, PyObject* value)
+{
+  int result = PyDict_SetItem(dict, key, value);
+  Py_DECREF(value);
+  return result;
+}
+
+int
+_js2python_set_new()
+{
+  return (int)PySet_New(NULL);
+}
+
+// Steals the reference to item. Returns -1 on error.
+int
+_js2python_set_add(PyObject* set, PyObject* item)
+{
+  int result = PySet_Add(set, item);
+  Py_DECREF(item);
+  return result;
+}
+
+void
+_js2python_decref(PyObject* obj)
+{
+  Py_DECREF(obj);
+}
+
+int
+_js2python_convert(int id)
+{
+  return (int)js2python(id);
+}
+
 // TODO: Add some meaningful order
 
 EM_JS(int, __js2python, (int id), {
@@ -68,10 +153,7 @@ EM_JS(int, __js2python, (int id), {
   var value = Module.hiwire_get_value(id);
   var type = typeof value;
   if (type === 'string') {
-    var charptr = allocate(intArrayFromString(value), 'i8', ALLOC_NORMAL);
-    var result = __js2python_string(charptr);
-    _free(charptr);
-    return result;
+    return Module.js2python_string(value);
   } else if (type === 'number') {
     return __js2python_number(value);
   } else if (value === undefined || value === null) {
@@ -82,10 +164,26 @@ EM_JS(int, __js2python, (int id), {
     return __js2python_false();
   } else if (Module.PyProxy.isPyProxy(value)) {
     return __js2python_pyproxy(Module.PyProxy.getPtr(value));
-  } else if (value['byteLength'] !== undefined) {
-    return __js2python_memoryview(id);
+  }
+
+  // Reuse the existing JsProxy if this object has been passed to Python
+  // before, so that it has a single identity on the Python side.
+  var jsproxy = Module.JsProxyCache.get(value);
+  if (jsproxy === undefined) {
+    jsproxy = __js2python_jsproxy(id);
+    if (jsproxy === 0) {
+      // Creating the proxy failed, with a Python exception set
+      return 0;
+    }
+    Module.JsProxyCache.set(value, jsproxy);
   } else {
-    return __js2python_jsproxy(id);
+    jsproxy = __js2python_cached_jsproxy(jsproxy);
+  }
+
+  if (value['byteLength'] !== undefined) {
+    return __js2python_memoryview(jsproxy);
+  } else {
+    return jsproxy;
   }
   // clang-format on
 });
@@ -96,8 +194,222 @@ js2python(int id)
   return (PyObject*)__js2python(id);
 }
 
+EM_JS(int, __js2python_deep, (int id, int depth), {
+  try {
+    return Module.js2python_deep(Module.hiwire_get_value(id), depth);
+  } catch (e) {
+    // clang-format off
+    if (e === Module.js2python_deep.PYTHON_ERROR) {
+      // clang-format on
+      return 0;
+    }
+    throw e;
+  }
+});
+
+PyObject*
+js2python_deep(int id, int depth)
+{
+  return (PyObject*)__js2python_deep(id, depth);
+}
+
+EM_JS(int, js2python_init_js, (), {
+  Module.js2python_string = function(value)
+  {
+    // Encode directly into the heap, without an intermediate Javascript array
+    var length = lengthBytesUTF8(value);
+    var charptr = _malloc(length + 1);
+    stringToUTF8(value, charptr, length + 1);
+    var result = __js2python_string(charptr, length);
+    _free(charptr);
+    return result;
+  };
+
+  // Same as js2python, but without a hiwire id for primitive values. Returns a
+  // new reference, or 0 with a Python exception set.
+  // clang-format off
+  Module.js2python_value = function(value)
+  {
+    var type = typeof value;
+    if (type === 'number') {
+      return __js2python_number(value);
+    } else if (type === 'string') {
+      return Module.js2python_string(value);
+    } else if (value === undefined || value === null) {
+      return __js2python_none();
+    } else if (value === true) {
+      return __js2python_true();
+    } else if (value === false) {
+      return __js2python_false();
+    }
+    var id = Module.hiwire_new_value(value);
+    try {
+      return __js2python_convert(id);
+    } finally {
+      Module.hiwire_decref(id);
+    }
+  };
+  // clang-format on
+
+  // Converts Arrays, plain Objects, Maps and Sets to lists, dicts and sets in
+  // a single walk, creating the Python objects directly rather than through
+  // JsProxies. Containers nested more than depth levels deep (if depth is not
+  // negative), and all other objects, are converted as usual by js2python.
+  // Containers that are reached more than once, including through cycles,
+  // are converted once.
+  // clang-format off
+  var PYTHON_ERROR = {};
+  var MIN_FLOAT_LIST = 8;
+  var MAX_CACHED_STRING = 64;
+
+  function check(ptr) {
+    if (ptr === 0) {
+      throw PYTHON_ERROR;
+    }
+    return ptr;
+  }
+
+  function isPlainObject(value) {
+    var proto = Object.getPrototypeOf(value);
+    return proto === Object.prototype || proto === null;
+  }
+
+  function isNumberArray(value) {
+    for (var i = 0; i < value.length; ++i) {
+      if (typeof value[i] !== 'number') {
+        return false;
+      }
+    }
+    return true;
+  }
+
+  Module.js2python_deep = function(root, depth) {
+    var containers = new Map();
+    var strings = new Map();
+
+    // Returns a borrowed reference, owned by the strings cache
+    function string(value) {
+      var ptr = strings.get(value);
+      if (ptr === undefined) {
+        ptr = check(Module.js2python_string(value));
+        strings.set(value, ptr);
+      }
+      return ptr;
+    }
+
+    function convert(value, depth) {
+      var type = typeof value;
+      if (type === 'string') {
+        if (value.length > MAX_CACHED_STRING) {
+          return check(Module.js2python_string(value));
+        }
+        return __js2python_pyproxy(string(value));
+      } else if (type === 'number') {
+        return check(__js2python_number(value));
+      } else if (value === undefined || value === null) {
+        return __js2python_none();
+      } else if (value === true) {
+        return __js2python_true();
+      } else if (value === false) {
+        return __js2python_false();
+      }
+
+      var ptr = containers.get(value);
+      if (ptr !== undefined) {
+        return __js2python_pyproxy(ptr);
+      }
+      if (type !== 'object' || depth === 0 || Module.PyProxy.isPyProxy(value)) {
+        return generic(value);
+      }
+
+      if (Array.isArray(value)) {
+        if (value.length >= MIN_FLOAT_LIST && isNumberArray(value)) {
+          var buffer = _malloc(value.length * 8);
+          Module.HEAPF64.set(value, buffer >> 3);
+          ptr = __js2python_float_list(buffer, value.length);
+          _free(buffer);
+          return check(ptr);
+        }
+        ptr = check(__js2python_list_new(value.length));
+        fill(ptr, value, function() {
+          for (var i = 0; i < value.length; ++i) {
+            __js2python_list_set(ptr, i, convert(value[i], depth - 1));
+          }
+        });
+      } else if (value instanceof Map) {
+        ptr = check(__js2python_dict_new());
+        fill(ptr, value, function() {
+          value.forEach(function(item, key) {
+            var pykey = convert(key, depth - 1);
+            try {
+              var pyitem = convert(item, depth - 1);
+              if (__js2python_dict_set(ptr, pykey, pyitem) !== 0) {
+                throw PYTHON_ERROR;
+              }
+            } finally {
+              __js2python_decref(pykey);
+            }
+          });
+        });
+      } else if (value instanceof Set) {
+        ptr = check(__js2python_set_new());
+        fill(ptr, value, function() {
+          value.forEach(function(item) {
+            if (__js2python_set_add(ptr, convert(item, depth - 1)) !== 0) {
+              throw PYTHON_ERROR;
+            }
+          });
+        });
+      } else if (isPlainObject(value)) {
+        ptr = check(__js2python_dict_new());
+        fill(ptr, value, function() {
+          var keys = Object.keys(value);
+          for (var i = 0; i < keys.length; ++i) {
+            var pykey = string(keys[i]);
+            var item = convert(value[keys[i]], depth - 1);
+            if (__js2python_dict_set(ptr, pykey, item) !== 0) {
+              throw PYTHON_ERROR;
+            }
+          }
+        });
+      } else {
+        return generic(value);
+      }
+      return ptr;
+    }
+
+    // Fills in a new container, releasing it if anything goes wrong
+    function fill(ptr, value, callback) {
+      containers.set(value, ptr);
+      try {
+        callback();
+      } catch (e) {
+        containers.delete(value);
+        __js2python_decref(ptr);
+        throw e;
+      }
+    }
+
+    function generic(value) {
+      return check(Module.js2python_value(value));
+    }
+
+    try {
+      return convert(root, depth);
+    } finally {
+      strings.forEach(function(ptr) {
+        __js2python_decref(ptr);
+      });
+    }
+  };
+  Module.js2python_deep.PYTHON_ERROR = PYTHON_ERROR;
+  // clang-format on
+
+  return 0;
+});
+
 int
 js2python_init()
 {
-  return 0;
+  return js2python_init_js();
 }
@@ -16,6 +16,17 @@
 PyObject*
 js2python(int x);
 
+/** Convert a Javascript object to a Python object, converting Arrays, plain
+ *  Objects, Maps and Sets to lists, dicts and sets all the way down.
+ *  \param x The Javascript object.
+ *  \param depth The number of levels of containers to convert. Containers
+ *    nested deeper are passed as JsProxies. Negative for no limit.
+ *  \return The Python object. New reference. If NULL, a Python exception
+ *    occurred during the conversion.
+ */
+PyObject*
+js2python_deep(int x, int depth);
+
 /** Initialize any global variables used by this module. */
 int
 js2python_init();
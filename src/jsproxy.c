@@ -1,11 +1,19 @@
 #include "jsproxy.h"
 
+#include <emscripten.h>
+
 #include "hiwire.h"
 #include "js2python.h"
 #include "python2js.h"
 
 static PyObject*
-JsBoundMethod_cnew(int this_, const char* name);
+JsBoundMethod_cnew(int this_, int func, int name);
+
+static int
+JsBoundMethod_IsCurrent(PyObject* o);
+
+static PyObject*
+JsIterator_cnew(int idobj);
 
 ////////////////////////////////////////////////////////////
 // JsProxy
@@ -16,14 +24,42 @@ JsBoundMethod_cnew(int this_, const char* name);
 typedef struct
 {
   PyObject_HEAD int js;
+  // For typed arrays that are not on the WASM heap, a copy of their data
   PyObject* bytes;
+  // The number of buffer views currently exported, and how many of those are
+  // writable views of the copy
+  Py_ssize_t exports;
+  Py_ssize_t writable_exports;
+  // Whether the copy may have been changed from Python since it was last
+  // written back to the typed array
+  int dirty;
+  // Set while JsProxy_WritableView exports a writable view
+  int writable_request;
+  // The generation of the typed array when it was last copied
+  int generation;
+  // Maps member names to the JsBoundMethods already made for them
+  PyObject* methods;
 } JsProxy;
 
+// Limits the number of methods cached on each JsProxy, in case an object has
+// many generated function members
+#define JSPROXY_MAX_METHODS 64
+
+EM_JS(void, jsproxy_cache_remove, (int idobj, int ptrobj), {
+  Module.JsProxyCache.remove(Module.hiwire_get_value(idobj), ptrobj);
+});
+
+EM_JS(int, jsproxy_buffer_generation, (int idobj), {
+  return Module.JsProxyBuffers.generation(Module.hiwire_get_value(idobj));
+});
+
 static void
 JsProxy_dealloc(JsProxy* self)
 {
+  jsproxy_cache_remove(self->js, (int)self);
   hiwire_decref(self->js);
   Py_XDECREF(self->bytes);
+  Py_XDECREF(self->methods);
   Py_TYPE(self)->tp_free((PyObject*)self);
 }
 
@@ -41,6 +77,16 @@ JsProxy_GetAttr(PyObject* o, PyObject* attr_name)
 {
   JsProxy* self = (JsProxy*)o;
 
+  // Reuse the bound method from the last access if the member is still the
+  // same function. This only takes one call into Javascript.
+  if (self->methods != NULL) {
+    PyObject* method = PyDict_GetItem(self->methods, attr_name);
+    if (method != NULL && JsBoundMethod_IsCurrent(method)) {
+      Py_INCREF(method);
+      return method;
+    }
+  }
+
   PyObject* str = PyObject_Str(attr_name);
   if (str == NULL) {
     return NULL;
@@ -48,7 +94,9 @@ JsProxy_GetAttr(PyObject* o, PyObject* attr_name)
 
   const char* key = PyUnicode_AsUTF8(str);
 
-  if (strncmp(key, "new", 4) == 0 || strncmp(key, "_has_bytes", 11) == 0) {
+  if (strncmp(key, "new", 4) == 0 || strncmp(key, "_has_bytes", 11) == 0 ||
+      strncmp(key, "_sync", 6) == 0 || strncmp(key, "to_py", 6) == 0 ||
+      strncmp(key, "_writable_view", 15) == 0) {
     Py_DECREF(str);
     return PyObject_GenericGetAttr(o, attr_name);
   } else if (strncmp(key, "typeof", 7) == 0) {
@@ -60,12 +108,26 @@ JsProxy_GetAttr(PyObject* o, PyObject* attr_name)
   }
 
   int idresult = hiwire_get_member_string(self->js, (int)key);
-  Py_DECREF(str);
 
   if (hiwire_is_function(idresult)) {
-    hiwire_decref(idresult);
-    return JsBoundMethod_cnew(self->js, key);
+    PyObject* method =
+      JsBoundMethod_cnew(self->js, idresult, hiwire_string_utf8((int)key));
+    Py_DECREF(str);
+    if (method == NULL) {
+      return NULL;
+    }
+    if (self->methods == NULL) {
+      self->methods = PyDict_New();
+    }
+    // The cache is only an optimization, so failing to add to it is no error
+    if (self->methods == NULL ||
+        (PyDict_Size(self->methods) < JSPROXY_MAX_METHODS &&
+         PyDict_SetItem(self->methods, attr_name, method))) {
+      PyErr_Clear();
+    }
+    return method;
   }
+  Py_DECREF(str);
 
   PyObject* pyresult = js2python(idresult);
   hiwire_decref(idresult);
@@ -95,23 +157,59 @@ JsProxy_SetAttr(PyObject* o, PyObject* attr_name, PyObject* pyvalue)
   return 0;
 }
 
+// Up to this many arguments are converted into a buffer on the stack
+#define JS_CALL_INLINE_ARGS 16
+
+/* Converts the arguments of a call to Javascript. Keyword arguments are passed
+ * as a single object after the positional arguments, since that is how
+ * Javascript APIs take options.
+ *
+ * The ids of the arguments are stored in *idargs, which points to a buffer of
+ * JS_CALL_INLINE_ARGS ints. If there are more arguments than that, a new
+ * buffer is allocated instead, which the caller frees with PyMem_Free.
+ *
+ * Returns: the number of arguments, or -1 on error */
+static Py_ssize_t
+_jsproxy_convert_args(PyObject* args, PyObject* kwargs, int** idargs)
+{
+  Py_ssize_t nargs = PyTuple_GET_SIZE(args);
+  int has_kwargs = kwargs != NULL && PyDict_Size(kwargs) > 0;
+  Py_ssize_t total = nargs + has_kwargs;
+
+  if (total > JS_CALL_INLINE_ARGS) {
+    *idargs = PyMem_Malloc(total * sizeof(int));
+    if (*idargs == NULL) {
+      PyErr_NoMemory();
+      return -1;
+    }
+  }
+
+  for (Py_ssize_t i = 0; i < nargs; ++i) {
+    (*idargs)[i] = python2js(PyTuple_GET_ITEM(args, i));
+  }
+  if (has_kwargs) {
+    (*idargs)[nargs] = python2js(kwargs);
+  }
+  return total;
+}
+
 static PyObject*
 JsProxy_Call(PyObject* o, PyObject* args, PyObject* kwargs)
 {
   JsProxy* self = (JsProxy*)o;
 
-  Py_ssize_t nargs = PyTuple_Size(args);
-
-  int idargs = hiwire_array();
-
-  for (Py_ssize_t i = 0; i < nargs; ++i) {
-    int idarg = python2js(PyTuple_GET_ITEM(args, i));
-    hiwire_push_array(idargs, idarg);
-    hiwire_decref(idarg);
+  int inline_args[JS_CALL_INLINE_ARGS];
+  int* idargs = inline_args;
+  Py_ssize_t nargs = _jsproxy_convert_args(args, kwargs, &idargs);
+  if (nargs == -1) {
+    return NULL;
   }
 
-  int idresult = hiwire_call(self->js, idargs);
-  hiwire_decref(idargs);
+  // This releases the arguments
+  int idresult = hiwire_call_bound(self->js, self->js, (int)idargs, nargs);
+  if (idargs != inline_args) {
+    PyMem_Free(idargs);
+  }
   PyObject* pyresult = js2python(idresult);
   hiwire_decref(idresult);
   return pyresult;
@@ -169,8 +267,9 @@ JsProxy_RichCompare(PyObject* a, PyObject* b, int op)
 static PyObject*
 JsProxy_GetIter(PyObject* o)
 {
-  Py_INCREF(o);
-  return o;
+  JsProxy* self = (JsProxy*)o;
+
+  return JsIterator_cnew(self->js);
 }
 
 static PyObject*
@@ -201,18 +300,18 @@ JsProxy_New(PyObject* o, PyObject* args, PyObject* kwargs)
 {
   JsProxy* self = (JsProxy*)o;
 
-  Py_ssize_t nargs = PyTuple_Size(args);
-
-  int idargs = hiwire_array();
-
-  for (Py_ssize_t i = 0; i < nargs; ++i) {
-    int idarg = python2js(PyTuple_GET_ITEM(args, i));
-    hiwire_push_array(idargs, idarg);
-    hiwire_decref(idarg);
+  int inline_args[JS_CALL_INLINE_ARGS];
+  int* idargs = inline_args;
+  Py_ssize_t nargs = _jsproxy_convert_args(args, kwargs, &idargs);
+  if (nargs == -1) {
+    return NULL;
   }
 
-  int idresult = hiwire_new(self->js, idargs);
-  hiwire_decref(idargs);
+  // This releases the arguments
+  int idresult = hiwire_construct(self->js, (int)idargs, nargs);
+  if (idargs != inline_args) {
+    PyMem_Free(idargs);
+  }
   PyObject* pyresult = js2python(idresult);
   hiwire_decref(idresult);
   return pyresult;
@@ -272,15 +371,28 @@ JsProxy_GetBuffer(PyObject* o, Py_buffer* view, int flags)
   if (hiwire_is_on_wasm_heap(self->js)) {
     ptr = (void*)hiwire_get_byteOffset(self->js);
   } else {
+    // Copy the data in again only if the typed array has been marked as
+    // changed since the last copy. Typed arrays that have never been marked
+    // can't be tracked, so they are copied whenever no views of the old copy
+    // remain.
+    int generation = jsproxy_buffer_generation(self->js);
+    int stale;
     if (self->bytes == NULL) {
       self->bytes = PyBytes_FromStringAndSize(NULL, byteLength);
       if (self->bytes == NULL) {
         return -1;
       }
+      stale = 1;
+    } else {
+      stale = generation != self->generation ||
+              (generation == 0 && self->exports == 0);
     }
 
     ptr = PyBytes_AsString(self->bytes);
-    hiwire_copy_to_ptr(self->js, (int)ptr);
+    if (stale) {
+      hiwire_copy_to_ptr(self->js, (int)ptr);
+      self->generation = generation;
+    }
   }
 
   int dtype = hiwire_get_dtype(self->js);
@@ -324,28 +436,159 @@ JsProxy_GetBuffer(PyObject* o, Py_buffer* view, int flags)
       format = "d";
       itemsize = 8;
       break;
+    case INT64_TYPE:
+      format = "q";
+      itemsize = 8;
+      break;
+    case UINT64_TYPE:
+      format = "Q";
+      itemsize = 8;
+      break;
     default:
       format = "B";
       itemsize = 1;
       break;
   }
 
+  // The shape and strides live as long as the view, and are freed in
+  // JsProxy_ReleaseBuffer
+  Py_ssize_t* dims = PyMem_Malloc(2 * PyBUF_MAX_NDIM * sizeof(Py_ssize_t));
+  if (dims == NULL) {
+    PyErr_NoMemory();
+    view->obj = NULL;
+    return -1;
+  }
+  Py_ssize_t* shape = dims;
+  Py_ssize_t* strides = dims + PyBUF_MAX_NDIM;
+  int ndim =
+    hiwire_get_shape(self->js, (int)shape, (int)strides, PyBUF_MAX_NDIM);
+  if (ndim == -1) {
+    PyMem_Free(dims);
+    PyErr_SetString(PyExc_BufferError,
+                    "Invalid shape or strides on typed array");
+    view->obj = NULL;
+    return -1;
+  }
+
+  Py_ssize_t len = byteLength;
+  if (ndim == 0) {
+    PyMem_Free(dims);
+    dims = NULL;
+    ndim = 1;
+    shape = NULL;
+    strides = NULL;
+  } else {
+    len = itemsize;
+    Py_ssize_t contiguous_stride = itemsize;
+    int is_contiguous = 1;
+    for (int i = ndim - 1; i >= 0; --i) {
+      strides[i] *= itemsize;
+      if (shape[i] > 1 && strides[i] != contiguous_stride) {
+        is_contiguous = 0;
+      }
+      contiguous_stride *= shape[i];
+      len *= shape[i];
+    }
+    if (!is_contiguous && (flags & PyBUF_STRIDES) != PyBUF_STRIDES) {
+      PyMem_Free(dims);
+      PyErr_SetString(PyExc_BufferError, "Typed array is not contiguous");
+      view->obj = NULL;
+      return -1;
+    }
+  }
+
+  // Typed arrays on the WASM heap share their memory with Python, so their
+  // views are always writable. Views of a copy are only writable if asked
+  // for, and only those need to be written back.
+  int writable = self->bytes == NULL || self->writable_request ||
+                 (flags & PyBUF_WRITABLE) == PyBUF_WRITABLE;
+
   Py_INCREF(self);
+  self->exports++;
+  if (self->bytes != NULL && writable) {
+    self->writable_exports++;
+    self->dirty = 1;
+  }
 
   view->buf = ptr;
   view->obj = (PyObject*)self;
-  view->len = byteLength;
-  view->readonly = 0;
+  view->len = len;
+  view->readonly = !writable;
   view->itemsize = itemsize;
   view->format = format;
-  view->ndim = 1;
-  view->shape = NULL;
-  view->strides = NULL;
+  view->ndim = ndim;
+  view->shape = shape;
+  view->strides = strides;
   view->suboffsets = NULL;
+  view->internal = dims;
 
   return 0;
 }
 
+static void
+JsProxy_WriteBack(JsProxy* self)
+{
+  // Typed arrays on the WASM heap are used in place, and need no copying
+  if (self->bytes != NULL && self->dirty) {
+    hiwire_copy_from_ptr(self->js, (int)PyBytes_AS_STRING(self->bytes));
+  }
+  // Writable views that are still exported may be written to again
+  self->dirty = self->writable_exports > 0;
+}
+
+static void
+JsProxy_ReleaseBuffer(PyObject* o, Py_buffer* view)
+{
+  JsProxy* self = (JsProxy*)o;
+
+  PyMem_Free(view->internal);
+  self->exports--;
+  // Releasing a read-only view never writes back, so that it doesn't
+  // overwrite changes made to the typed array from Javascript meanwhile
+  if (self->bytes != NULL && !view->readonly) {
+    self->writable_exports--;
+    if (self->writable_exports == 0) {
+      JsProxy_WriteBack(self);
+    }
+  }
+}
+
+static PyObject*
+JsProxy_WritableView(PyObject* o)
+{
+  JsProxy* self = (JsProxy*)o;
+  // memoryview only asks for read-only buffers
+  self->writable_request = 1;
+  PyObject* result = PyMemoryView_FromObject(o);
+  self->writable_request = 0;
+  return result;
+}
+
+static PyObject*
+JsProxy_Sync(PyObject* o)
+{
+  JsProxy_WriteBack((JsProxy*)o);
+  Py_RETURN_NONE;
+}
+
+static PyObject*
+JsProxy_ToPy(PyObject* o, PyObject* args, PyObject* kwargs)
+{
+  JsProxy* self = (JsProxy*)o;
+  static char* kwlist[] = { "depth", NULL };
+  int depth = -1;
+
+  if (!PyArg_ParseTupleAndKeywords(args, kwargs, "|i:to_py", kwlist, &depth)) {
+    return NULL;
+  }
+
+  PyObject* result = js2python_deep(self->js, depth);
+  if (result == NULL && !PyErr_Occurred()) {
+    PyErr_SetString(PyExc_RuntimeError, "Javascript conversion failed");
+  }
+  return result;
+}
+
 static PyObject*
 JsProxy_HasBytes(PyObject* o)
 {
@@ -367,7 +610,7 @@ static PyMappingMethods JsProxy_MappingMethods = {
 
 static PyBufferProcs JsProxy_BufferProcs = {
   JsProxy_GetBuffer,
-  NULL
+  JsProxy_ReleaseBuffer
 };
 
 static PyMethodDef JsProxy_Methods[] = {
@@ -379,6 +622,18 @@ static PyMethodDef JsProxy_Methods[] = {
     (PyCFunction)JsProxy_HasBytes,
     METH_NOARGS,
     "Returns true if instance has buffer memory. For testing only." },
+  { "to_py",
+    (PyCFunction)JsProxy_ToPy,
+    METH_VARARGS | METH_KEYWORDS,
+    "Convert to native Python containers. See docs/type_conversions.md" },
+  { "_sync",
+    (PyCFunction)JsProxy_Sync,
+    METH_NOARGS,
+    "Copies the buffer memory back to the typed array. Use pyodide.sync." },
+  { "_writable_view",
+    (PyCFunction)JsProxy_WritableView,
+    METH_NOARGS,
+    "Returns a writable memoryview. Use pyodide.writable_view." },
   { NULL }
 };
 // clang-format on
@@ -408,6 +663,12 @@ JsProxy_cnew(int idobj)
   self = (JsProxy*)JsProxyType.tp_alloc(&JsProxyType, 0);
   self->js = hiwire_incref(idobj);
   self->bytes = NULL;
+  self->exports = 0;
+  self->writable_exports = 0;
+  self->dirty = 0;
+  self->writable_request = 0;
+  self->generation = 0;
+  self->methods = NULL;
   return (PyObject*)self;
 }
 
@@ -416,18 +677,21 @@ JsProxy_cnew(int idobj)
 //
 // A special class for bound methods
 
-const size_t BOUND_METHOD_NAME_SIZE = 256;
-
 typedef struct
 {
   PyObject_HEAD int this_;
-  char name[BOUND_METHOD_NAME_SIZE];
+  // The function, resolved when the method was looked up
+  int func;
+  // The member name, as a Javascript string
+  int name;
 } JsBoundMethod;
 
 static void
 JsBoundMethod_dealloc(JsBoundMethod* self)
 {
   hiwire_decref(self->this_);
+  hiwire_decref(self->func);
+  hiwire_decref(self->name);
   Py_TYPE(self)->tp_free((PyObject*)self);
 }
 
@@ -436,18 +700,19 @@ JsBoundMethod_Call(PyObject* o, PyObject* args, PyObject* kwargs)
 {
   JsBoundMethod* self = (JsBoundMethod*)o;
 
-  Py_ssize_t nargs = PyTuple_Size(args);
-
-  int idargs = hiwire_array();
-
-  for (Py_ssize_t i = 0; i < nargs; ++i) {
-    int idarg = python2js(PyTuple_GET_ITEM(args, i));
-    hiwire_push_array(idargs, idarg);
-    hiwire_decref(idarg);
+  int inline_args[JS_CALL_INLINE_ARGS];
+  int* idargs = inline_args;
+  Py_ssize_t nargs = _jsproxy_convert_args(args, kwargs, &idargs);
+  if (nargs == -1) {
+    return NULL;
   }
 
-  int idresult = hiwire_call_member(self->this_, (int)self->name, idargs);
-  hiwire_decref(idargs);
+  // The function is called directly, without looking it up by name again.
+  // This releases the arguments.
+  int idresult = hiwire_call_bound(self->func, self->this_, (int)idargs, nargs);
+  if (idargs != inline_args) {
+    PyMem_Free(idargs);
+  }
   PyObject* pyresult = js2python(idresult);
   hiwire_decref(idresult);
   return pyresult;
@@ -463,13 +728,268 @@ static PyTypeObject JsBoundMethodType = {
             "Python."
 };
 
+/* Steals the references to func and name */
 static PyObject*
-JsBoundMethod_cnew(int this_, const char* name)
+JsBoundMethod_cnew(int this_, int func, int name)
 {
   JsBoundMethod* self;
   self = (JsBoundMethod*)JsBoundMethodType.tp_alloc(&JsBoundMethodType, 0);
+  if (self == NULL) {
+    hiwire_decref(func);
+    hiwire_decref(name);
+    return NULL;
+  }
   self->this_ = hiwire_incref(this_);
-  strncpy(self->name, name, BOUND_METHOD_NAME_SIZE);
+  self->func = func;
+  self->name = name;
+  return (PyObject*)self;
+}
+
+/* Whether the member the bound method was looked up from is still the same
+ * function */
+static int
+JsBoundMethod_IsCurrent(PyObject* o)
+{
+  JsBoundMethod* self = (JsBoundMethod*)o;
+  return hiwire_member_equals(self->this_, self->name, self->func);
+}
+
+////////////////////////////////////////////////////////////
+// JsIterator
+//
+// Iterates over a Javascript iterable, fetching its elements in chunks, so
+// that each element doesn't need several calls into Javascript. Arrays and
+// typed arrays are read by index rather than through their iterator.
+
+// iter is the Javascript iterator, or the array for indexed access
+typedef struct
+{
+  PyObject_HEAD int iter;
+  int indexed;
+  // The index of the next element to fetch, for indexed access
+  Py_ssize_t index;
+  int done;
+  // The number of elements fetched at a time. It grows up to max_chunk, so
+  // that short iterations don't fetch elements they don't need.
+  int chunk;
+  int max_chunk;
+  // The buffered elements, of which items[position:count] are left
+  PyObject** items;
+  int position;
+  int count;
+  // Space for fetching a chunk: an id per element, or 0 for a number, whose
+  // value is stored in values instead
+  int* ids;
+  double* values;
+} JsIterator;
+
+static PyObject* jsproxy_options = NULL;
+
+static int
+_jsiterator_max_chunk()
+{
+  if (jsproxy_options == NULL) {
+    PyObject* m = PyImport_ImportModule("pyodide");
+    if (m == NULL) {
+      return -1;
+    }
+    jsproxy_options = PyObject_GetAttrString(m, "_jsproxy_options");
+    Py_DECREF(m);
+    if (jsproxy_options == NULL) {
+      return -1;
+    }
+  }
+  PyObject* pychunk =
+    PyDict_GetItemString(jsproxy_options, "iteration_chunk_size");
+  long chunk = pychunk != NULL ? PyLong_AsLong(pychunk) : 1;
+  if (chunk == -1 && PyErr_Occurred()) {
+    return -1;
+  }
+  return chunk < 1 ? 1 : chunk > 65536 ? 65536 : (int)chunk;
+}
+
+EM_JS(int, jsiterator_get, (int idobj, int ptrindexed), {
+  var jsobj = Module.hiwire_get_value(idobj);
+  // clang-format off
+  var indexed = Array.isArray(jsobj) ||
+                (ArrayBuffer.isView(jsobj) && !(jsobj instanceof DataView));
+  Module.HEAP32[ptrindexed >> 2] = indexed ? 1 : 0;
+  if (indexed || typeof jsobj.next === 'function') {
+    return Module.hiwire_new_value(jsobj);
+  } else if (typeof Symbol !== 'undefined' &&
+             typeof jsobj[Symbol.iterator] === 'function') {
+    return Module.hiwire_new_value(jsobj[Symbol.iterator]());
+  }
+  // clang-format on
+  return 0;
+});
+
+EM_JS(int,
+      jsiterator_fill,
+      (int iditer, int index, int ptrids, int ptrvalues, int n),
+      {
+        var jsiter = Module.hiwire_get_value(iditer);
+        var ids = ptrids >> 2;
+        var values = ptrvalues >> 3;
+        var count = 0;
+        function store(value)
+        {
+          // clang-format off
+          if (typeof value === 'number') {
+            // clang-format on
+            Module.HEAP32[ids + count] = 0;
+            Module.HEAPF64[values + count] = value;
+          } else {
+            Module.HEAP32[ids + count] = Module.hiwire_new_value(value);
+          }
+          count++;
+        }
+        if (index >= 0) {
+          var end = Math.min(jsiter.length, index + n);
+          for (var i = index; i < end; ++i) {
+            store(jsiter[i]);
+          }
+        } else {
+          while (count < n) {
+            var result = jsiter.next();
+            if (result.done) {
+              break;
+            }
+            store(result.value);
+          }
+        }
+        return count;
+      });
+
+EM_JS(void, jsiterator_release_ids, (int ptrids, int n), {
+  for (var i = 0; i < n; ++i) {
+    var id = Module.HEAP32[(ptrids >> 2) + i];
+    if (id != 0) {
+      Module.hiwire_decref(id);
+    }
+  }
+});
+
+static void
+JsIterator_clear_items(JsIterator* self)
+{
+  for (int i = self->position; i < self->count; ++i) {
+    Py_DECREF(self->items[i]);
+  }
+  self->position = self->count = 0;
+}
+
+static void
+JsIterator_dealloc(JsIterator* self)
+{
+  JsIterator_clear_items(self);
+  hiwire_decref(self->iter);
+  PyMem_Free(self->items);
+  PyMem_Free(self->ids);
+  PyMem_Free(self->values);
+  Py_TYPE(self)->tp_free((PyObject*)self);
+}
+
+/* Fetches the next chunk of elements. Returns -1 on error. */
+static int
+JsIterator_fill(JsIterator* self)
+{
+  int n = self->chunk;
+  int count = jsiterator_fill(self->iter,
+                              self->indexed ? self->index : -1,
+                              (int)self->ids,
+                              (int)self->values,
+                              n);
+  self->index += count;
+  if (count < n) {
+    self->done = 1;
+  }
+  if (self->chunk < self->max_chunk) {
+    self->chunk =
+      self->chunk * 2 < self->max_chunk ? self->chunk * 2 : self->max_chunk;
+  }
+
+  int result = 0;
+  for (int i = 0; i < count; ++i) {
+    PyObject* item;
+    if (self->ids[i] == 0) {
+      item = PyFloat_FromDouble(self->values[i]);
+    } else {
+      item = js2python(self->ids[i]);
+    }
+    if (item == NULL) {
+      result = -1;
+      JsIterator_clear_items(self);
+      break;
+    }
+    self->items[self->count++] = item;
+  }
+  jsiterator_release_ids((int)self->ids, count);
+  return result;
+}
+
+static PyObject*
+JsIterator_IterNext(PyObject* o)
+{
+  JsIterator* self = (JsIterator*)o;
+
+  if (self->position == self->count) {
+    self->position = self->count = 0;
+    if (self->done || JsIterator_fill(self) || self->count == 0) {
+      return NULL;
+    }
+  }
+
+  // The buffer's reference is handed to the caller
+  return self->items[self->position++];
+}
+
+static PyTypeObject JsIteratorType = {
+  .tp_name = "JsIterator",
+  .tp_basicsize = sizeof(JsIterator),
+  .tp_dealloc = (destructor)JsIterator_dealloc,
+  .tp_iter = PyObject_SelfIter,
+  .tp_iternext = JsIterator_IterNext,
+  .tp_flags = Py_TPFLAGS_DEFAULT,
+  .tp_doc = "An iterator over a Javascript iterable."
+};
+
+static PyObject*
+JsIterator_cnew(int idobj)
+{
+  int max_chunk = _jsiterator_max_chunk();
+  if (max_chunk == -1) {
+    return NULL;
+  }
+
+  int indexed;
+  int iditer = jsiterator_get(idobj, (int)&indexed);
+  if (iditer == 0) {
+    PyErr_SetString(PyExc_TypeError, "Javascript object is not iterable");
+    return NULL;
+  }
+
+  JsIterator* self;
+  self = (JsIterator*)JsIteratorType.tp_alloc(&JsIteratorType, 0);
+  if (self == NULL) {
+    hiwire_decref(iditer);
+    return NULL;
+  }
+  self->iter = iditer;
+  self->indexed = indexed;
+  self->index = 0;
+  self->done = 0;
+  self->chunk = max_chunk < 8 ? max_chunk : 8;
+  self->max_chunk = max_chunk;
+  self->position = 0;
+  self->count = 0;
+  self->items = PyMem_Malloc(max_chunk * sizeof(PyObject*));
+  self->ids = PyMem_Malloc(max_chunk * sizeof(int));
+  self->values = PyMem_Malloc(max_chunk * sizeof(double));
+  if (self->items == NULL || self->ids == NULL || self->values == NULL) {
+    Py_DECREF(self);
+    return PyErr_NoMemory();
+  }
   return (PyObject*)self;
 }
 
@@ -490,8 +1010,67 @@ JsProxy_AsJs(PyObject* x)
   return hiwire_incref(js_proxy->js);
 }
 
+// The identity cache maps Javascript objects to the JsProxy currently wrapping
+// them, so that passing the same object to Python more than once gives the
+// same Python object. Entries are removed when the JsProxy is freed, and since
+// the map is weak it never keeps the Javascript object alive by itself.
+EM_JS(int, jsproxy_init_js, (), {
+  // clang-format off
+  var hasWeakMap = (typeof WeakMap !== 'undefined');
+  Module.JsProxyCache = {
+    enabled: hasWeakMap,
+    map: hasWeakMap ? new WeakMap() : undefined,
+    canCache: function(value) {
+      var type = typeof value;
+      return this.enabled && value !== null &&
+        (type === 'object' || type === 'function');
+    },
+    get: function(value) {
+      return this.canCache(value) ? this.map.get(value) : undefined;
+    },
+    set: function(value, ptrobj) {
+      if (this.canCache(value)) {
+        this.map.set(value, ptrobj);
+      }
+    },
+    remove: function(value, ptrobj) {
+      // A disabled cache may still hold entries from before it was disabled
+      if (hasWeakMap && this.map.get(value) === ptrobj) {
+        this.map.delete(value);
+      }
+    },
+  };
+
+  // Generation counters for typed arrays, bumped by markDirty. 0 means the
+  // typed array has never been marked, so its changes can't be tracked.
+  var nextGeneration = 1;
+  Module.JsProxyBuffers = {
+    generations: hasWeakMap ? new WeakMap() : undefined,
+    generation: function(value) {
+      return hasWeakMap ? (this.generations.get(value) || 0) : 0;
+    },
+    markDirty: function(value) {
+      if (hasWeakMap) {
+        this.generations.set(value, nextGeneration++);
+        nextGeneration |= 0;
+        if (nextGeneration === 0) {
+          nextGeneration = 1;
+        }
+      }
+    },
+  };
+
+  Module.markDirty = function(value) {
+    Module.JsProxyBuffers.markDirty(value);
+  };
+
+  return 0;
+// clang-format on
+});
+
 int
 JsProxy_init()
 {
-  return (PyType_Ready(&JsProxyType) || PyType_Ready(&JsBoundMethodType));
+  return (PyType_Ready(&JsProxyType) || PyType_Ready(&JsBoundMethodType) ||
+          PyType_Ready(&JsIteratorType) || jsproxy_init_js());
 }
@@ -8,7 +8,7 @@
 extern PyObject* globals;
 
 int
-_pyimport(char* name)
+_pyimport(char* name, int max_depth, int max_size)
 {
   PyObject* pyname = PyUnicode_FromString(name);
   PyObject* pyval = PyDict_GetItem(globals, pyname);
@@ -18,16 +18,16 @@ _pyimport(char* name)
   }
 
   Py_DECREF(pyname);
-  int idval = python2js(pyval);
-  Py_DECREF(pyval);
-  return idval;
+  // pyval is a borrowed reference
+  return python2js_with_policy(pyval, max_depth, max_size);
 }
 
 EM_JS(int, pyimport_init, (), {
-  Module.pyimport = function(name)
+  Module.pyimport = function(name, options)
   {
+    var policy = Module.python2js_policy(options);
     var pyname = allocate(intArrayFromString(name), 'i8', ALLOC_NORMAL);
-    var idresult = Module.__pyimport(pyname);
+    var idresult = Module.__pyimport(pyname, policy[0], policy[1]);
     jsresult = Module.hiwire_get_value(idresult);
     Module.hiwire_decref(idresult);
     _free(pyname);
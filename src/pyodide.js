@@ -32,6 +32,24 @@ var languagePluginLoader = new Promise((resolve, reject) => {
     }
   };
 
+  // Loads a script with a <script> tag, or with importScripts in a web worker,
+  // which has no document. `self` is the global scope in both cases.
+  let loadScript = (url) => {
+    if (self.document === undefined) {
+      return new Promise((resolve) => {
+        importScripts(url);
+        resolve();
+      });
+    }
+    return new Promise((resolve, reject) => {
+      let script = document.createElement('script');
+      script.src = url;
+      script.onload = () => { resolve(); };
+      script.onerror = (e) => { reject(e); };
+      document.head.appendChild(script);
+    });
+  };
+
   // clang-format off
   let preloadWasm = () => {
     // On Chrome, we have to instantiate wasm asynchronously. Since that
@@ -77,8 +95,8 @@ var languagePluginLoader = new Promise((resolve, reject) => {
 
   let _loadPackage = (names) => {
     // DFS to find all dependencies of the requested packages
-    let packages = window.pyodide._module.packages.dependencies;
-    let loadedPackages = window.pyodide.loadedPackages;
+    let packages = self.pyodide._module.packages.dependencies;
+    let loadedPackages = self.pyodide.loadedPackages;
     let queue = [].concat(names || []);
     let toLoad = new Array();
     while (queue.length) {
@@ -123,7 +141,7 @@ var languagePluginLoader = new Promise((resolve, reject) => {
       }
     }
 
-    window.pyodide._module.locateFile = (path) => {
+    self.pyodide._module.locateFile = (path) => {
       // handle packages loaded from custom URLs
       let package = path.replace(/\.data$/, "");
       if (package in toLoad) {
@@ -140,12 +158,12 @@ var languagePluginLoader = new Promise((resolve, reject) => {
         resolve('No new packages to load');
       }
 
-      window.pyodide._module.monitorRunDependencies = (n) => {
+      self.pyodide._module.monitorRunDependencies = (n) => {
         if (n === 0) {
           for (let package in toLoad) {
-            window.pyodide.loadedPackages[package] = toLoad[package];
+            self.pyodide.loadedPackages[package] = toLoad[package];
           }
-          delete window.pyodide._module.monitorRunDependencies;
+          delete self.pyodide._module.monitorRunDependencies;
           const packageList = Array.from(Object.keys(toLoad)).join(', ');
           if (!isFirefox) {
             preloadWasm().then(() => {resolve(`Loaded ${packageList}`)});
@@ -156,26 +174,23 @@ var languagePluginLoader = new Promise((resolve, reject) => {
       };
 
       for (let package in toLoad) {
-        let script = document.createElement('script');
         let package_uri = toLoad[package];
         if (package_uri == 'default channel') {
-          script.src = `${baseURL}${package}.js`;
+          loadScript(`${baseURL}${package}.js`).catch(reject);
         } else {
-          script.src = `${package_uri}`;
+          loadScript(`${package_uri}`).catch(reject);
         }
-        script.onerror = (e) => { reject(e); };
-        document.body.appendChild(script);
       }
 
       // We have to invalidate Python's import caches, or it won't
       // see the new files. This is done here so it happens in parallel
       // with the fetching over the network.
-      window.pyodide.runPython('import importlib as _importlib\n' +
-                               '_importlib.invalidate_caches()\n');
+      self.pyodide.runPython('import importlib as _importlib\n' +
+                             '_importlib.invalidate_caches()\n');
     });
 
-    if (window.iodide !== undefined) {
-      window.iodide.evalQueue.await([ promise ]);
+    if (self.iodide !== undefined) {
+      self.iodide.evalQueue.await([ promise ]);
     }
 
     return promise;
@@ -219,8 +234,10 @@ var languagePluginLoader = new Promise((resolve, reject) => {
   ////////////////////////////////////////////////////////////
   // Rearrange namespace for public API
   let PUBLIC_API = [
+    'hiwireStats',
     'loadPackage',
     'loadedPackages',
+    'markDirty',
     'pyimport',
     'repr',
     'runPython',
@@ -239,7 +256,7 @@ var languagePluginLoader = new Promise((resolve, reject) => {
   // Loading Pyodide
   let wasmURL = `${baseURL}pyodide.asm.wasm`;
   let Module = {};
-  window.Module = Module;
+  self.Module = Module;
 
   Module.noImageDecoding = true;
   Module.noAudioDecoding = true;
@@ -247,7 +264,17 @@ var languagePluginLoader = new Promise((resolve, reject) => {
   Module.preloadedWasm = {};
   let isFirefox = navigator.userAgent.toLowerCase().indexOf('firefox') > -1;
 
-  let wasm_promise = WebAssembly.compileStreaming(fetch(wasmURL));
+  // A module that was already compiled, such as by another web worker, can be
+  // passed in as `self.pyodideWasmModule`. Otherwise, the compiled module is
+  // kept there, so that it can be passed on.
+  let wasm_promise;
+  if (self.pyodideWasmModule !== undefined) {
+    wasm_promise = Promise.resolve(self.pyodideWasmModule);
+  } else {
+    wasm_promise =
+        WebAssembly.compileStreaming(fetch(wasmURL))
+            .then((module) => { return self.pyodideWasmModule = module; });
+  }
   Module.instantiateWasm = (info, receiveInstance) => {
     wasm_promise.then(module => WebAssembly.instantiate(module, info))
         .then(instance => receiveInstance(instance));
@@ -257,13 +284,13 @@ var languagePluginLoader = new Promise((resolve, reject) => {
   Module.locateFile = (path) => baseURL + path;
   var postRunPromise = new Promise((resolve, reject) => {
     Module.postRun = () => {
-      delete window.Module;
+      delete self.Module;
       fetch(`${baseURL}packages.json`)
           .then((response) => response.json())
           .then((json) => {
-            fixRecursionLimit(window.pyodide);
-            window.pyodide = makePublicAPI(window.pyodide, PUBLIC_API);
-            window.pyodide._module.packages = json;
+            fixRecursionLimit(self.pyodide);
+            self.pyodide = makePublicAPI(self.pyodide, PUBLIC_API);
+            self.pyodide._module.packages = json;
             resolve();
           });
     };
@@ -281,28 +308,23 @@ var languagePluginLoader = new Promise((resolve, reject) => {
 
   Promise.all([ postRunPromise, dataLoadPromise ]).then(() => resolve());
 
-  let data_script = document.createElement('script');
-  data_script.src = `${baseURL}pyodide.asm.data.js`;
-  data_script.onload = (event) => {
-    let script = document.createElement('script');
-    script.src = `${baseURL}pyodide.asm.js`;
-    script.onload = () => {
-      // The emscripten module needs to be at this location for the core
-      // filesystem to install itself. Once that's complete, it will be replaced
-      // by the call to `makePublicAPI` with a more limited public API.
-      window.pyodide = pyodide(Module);
-      window.pyodide.loadedPackages = new Array();
-      window.pyodide.loadPackage = loadPackage;
-    };
-    document.head.appendChild(script);
-  };
-
-  document.head.appendChild(data_script);
+  loadScript(`${baseURL}pyodide.asm.data.js`)
+      .then(() => loadScript(`${baseURL}pyodide.asm.js`))
+      .then(() => {
+        // The emscripten module needs to be at this location for the core
+        // filesystem to install itself. Once that's complete, it will be
+        // replaced by the call to `makePublicAPI` with a more limited public
+        // API.
+        self.pyodide = pyodide(Module);
+        self.pyodide.loadedPackages = new Array();
+        self.pyodide.loadPackage = loadPackage;
+      })
+      .catch(reject);
 
   ////////////////////////////////////////////////////////////
   // Iodide-specific functionality, that doesn't make sense
   // if not using with Iodide.
-  if (window.iodide !== undefined) {
+  if (self.iodide !== undefined) {
     // Load the custom CSS for Pyodide
     let link = document.createElement('link');
     link.rel = 'stylesheet';
@@ -311,7 +333,7 @@ var languagePluginLoader = new Promise((resolve, reject) => {
     document.getElementsByTagName('head')[0].appendChild(link);
 
     // Add a custom output handler for Python objects
-    window.iodide.addOutputHandler({
+    self.iodide.addOutputHandler({
       shouldHandle : (val) => {
         return (typeof val === 'function' &&
                 pyodide._module.PyProxy.isPyProxy(val));
@@ -5,11 +5,20 @@ A library of helper utilities for connecting Python to the browser environment.
 from js import XMLHttpRequest
 
 import ast
+import collections
+import functools
 import io
 
 __version__ = '0.1.0'
 
 
+# Used by the Python to Javascript conversion code in python2js.c
+_python2js_converters = {}
+
+# Used by the Javascript iteration code in jsproxy.c
+_jsproxy_options = {'iteration_chunk_size': 256}
+
+
 def open_url(url):
     """
     Fetches a given *url* and returns a io.StringIO to access its contents.
@@ -20,10 +29,290 @@ def open_url(url):
     return io.StringIO(req.response)
 
 
-def eval_code(code, ns):
+# Synchronous requests can't return an ArrayBuffer on the main thread. With
+# this charset, the bytes 0x80 to 0xFF of the response are read as the
+# characters U+F780 to U+F7FF, which this table maps back.
+_X_USER_DEFINED = {0xF700 + b: b for b in range(0x80, 0x100)}
+
+
+class HttpRangeFile(io.RawIOBase):
     """
-    Runs a string of code, the last part of which may be an expression.
+    A read-only, seekable binary file object for a given *url*, which
+    downloads only the parts of it that are read.
+
+    The file is fetched in blocks of *block_size* bytes with HTTP Range
+    requests, and the *max_blocks* most recently used blocks are kept. When
+    reads are sequential, the following *prefetch_blocks* blocks are fetched in
+    the same request. If the server doesn't support Range requests, the whole
+    file is downloaded by the first request.
     """
+
+    def __init__(self, url, block_size=1 << 20, max_blocks=16,
+                 prefetch_blocks=4):
+        super().__init__()
+        self.url = url
+        self.block_size = max(1, int(block_size))
+        self.max_blocks = max(1, int(max_blocks))
+        self.prefetch_blocks = max(0, int(prefetch_blocks))
+        self.size = None
+        self._blocks = collections.OrderedDict()
+        self._last_block = None
+        self._position = 0
+        self._fetch(0, 1)
+
+    def _fetch(self, index, count):
+        start = index * self.block_size
+        stop = start + count * self.block_size
+        if self.size is not None:
+            stop = min(stop, self.size)
+
+        req = XMLHttpRequest.new()
+        req.open('GET', self.url, False)
+        req.overrideMimeType('text/plain; charset=x-user-defined')
+        req.setRequestHeader('Range', 'bytes={}-{}'.format(start, stop - 1))
+        req.send(None)
+
+        if req.status == 416 and self.size is None:
+            self.size = 0
+            return
+        if req.status not in (200, 206):
+            raise OSError('{} {} fetching {}'.format(
+                req.status, req.statusText, self.url))
+        data = req.responseText.translate(_X_USER_DEFINED).encode('latin-1')
+
+        if req.status == 200:
+            # The server sent the whole file, which is kept as a single block
+            self.size = len(data)
+            self.block_size = max(1, self.size)
+            self._blocks.clear()
+            self._blocks[0] = data
+            return
+
+        if self.size is None:
+            content_range = req.getResponseHeader('Content-Range') or ''
+            try:
+                self.size = int(content_range.rpartition('/')[2])
+            except ValueError:
+                raise OSError('Invalid Content-Range {!r} fetching {}'.format(
+                    content_range, self.url))
+        for i in range(0, len(data), self.block_size):
+            self._blocks[index] = data[i:i + self.block_size]
+            self._blocks.move_to_end(index)
+            index += 1
+        while len(self._blocks) > self.max_blocks:
+            self._blocks.popitem(last=False)
+
+    def _get_block(self, index):
+        block = self._blocks.get(index)
+        if block is None:
+            count = 1
+            if self._last_block == index - 1:
+                count = min(1 + self.prefetch_blocks, self.max_blocks)
+            self._fetch(index, count)
+            block = self._blocks[index]
+        else:
+            self._blocks.move_to_end(index)
+        self._last_block = index
+        return block
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError('Invalid whence ({})'.format(whence))
+        if position < 0:
+            raise ValueError('Negative seek position {}'.format(position))
+        self._position = position
+        return position
+
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast('B')
+        count = 0
+        while count < len(view) and self._position < self.size:
+            index, offset = divmod(self._position, self.block_size)
+            block = memoryview(self._get_block(index))
+            chunk = block[offset:offset + len(view) - count]
+            if not chunk:
+                break
+            view[count:count + len(chunk)] = chunk
+            count += len(chunk)
+            self._position += len(chunk)
+        return count
+
+
+class _Promise:
+    """
+    Makes a Javascript promise awaitable from a coroutine run by a `Task`.
+    """
+    __slots__ = ('promise',)
+
+    def __init__(self, promise):
+        self.promise = promise
+
+    def __await__(self):
+        return (yield self.promise)
+
+
+class Task:
+    """
+    Runs a coroutine, or any other awaitable, that awaits Javascript promises,
+    such as those of `fetch_bytes`, resuming it each time a promise settles.
+
+    The coroutine starts running immediately, until its first await. A task
+    can itself be awaited by another coroutine run by a task, which then
+    receives its result.
+    """
+
+    def __init__(self, awaitable):
+        from js import Promise
+        self._coro = awaitable.__await__()
+        self._done = False
+        self._result = None
+        self._exception = None
+        self._callbacks = []
+        # Kept so that the same Python callbacks are passed to Javascript each
+        # time
+        self._on_resolve = self._step
+        self._on_reject = self._reject
+        self._promise = Promise.new(self._start)
+        self._step()
+
+    def _start(self, resolve, reject):
+        self._resolve_promise = resolve
+
+    def _reject(self, error):
+        if not isinstance(error, BaseException):
+            error = RuntimeError(str(error))
+        self._step(error=error)
+
+    def _step(self, value=None, error=None):
+        try:
+            if error is None:
+                promise = self._coro.send(value)
+            else:
+                promise = self._coro.throw(error)
+        except StopIteration as e:
+            self._finish(e.value, None)
+        except BaseException as e:
+            self._finish(None, e)
+        else:
+            if getattr(promise, 'then', None) is None:
+                self._step(error=TypeError(
+                    'Tasks can only await Javascript promises, got {!r}'
+                    .format(promise)))
+            else:
+                promise.then(self._on_resolve, self._on_reject)
+
+    def _finish(self, result, exception):
+        self._done = True
+        self._result = result
+        self._exception = exception
+        # The promise only signals that the task is done. The result stays in
+        # Python, and is never converted to Javascript.
+        self._resolve_promise()
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+    def __await__(self):
+        if not self._done:
+            yield self._promise
+        return self.result()
+
+    def done(self):
+        """
+        Returns whether the coroutine has returned or raised an exception.
+        """
+        return self._done
+
+    def result(self):
+        """
+        Returns the result of the coroutine, or raises its exception.
+        """
+        if not self._done:
+            raise RuntimeError('Task is not done yet')
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self):
+        """
+        Returns the exception raised by the coroutine, if any.
+        """
+        if not self._done:
+            raise RuntimeError('Task is not done yet')
+        return self._exception
+
+    def add_done_callback(self, callback):
+        """
+        Calls *callback* with the task once it is done, or immediately if it
+        is already done.
+        """
+        if self._done:
+            callback(self)
+        else:
+            self._callbacks.append(callback)
+
+
+def run_async(awaitable):
+    """
+    Starts running *awaitable* in a `Task`, and returns the task.
+    """
+    return Task(awaitable)
+
+
+async def gather(*awaitables):
+    """
+    Runs the *awaitables* concurrently, and returns the list of their results.
+    The first exception raised by any of them is raised.
+    """
+    tasks = [a if isinstance(a, Task) else Task(a) for a in awaitables]
+    for task in tasks:
+        await task
+    return [task.result() for task in tasks]
+
+
+async def fetch_bytes(url):
+    """
+    Fetches a given *url* without blocking, and returns its contents as bytes.
+    Raises OSError if the response has an HTTP error status.
+    """
+    # fetch has to be called on the global scope, which is `self` both in the
+    # main thread and in web workers
+    from js import self as global_scope
+    response = await _Promise(global_scope.fetch(url))
+    if not response.ok:
+        raise OSError('{} {} fetching {}'.format(
+            response.status, response.statusText, url))
+    # The ArrayBuffer is passed to Python as a memoryview of a single copy
+    buffer = await _Promise(response.arrayBuffer())
+    return bytes(buffer)
+
+
+async def open_url_async(url):
+    """
+    Fetches a given *url* without blocking, and returns an io.BytesIO to access
+    its contents.
+    """
+    return io.BytesIO(await fetch_bytes(url))
+
+
+def _compile_code(code):
+    # Splits off the last part of the code if it is an expression, and
+    # compiles both parts. Either may be None.
     mod = ast.parse(code)
     if isinstance(mod.body[-1], ast.Expr):
         expr = ast.Expression(mod.body[-1].value)
@@ -32,11 +321,202 @@ def eval_code(code, ns):
         expr = None
 
     if len(mod.body):
-        exec(compile(mod, '<exec>', mode='exec'), ns, ns)
+        mod = compile(mod, '<exec>', mode='exec')
+    else:
+        mod = None
     if expr is not None:
-        return eval(compile(expr, '<eval>', mode='eval'), ns, ns)
+        expr = compile(expr, '<eval>', mode='eval')
+    return mod, expr
+
+
+# The code objects don't depend on the namespace, so code that is run
+# repeatedly is only parsed and compiled once
+_compile_code_cached = functools.lru_cache(maxsize=128)(_compile_code)
+
+
+def eval_code(code, ns):
+    """
+    Runs a string of code, the last part of which may be an expression.
+    """
+    mod, expr = _compile_code_cached(code)
+    if mod is not None:
+        exec(mod, ns, ns)
+    if expr is not None:
+        return eval(expr, ns, ns)
     else:
         return None
 
 
-__all__ = ['open_url', 'eval_code']
+def set_code_cache_size(size):
+    """
+    Sets the maximum number of distinct pieces of code whose compiled form is
+    kept by `eval_code`, and clears the cache. The least recently used code is
+    dropped first. Set *size* to 0 to disable the cache.
+    """
+    global _compile_code_cached
+    _compile_code_cached = functools.lru_cache(maxsize=max(0, int(size)))(
+        _compile_code)
+
+
+def code_cache_info():
+    """
+    Returns the statistics of the compiled code cache of `eval_code`, as a
+    named tuple of `hits`, `misses`, `maxsize` and `currsize`.
+    """
+    return _compile_code_cached.cache_info()
+
+
+def _python2js_clear_converter_cache():
+    # Replaced by the C implementation in python2js.c at initialization
+    pass
+
+
+def _python2js_set_typed_array_threshold(threshold):
+    # Replaced by the C implementation in python2js.c at initialization
+    pass
+
+
+def _python2js_set_error_logging(enabled):
+    # Replaced by the C implementation in python2js.c at initialization
+    pass
+
+
+def register_converter(cls, converter):
+    """
+    Registers a function to convert instances of *cls* (and its subclasses)
+    when they are passed to Javascript.
+
+    *converter* is called with the object, and should return another Python
+    object which is then converted to Javascript in its place. If it returns
+    the object itself, the object is passed to Javascript as a proxy.
+
+    Converters can be registered for subclasses of the built-in types that are
+    converted by value, but not for those types themselves.
+    """
+    if cls in (type(None), bool, int, float, str, bytes, list, dict):
+        raise TypeError(
+            "Can not register a converter for '{}'".format(cls.__name__))
+    _python2js_converters[cls] = converter
+    _python2js_clear_converter_cache()
+
+
+class BufferCopy:
+    """
+    Wraps an object supporting the buffer protocol, such as a bytearray or
+    memoryview, so that it is passed to Javascript as a typed array holding a
+    copy of its data, rather than one viewing the WebAssembly memory.
+
+    The copy remains valid after the object is changed or freed, and after the
+    WebAssembly memory grows.
+    """
+    __slots__ = ('buffer',)
+
+    def __init__(self, obj):
+        self.buffer = memoryview(obj)
+
+
+def set_iteration_chunk_size(size):
+    """
+    Sets the maximum number of elements fetched at a time when iterating over
+    a Javascript iterable from Python.
+
+    Elements are fetched ahead of the loop, so a Javascript iterator may be
+    advanced by up to *size* elements more than the loop has consumed. Set
+    *size* to 1 to fetch one element at a time.
+    """
+    _jsproxy_options['iteration_chunk_size'] = max(1, int(size))
+
+
+def set_error_logging(enabled):
+    """
+    Sets whether the full traceback of Python exceptions passed to Javascript
+    is also printed to the console, as it is formatted by Python. This is
+    disabled by default, since the traceback is available from the message of
+    the Javascript error.
+    """
+    _python2js_set_error_logging(bool(enabled))
+
+
+def _typed_array_proxy(obj):
+    # Follows the chain of Numpy array bases and memoryviews back to the
+    # JsProxy of the typed array they were created from
+    while type(obj).__name__ != 'JsProxy':
+        if isinstance(obj, memoryview):
+            obj = obj.obj
+        elif getattr(obj, 'base', None) is not None:
+            obj = obj.base
+        else:
+            raise TypeError(
+                'Object was not created from a Javascript typed array')
+    return obj
+
+
+def as_nparray(obj):
+    """
+    Returns a Numpy array for the Javascript typed array *obj*, with the
+    matching data type.
+
+    If the typed array has `shape` and `strides` members (with the strides in
+    elements), as typed arrays converted from Numpy arrays do, the Numpy array
+    has the same shape and strides. Otherwise it is one-dimensional.
+
+    A typed array on the WebAssembly heap is shared without any copy. Other
+    typed arrays are copied once, and changes made from Python are only
+    written back to the typed array by `sync`.
+    """
+    import numpy as np
+    return np.asarray(writable_view(obj))
+
+
+def writable_view(obj):
+    """
+    Returns a writable memoryview of the Javascript typed array *obj*.
+
+    Typed arrays that are not on the WebAssembly heap are passed to Python as
+    read-only memoryviews of a copy. Changes made through a writable view are
+    written back to the typed array when the last writable view is released,
+    or earlier by `sync`.
+    """
+    return _typed_array_proxy(obj)._writable_view()
+
+
+def sync(obj):
+    """
+    Writes changes made from Python to a typed array back to Javascript.
+
+    *obj* is a memoryview of a Javascript typed array, or a Numpy array
+    created from one with `as_nparray`. Typed arrays on the WebAssembly heap
+    are shared, and need no syncing.
+    """
+    _typed_array_proxy(obj)._sync()
+
+
+def set_typed_array_threshold(threshold):
+    """
+    Sets the minimum length of lists that are converted to Javascript typed
+    arrays.
+
+    A list of at least *threshold* elements that are all floats is converted
+    to a Float64Array, and one whose elements are all ints between -2**31 and
+    2**31 - 1 to an Int32Array, rather than an Array. Set *threshold* to 1 to
+    do this for all such lists, or to 0 to never do it.
+    """
+    _python2js_set_typed_array_threshold(int(threshold))
+
+
+def __getattr__(name):
+    # WorkerPoolExecutor is only imported once it is used, since this module is
+    # imported at startup
+    if name == 'WorkerPoolExecutor':
+        from _pyodide_workers import WorkerPoolExecutor
+        return WorkerPoolExecutor
+    raise AttributeError(
+        "module 'pyodide' has no attribute '{}'".format(name))
+
+
+__all__ = ['open_url', 'eval_code', 'register_converter',
+           'set_typed_array_threshold', 'BufferCopy', 'as_nparray',
+           'writable_view', 'sync', 'set_error_logging',
+           'set_iteration_chunk_size', 'set_code_cache_size',
+           'code_cache_info', 'Task', 'run_async', 'gather', 'fetch_bytes',
+           'open_url_async', 'HttpRangeFile', 'WorkerPoolExecutor']
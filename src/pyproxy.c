@@ -5,23 +5,126 @@
 #include "js2python.h"
 #include "python2js.h"
 
+// The traps take attribute names as Python strings, made by
+// Module.PyProxy.keyToPy. 0 stands for a key that isn't a string (a Symbol).
+
+int
+_pyproxy_key(int ptrname, int length, int intern)
+{
+  PyObject* pykey = PyUnicode_FromStringAndSize((char*)ptrname, length);
+  if (pykey == NULL) {
+    PyErr_Clear();
+    return 0;
+  }
+  if (intern) {
+    PyUnicode_InternInPlace(&pykey);
+  }
+  return (int)pykey;
+}
+
 int
-_pyproxy_has(int ptrobj, int idkey)
+_pyproxy_key_utf8(int ptrkey)
+{
+  PyObject* pykey = (PyObject*)ptrkey;
+  const char* utf8 = PyUnicode_Check(pykey) ? PyUnicode_AsUTF8(pykey) : NULL;
+  if (utf8 == NULL) {
+    PyErr_Clear();
+    return 0;
+  }
+  return (int)utf8;
+}
+
+/* Lists and dicts are only passed to Javascript as proxies by the lazy
+ * conversion policies (see python2js_with_policy), so proxies for them give
+ * access to their items, which are converted when they are accessed.
+ *
+ * Returns a borrowed reference to the item for the key, or NULL if there is
+ * none. */
+static PyObject*
+_pyproxy_find_item(PyObject* pyobj, PyObject* pykey)
+{
+  if (PyDict_Check(pyobj)) {
+    PyObject* pyitem = PyDict_GetItemWithError(pyobj, pykey);
+    if (pyitem == NULL) {
+      PyErr_Clear();
+    }
+    return pyitem;
+  }
+  if (!PyUnicode_Check(pykey)) {
+    return NULL;
+  }
+  PyObject* pyindex = PyLong_FromUnicodeObject(pykey, 10);
+  if (pyindex == NULL) {
+    PyErr_Clear();
+    return NULL;
+  }
+  Py_ssize_t index = PyLong_AsSsize_t(pyindex);
+  Py_DECREF(pyindex);
+  if (index < 0 || index >= PyList_GET_SIZE(pyobj)) {
+    PyErr_Clear();
+    return NULL;
+  }
+  return PyList_GET_ITEM(pyobj, index);
+}
+
+static int
+_pyproxy_is_length(PyObject* pyobj, PyObject* pykey)
+{
+  return PyList_Check(pyobj) && PyUnicode_Check(pykey) &&
+         PyUnicode_CompareWithASCIIString(pykey, "length") == 0;
+}
+
+int
+_pyproxy_has(int ptrobj, int ptrkey)
 {
   PyObject* pyobj = (PyObject*)ptrobj;
-  PyObject* pykey = js2python(idkey);
-  int result = PyObject_HasAttr(pyobj, pykey) ? hiwire_true() : hiwire_false();
-  Py_DECREF(pykey);
-  return result;
+  PyObject* pykey = (PyObject*)ptrkey;
+  if (pykey == NULL) {
+    return 0;
+  }
+  if (PyDict_Check(pyobj) || PyList_Check(pyobj)) {
+    if (_pyproxy_is_length(pyobj, pykey) ||
+        _pyproxy_find_item(pyobj, pykey) != NULL) {
+      return 1;
+    }
+  }
+  return PyObject_HasAttr(pyobj, pykey);
+}
+
+/* Converts an item of a list or dict under the conversion policy carried by
+ * its proxy. Returns 0 if the key isn't an item. */
+static int
+_pyproxy_get_item(PyObject* pyobj, PyObject* pykey, int depth, int max_size)
+{
+  if (_pyproxy_is_length(pyobj, pykey)) {
+    return hiwire_int(PyList_GET_SIZE(pyobj));
+  }
+  PyObject* pyitem = _pyproxy_find_item(pyobj, pykey);
+  if (pyitem == NULL) {
+    return 0;
+  }
+  // Converters may run Python code that changes the container
+  Py_INCREF(pyitem);
+  int iditem = python2js_with_policy(pyitem, depth, max_size);
+  Py_DECREF(pyitem);
+  return iditem;
 }
 
 int
-_pyproxy_get(int ptrobj, int idkey)
+_pyproxy_get(int ptrobj, int ptrkey, int depth, int max_size)
 {
   PyObject* pyobj = (PyObject*)ptrobj;
-  PyObject* pykey = js2python(idkey);
+  PyObject* pykey = (PyObject*)ptrkey;
+  if (pykey == NULL) {
+    return hiwire_undefined();
+  }
+  if (PyDict_Check(pyobj) || PyList_Check(pyobj)) {
+    int iditem = _pyproxy_get_item(pyobj, pykey, depth, max_size);
+    if (iditem != 0) {
+      return iditem;
+    }
+  }
   PyObject* pyattr = PyObject_GetAttr(pyobj, pykey);
-  Py_DECREF(pykey);
   if (pyattr == NULL) {
     PyErr_Clear();
     return hiwire_undefined();
@@ -32,30 +135,45 @@ _pyproxy_get(int ptrobj, int idkey)
   return idattr;
 };
 
+static int
+_pyproxy_check_key(int ptrkey)
+{
+  if (ptrkey == 0) {
+    PyErr_SetString(PyExc_TypeError, "attribute name must be string");
+    return -1;
+  }
+  return 0;
+}
+
 int
-_pyproxy_set(int ptrobj, int idkey, int idval)
+_pyproxy_set(int ptrobj, int ptrkey, int idval)
 {
+  if (_pyproxy_check_key(ptrkey)) {
+    return pythonexc2js();
+  }
   PyObject* pyobj = (PyObject*)ptrobj;
-  PyObject* pykey = js2python(idkey);
   PyObject* pyval = js2python(idval);
-  int result = PyObject_SetAttr(pyobj, pykey, pyval);
-  Py_DECREF(pykey);
+  if (pyval == NULL) {
+    return pythonexc2js();
+  }
+  int result = PyObject_SetAttr(pyobj, (PyObject*)ptrkey, pyval);
   Py_DECREF(pyval);
 
   if (result) {
     return pythonexc2js();
   }
-  return idval;
+  return hiwire_incref(idval);
 }
 
 int
-_pyproxy_deleteProperty(int ptrobj, int idkey)
+_pyproxy_deleteProperty(int ptrobj, int ptrkey)
 {
+  if (_pyproxy_check_key(ptrkey)) {
+    return pythonexc2js();
+  }
   PyObject* pyobj = (PyObject*)ptrobj;
-  PyObject* pykey = js2python(idkey);
 
-  int ret = PyObject_DelAttr(pyobj, pykey);
-  Py_DECREF(pykey);
+  int ret = PyObject_DelAttr(pyobj, (PyObject*)ptrkey);
 
   if (ret) {
     return pythonexc2js();
@@ -64,24 +182,46 @@ _pyproxy_deleteProperty(int ptrobj, int idkey)
   return hiwire_undefined();
 }
 
+EM_JS(int, pyproxy_keys_to_js, (int ptrkeys, int n), {
+  var jskeys = [];
+  for (var i = 0; i < n; ++i) {
+    var jskey = Module.PyProxy.keyToJs(Module.HEAP32[(ptrkeys >> 2) + i]);
+    // clang-format off
+    if (jskey !== undefined) {
+      // clang-format on
+      jskeys.push(jskey);
+    }
+  }
+  return Module.hiwire_new_value(jskeys);
+});
+
+EM_JS(int, pyproxy_list_keys_to_js, (int length), {
+  var jskeys = [];
+  for (var i = 0; i < length; ++i) {
+    jskeys.push(String(i));
+  }
+  jskeys.push('length');
+  return Module.hiwire_new_value(jskeys);
+});
+
 int
 _pyproxy_ownKeys(int ptrobj)
 {
   PyObject* pyobj = (PyObject*)ptrobj;
-  PyObject* pydir = PyObject_Dir(pyobj);
+  // The keys of lists and dicts are their items, as for get
+  if (PyList_Check(pyobj)) {
+    return pyproxy_list_keys_to_js(PyList_GET_SIZE(pyobj));
+  }
+  PyObject* pydir =
+    PyDict_Check(pyobj) ? PyDict_Keys(pyobj) : PyObject_Dir(pyobj);
 
   if (pydir == NULL) {
     return pythonexc2js();
   }
 
-  int iddir = hiwire_array();
-  Py_ssize_t n = PyList_Size(pydir);
-  for (Py_ssize_t i = 0; i < n; ++i) {
-    PyObject* pyentry = PyList_GetItem(pydir, i);
-    int identry = python2js(pyentry);
-    hiwire_push_array(iddir, identry);
-    hiwire_decref(identry);
-  }
+  // The names are looked up in the key cache straight from the list's array
+  int iddir = pyproxy_keys_to_js((int)PySequence_Fast_ITEMS(pydir),
+                                 PySequence_Fast_GET_SIZE(pydir));
   Py_DECREF(pydir);
 
   return iddir;
@@ -93,45 +233,203 @@ _pyproxy_enumerate(int ptrobj)
   return _pyproxy_ownKeys(ptrobj);
 }
 
+// Calls ptrobj with the nargs Python objects at ptrargs, which the caller has
+// already converted, and whose references are stolen. A NULL among them means
+// that their conversion failed. idkwargs, if not 0, is a Javascript object
+// holding the keyword arguments. If discard is set, the result is not
+// converted, and 0 is returned instead.
 int
-_pyproxy_apply(int ptrobj, int idargs)
+_pyproxy_apply(int ptrobj, int ptrargs, int nargs, int idkwargs, int discard)
 {
   PyObject* pyobj = (PyObject*)ptrobj;
-  Py_ssize_t length = hiwire_get_length(idargs);
-  PyObject* pyargs = PyTuple_New(length);
-  for (Py_ssize_t i = 0; i < length; ++i) {
-    int iditem = hiwire_get_member_int(idargs, i);
-    PyObject* pyitem = js2python(iditem);
-    PyTuple_SET_ITEM(pyargs, i, pyitem);
-    hiwire_decref(iditem);
-  }
-  PyObject* pyresult = PyObject_Call(pyobj, pyargs, NULL);
+  PyObject** pyargs = (PyObject**)ptrargs;
+  PyObject* pykwargs = NULL;
+  PyObject* pyresult = NULL;
+  int ok = 1;
+
+  for (int i = 0; i < nargs; ++i) {
+    if (pyargs[i] == NULL) {
+      ok = 0;
+    }
+  }
+  if (ok && idkwargs != 0) {
+    pykwargs = js2python_deep(idkwargs, 1);
+    if (pykwargs != NULL && !PyDict_Check(pykwargs)) {
+      PyErr_SetString(PyExc_TypeError,
+                      "keyword arguments must be given as an Object");
+      Py_CLEAR(pykwargs);
+    }
+    ok = pykwargs != NULL;
+  }
+  if (ok) {
+    // Passes the arguments without building a tuple, which Python functions
+    // don't need
+    pyresult = _PyObject_FastCallDict(pyobj, pyargs, nargs, pykwargs);
+  }
+
+  for (int i = 0; i < nargs; ++i) {
+    Py_XDECREF(pyargs[i]);
+  }
+  Py_XDECREF(pykwargs);
   if (pyresult == NULL) {
-    Py_DECREF(pyargs);
     return pythonexc2js();
   }
-  int idresult = python2js(pyresult);
+  int idresult = discard ? 0 : python2js(pyresult);
   Py_DECREF(pyresult);
-  Py_DECREF(pyargs);
   return idresult;
 }
 
+void
+_pyproxy_incref(int ptrobj)
+{
+  PyObject* pyobj = (PyObject*)ptrobj;
+  Py_INCREF(pyobj);
+}
+
 void
 _pyproxy_destroy(int ptrobj)
 {
   PyObject* pyobj = (PyObject*)ptrobj;
-  Py_DECREF(ptrobj);
+  Py_DECREF(pyobj);
 }
 
 EM_JS(int, pyproxy_new, (int ptrobj), {
-  var target = function(){};
-  target['$$'] = { ptr : ptrobj, type : 'PyProxy' };
-  return Module.hiwire_new_value(new Proxy(target, Module.PyProxy));
+  return Module.hiwire_new_value(Module.PyProxy.getProxy(ptrobj));
 });
 
+EM_JS(int, pyproxy_lazy_js, (int ptrobj, int depth, int max_size, int list), {
+  var policy = { depth : depth, maxSize : max_size, list : Boolean(list) };
+  return Module.hiwire_new_value(Module.PyProxy.getProxy(ptrobj, policy));
+});
+
+int
+pyproxy_new_lazy(int ptrobj, int max_depth, int max_size)
+{
+  int list = PyList_Check((PyObject*)ptrobj);
+  return pyproxy_lazy_js(ptrobj, max_depth, max_size, list);
+}
+
 EM_JS(int, pyproxy_init, (), {
   // clang-format off
+  // There is at most one PyProxy per Python object. It is kept in `cache`,
+  // keyed by the PyObject pointer, and owns one reference to the Python
+  // object, which is released by `destroy()`.
+  //
+  // Lists and dicts passed lazily (see python2js_with_policy) also carry the
+  // policy for converting their items, so they have one PyProxy per policy,
+  // keyed by the pointer and the policy.
+  //
+  // Where the browser supports it, the cache only holds weak references, and
+  // the Python object is also released automatically once the PyProxy is
+  // garbage collected.
+  var autoRelease = (typeof FinalizationRegistry !== 'undefined' &&
+                     typeof WeakRef !== 'undefined');
+  var registry;
+  if (autoRelease) {
+    registry = new FinalizationRegistry(function(held) {
+      Module.PyProxy.finalize(held.ptr, held.key);
+    });
+  }
+
+  // Attribute names are passed to Python as interned Python strings, which
+  // are cached both ways, so that repeatedly accessing the same attribute
+  // doesn't encode and decode its name each time. The cache owns a reference
+  // to each string, and is limited in size since it is never emptied.
+  var MAX_KEYS = 4096;
+  var MAX_KEY_LENGTH = 256;
+
   Module.PyProxy = {
+    cache: new Map(),
+    keys: new Map(),
+    names: new Map(),
+    autoRelease: autoRelease,
+    keyToPy: function(jskey) {
+      var ptrkey = this.keys.get(jskey);
+      if (ptrkey !== undefined) {
+        return ptrkey;
+      } else if (typeof jskey !== 'string') {
+        return 0;
+      }
+      var length = lengthBytesUTF8(jskey);
+      var ptrname = _malloc(length + 1);
+      stringToUTF8(jskey, ptrname, length + 1);
+      var intern = (this.keys.size < MAX_KEYS && length <= MAX_KEY_LENGTH);
+      ptrkey = __pyproxy_key(ptrname, length, intern ? 1 : 0);
+      _free(ptrname);
+      if (intern && ptrkey !== 0) {
+        this.keys.set(jskey, ptrkey);
+        this.names.set(ptrkey, jskey);
+      }
+      return ptrkey;
+    },
+    releaseKey: function(ptrkey) {
+      if (ptrkey !== 0 && !this.names.has(ptrkey)) {
+        __pyproxy_destroy(ptrkey);
+      }
+    },
+    keyToJs: function(ptrkey) {
+      var jskey = this.names.get(ptrkey);
+      if (jskey !== undefined) {
+        return jskey;
+      }
+      var ptrname = __pyproxy_key_utf8(ptrkey);
+      if (ptrname === 0) {
+        return undefined;
+      }
+      jskey = UTF8ToString(ptrname);
+      if (this.keys.size < MAX_KEYS && !this.keys.has(jskey)) {
+        __pyproxy_incref(ptrkey);
+        this.keys.set(jskey, ptrkey);
+        this.names.set(ptrkey, jskey);
+      }
+      return jskey;
+    },
+    // Items of lists and dicts that aren't passed lazily, such as list
+    // subclasses with a converter returning themselves, are converted one
+    // level at a time.
+    defaultPolicy: { depth : 1, maxSize : -1, list : false },
+    getProxy: function(ptrobj, policy) {
+      var key = ptrobj;
+      if (policy === undefined) {
+        policy = this.defaultPolicy;
+      } else {
+        key = ptrobj + ':' + policy.depth + ':' + policy.maxSize;
+      }
+      var entry = this.cache.get(key);
+      var proxy = (autoRelease && entry !== undefined) ? entry.deref() : entry;
+      if (proxy === undefined) {
+        __pyproxy_incref(ptrobj);
+        var target = function(){};
+        target['$$'] = {
+          ptr : ptrobj, key : key, policy : policy, type : 'PyProxy'
+        };
+        proxy = new Proxy(target, Module.PyProxy);
+        if (autoRelease) {
+          this.cache.set(key, new WeakRef(proxy));
+          registry.register(proxy, { ptr : ptrobj, key : key }, target['$$']);
+        } else {
+          this.cache.set(key, proxy);
+        }
+      }
+      return proxy;
+    },
+    finalize: function(ptrobj, key) {
+      // A new PyProxy may have been made for the same object in the meantime
+      var entry = this.cache.get(key);
+      if (entry !== undefined && entry.deref() === undefined) {
+        this.cache.delete(key);
+      }
+      __pyproxy_destroy(ptrobj);
+    },
+    destroy: function(jsobj) {
+      var ptrobj = this.getPtr(jsobj);
+      jsobj['$$']['ptr'] = null;
+      this.cache.delete(jsobj['$$']['key']);
+      if (autoRelease) {
+        registry.unregister(jsobj['$$']);
+      }
+      __pyproxy_destroy(ptrobj);
+    },
     getPtr: function(jsobj) {
       var ptr = jsobj['$$']['ptr'];
       if (ptr === null) {
@@ -143,59 +441,77 @@ EM_JS(int, pyproxy_init, (), {
       return jsobj['$$'] !== undefined && jsobj['$$']['type'] === 'PyProxy';
     },
     addExtraKeys: function(result) {
-      result.push('toString');
-      result.push('prototype');
-      result.push('arguments');
-      result.push('caller');
+      // Dicts may already have these keys, and ownKeys can't repeat a key
+      ['toString', 'prototype', 'arguments', 'caller'].forEach(function(key) {
+        if (result.indexOf(key) === -1) {
+          result.push(key);
+        }
+      });
     },
     isExtensible: function() { return true },
     has: function (jsobj, jskey) {
-      ptrobj = this.getPtr(jsobj);
-      var idkey = Module.hiwire_new_value(jskey);
-      var result = __pyproxy_has(ptrobj, idkey) != 0;
-      Module.hiwire_decref(idkey);
+      var ptrobj = this.getPtr(jsobj);
+      var ptrkey = this.keyToPy(jskey);
+      var result = __pyproxy_has(ptrobj, ptrkey) !== 0;
+      this.releaseKey(ptrkey);
       return result;
     },
     get: function (jsobj, jskey) {
       if (jskey === 'toString') {
         return function() {
-          if (window.pyodide.repr === undefined) {
-            window.pyodide.repr = window.pyodide.pyimport('repr');
+          if (self.pyodide.repr === undefined) {
+            self.pyodide.repr = self.pyodide.pyimport('repr');
           }
-          return window.pyodide.repr(jsobj);
+          return self.pyodide.repr(jsobj);
         }
       } else if (jskey === '$$') {
         return jsobj['$$'];
       } else if (jskey === 'destroy') {
-        __pyproxy_destroy(this.getPtr(jsobj));
-        jsobj['$$']['ptr'] = null;
+        var handler = this;
+        return function() { handler.destroy(jsobj); };
+      } else if (jskey === 'callKwargs' || jskey === 'callVoid') {
+        return this.getCaller(jsobj, jskey);
+      }
+      var policy = jsobj['$$']['policy'];
+      if (jskey === Symbol.iterator && policy.list) {
+        return this.getIterator(jsobj);
+      }
+      var ptrobj = this.getPtr(jsobj);
+      var ptrkey = this.keyToPy(jskey);
+      try {
+        var idresult =
+          __pyproxy_get(ptrobj, ptrkey, policy.depth, policy.maxSize);
+      } finally {
+        this.releaseKey(ptrkey);
       }
-      ptrobj = this.getPtr(jsobj);
-      var idkey = Module.hiwire_new_value(jskey);
-      var idresult = __pyproxy_get(ptrobj, idkey);
       var jsresult = Module.hiwire_get_value(idresult);
-      Module.hiwire_decref(idkey);
       Module.hiwire_decref(idresult);
       return jsresult;
     },
     set: function (jsobj, jskey, jsval) {
-      ptrobj = this.getPtr(jsobj);
-      var idkey = Module.hiwire_new_value(jskey);
+      var ptrobj = this.getPtr(jsobj);
+      var ptrkey = this.keyToPy(jskey);
       var idval = Module.hiwire_new_value(jsval);
-      var idresult = __pyproxy_set(ptrobj, idkey, idval);
+      try {
+        var idresult = __pyproxy_set(ptrobj, ptrkey, idval);
+      } finally {
+        this.releaseKey(ptrkey);
+        Module.hiwire_decref(idval);
+      }
       var jsresult = Module.hiwire_get_value(idresult);
-      Module.hiwire_decref(idkey);
-      Module.hiwire_decref(idval);
       Module.hiwire_decref(idresult);
       return jsresult;
     },
     deleteProperty: function (jsobj, jskey) {
-      ptrobj = this.getPtr(jsobj);
-      var idkey = Module.hiwire_new_value(jskey);
-      var idresult = __pyproxy_deleteProperty(ptrobj, idkey);
+      var ptrobj = this.getPtr(jsobj);
+      var ptrkey = this.keyToPy(jskey);
+      try {
+        var idresult = __pyproxy_deleteProperty(ptrobj, ptrkey);
+      } finally {
+        this.releaseKey(ptrkey);
+      }
       var jsresult = Module.hiwire_get_value(idresult);
       Module.hiwire_decref(idresult);
-      Module.hiwire_decref(idkey);
       return jsresult;
     },
     ownKeys: function (jsobj) {
@@ -214,13 +530,88 @@ EM_JS(int, pyproxy_init, (), {
       this.addExtraKeys(jsresult);
       return jsresult;
     },
+    // The function returned for `proxy[Symbol.iterator]` of lazy lists, which
+    // converts each item as it is reached
+    getIterator: function(jsobj) {
+      var handler = this;
+      return function() {
+        var index = 0;
+        return {
+          next: function() {
+            if (index >= handler.get(jsobj, 'length')) {
+              return { done : true, value : undefined };
+            }
+            return { done : false, value : handler.get(jsobj, String(index++)) };
+          },
+        };
+      };
+    },
     apply: function (jsobj, jsthis, jsargs) {
-      ptrobj = this.getPtr(jsobj);
-      var idargs = Module.hiwire_new_value(jsargs);
-      var idresult = __pyproxy_apply(ptrobj, idargs);
+      return this.call(this.getPtr(jsobj), jsargs, undefined, false);
+    },
+    // The functions returned for `proxy.callKwargs` and `proxy.callVoid`.
+    // They are kept on the target, so that the same function is returned each
+    // time, which matters for removeEventListener.
+    getCaller: function(jsobj, jskey) {
+      var target = jsobj['$$'];
+      if (target[jskey] === undefined) {
+        var handler = this;
+        if (jskey === 'callKwargs') {
+          // The last argument is an object of keyword arguments
+          target[jskey] = function() {
+            var jsargs = Array.prototype.slice.call(arguments);
+            var jskwargs = jsargs.pop();
+            return handler.call(handler.getPtr(jsobj), jsargs, jskwargs, false);
+          };
+        } else {
+          // Skips converting the result, for callbacks whose result is unused
+          target[jskey] = function() {
+            handler.call(handler.getPtr(jsobj), arguments, undefined, true);
+          };
+        }
+      }
+      return target[jskey];
+    },
+    // Converts all of the arguments to Python objects and passes them to
+    // Python in a single call
+    call: function(ptrobj, jsargs, jskwargs, discard) {
+      var nargs = jsargs.length;
+      var ptrargs = nargs > 0 ? _malloc(nargs * 4) : 0;
+      var count = 0;
+      try {
+        while (count < nargs) {
+          var ptritem = Module.js2python_value(jsargs[count]);
+          Module.HEAP32[(ptrargs >> 2) + count++] = ptritem;
+          if (ptritem === 0) {
+            break;
+          }
+        }
+      } catch (e) {
+        for (var i = 0; i < count; ++i) {
+          __pyproxy_destroy(Module.HEAP32[(ptrargs >> 2) + i]);
+        }
+        _free(ptrargs);
+        throw e;
+      }
+
+      var idkwargs = 0;
+      if (jskwargs !== undefined && jskwargs !== null) {
+        idkwargs = Module.hiwire_new_value(jskwargs);
+      }
+      try {
+        var idresult = __pyproxy_apply(ptrobj, ptrargs, count, idkwargs,
+                                       discard ? 1 : 0);
+      } finally {
+        _free(ptrargs);
+        if (idkwargs !== 0) {
+          Module.hiwire_decref(idkwargs);
+        }
+      }
+      if (discard) {
+        return undefined;
+      }
       var jsresult = Module.hiwire_get_value(idresult);
       Module.hiwire_decref(idresult);
-      Module.hiwire_decref(idargs);
       return jsresult;
     },
   };
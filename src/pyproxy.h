@@ -7,9 +7,28 @@
 // This implements the Javascript Proxy handler interface as defined here:
 //     https://developer.mozilla.org/en-US/docs/Web/JavaScript/Reference/Global_Objects/Proxy
 
+/** Get the PyProxy for a Python object.
+ *
+ * There is only one PyProxy for each Python object, which is reused as long
+ * as it is alive. The PyProxy holds its own reference to the Python object
+ * until it is destroyed, so the caller keeps its reference.
+ *
+ * Returns: New reference
+ */
 int
 pyproxy_new(int obj);
 
+/** Get the PyProxy for a list or dict passed lazily by python2js_with_policy.
+ *
+ * Its items are converted when they are accessed, under the given policy
+ * (see python2js_with_policy). There is one such PyProxy for each object and
+ * policy.
+ *
+ * Returns: New reference
+ */
+int
+pyproxy_new_lazy(int obj, int max_depth, int max_size);
+
 int
 pyproxy_init();
 
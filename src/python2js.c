@@ -1,132 +1,862 @@
 #include "python2js.h"
 
 #include <emscripten.h>
+#include <frameobject.h>
 
 #include "hiwire.h"
 #include "jsproxy.h"
 #include "pyproxy.h"
 
+/* Whether exceptions passed to Javascript are also printed in full */
+static int log_errors = 0;
+
+/* Called by pyodide.set_error_logging */
+static PyObject*
+_python2js_set_error_logging(PyObject* self, PyObject* enabled)
+{
+  int value = PyObject_IsTrue(enabled);
+  if (value == -1) {
+    return NULL;
+  }
+  log_errors = value;
+  Py_RETURN_NONE;
+}
+
+/* Prints the full traceback of an exception, as Python would. Only used when
+ * error logging is enabled with pyodide.set_error_logging, since it is much
+ * slower than building the PythonError. */
+static void
+_pythonexc2js_log(PyObject* type, PyObject* value, PyObject* traceback)
+{
+  PyObject* pylines = NULL;
+  PyObject* tbmod = PyImport_ImportModule("traceback");
+  if (tbmod != NULL) {
+    pylines = PyObject_CallMethod(tbmod,
+                                  "format_exception",
+                                  "OOO",
+                                  type,
+                                  value,
+                                  traceback == NULL ? Py_None : traceback);
+    Py_DECREF(tbmod);
+  }
+  if (pylines == NULL) {
+    PyErr_Clear();
+    return;
+  }
+
+  PyObject* newline = PyUnicode_FromString("");
+  PyObject* pystr = newline ? PyUnicode_Join(newline, pylines) : NULL;
+  const char* str = pystr ? PyUnicode_AsUTF8(pystr) : NULL;
+  if (str != NULL) {
+    printf("Python exception:\n");
+    printf("%s\n", str);
+  }
+  PyErr_Clear();
+  Py_XDECREF(pystr);
+  Py_XDECREF(newline);
+  Py_DECREF(pylines);
+}
+
+static const char*
+_pythonexc2js_utf8(PyObject* str)
+{
+  const char* result = PyUnicode_AsUTF8(str);
+  if (result == NULL) {
+    PyErr_Clear();
+    return "?";
+  }
+  return result;
+}
+
+EM_JS(int,
+      _pythonexc2js_error,
+      (int ptrtype, int idmessage, int ptrframes, int nframes),
+      {
+        var frames = new Array(nframes);
+        for (var i = 0; i < nframes; ++i) {
+          var frame = (ptrframes >> 2) + 3 * i;
+          frames[i] = {
+            filename : UTF8ToString(Module.HEAP32[frame]),
+            lineno : Module.HEAP32[frame + 1],
+            name : UTF8ToString(Module.HEAP32[frame + 2])
+          };
+        }
+        var message = Module.hiwire_get_value(idmessage);
+        Module.hiwire_decref(idmessage);
+        return Module.hiwire_new_value(
+          new Module.PythonError(UTF8ToString(ptrtype), message, frames));
+      });
+
+EM_JS(void, _pythonexc2js_throw, (int iderror), {
+  var error = Module.hiwire_get_value(iderror);
+  Module.hiwire_decref(iderror);
+  throw error;
+});
+
+/* Converts the active Python exception to a PythonError and throws it.
+ *
+ * Only the exception type, its message and the location of each frame are
+ * collected here. The traceback is formatted from them in Javascript, and
+ * only when the error's message or stack is read. */
 int
 pythonexc2js()
 {
   PyObject* type;
   PyObject* value;
   PyObject* traceback;
-  int no_traceback = 0;
 
   PyErr_Fetch(&type, &value, &traceback);
   PyErr_NormalizeException(&type, &value, &traceback);
 
-  int excval = -1;
-  int exc;
-
   if (type == NULL || type == Py_None || value == NULL || value == Py_None) {
-    excval = hiwire_string_ascii((int)"No exception type or value");
-    PyErr_Print();
+    int excval = hiwire_string_ascii((int)"No exception type or value");
+    Py_XDECREF(type);
+    Py_XDECREF(value);
+    Py_XDECREF(traceback);
     PyErr_Clear();
-    goto exit;
+    hiwire_throw_error(excval);
+    return -1;
   }
 
-  PyObject* tbmod = PyImport_ImportModule("traceback");
-  if (tbmod == NULL) {
-    PyObject* repr = PyObject_Repr(value);
-    if (repr == NULL) {
-      excval = hiwire_string_ascii((int)"Could not get repr for exception");
-    } else {
-      excval = python2js(repr);
-      Py_DECREF(repr);
+  if (log_errors) {
+    _pythonexc2js_log(type, value, traceback);
+  }
+
+  int idmessage = -1;
+  PyObject* pymessage = PyObject_Str(value);
+  if (pymessage != NULL) {
+    idmessage = python2js(pymessage);
+    Py_DECREF(pymessage);
+  }
+  if (idmessage == -1) {
+    PyErr_Clear();
+    idmessage = hiwire_string_ascii((int)"");
+  }
+
+  // Each frame is a filename, line number and function name
+  Py_ssize_t nframes = 0;
+  for (PyTracebackObject* tb = (PyTracebackObject*)traceback;
+       tb != NULL && (PyObject*)tb != Py_None;
+       tb = tb->tb_next) {
+    nframes++;
+  }
+  int* frames = PyMem_Malloc((nframes + 1) * 3 * sizeof(int));
+  if (frames == NULL) {
+    nframes = 0;
+  }
+  PyTracebackObject* tb = (PyTracebackObject*)traceback;
+  for (Py_ssize_t i = 0; i < nframes; ++i, tb = tb->tb_next) {
+    PyCodeObject* code = tb->tb_frame->f_code;
+    frames[3 * i] = (int)_pythonexc2js_utf8(code->co_filename);
+    frames[3 * i + 1] = tb->tb_lineno;
+    frames[3 * i + 2] = (int)_pythonexc2js_utf8(code->co_name);
+  }
+
+  int iderror = _pythonexc2js_error(
+    (int)((PyTypeObject*)type)->tp_name, idmessage, (int)frames, nframes);
+
+  PyMem_Free(frames);
+  Py_DECREF(type);
+  Py_DECREF(value);
+  Py_XDECREF(traceback);
+  PyErr_Clear();
+
+  _pythonexc2js_throw(iderror);
+
+  return -1;
+}
+
+/* During conversion of collection types (lists and dicts) from Python to
+ * Javascript, we need to make sure that those collections don't include
+ * themselves, otherwise infinite recursion occurs.
+ *
+ * The solution is to maintain a cache mapping from the PyObject* to the
+ * Javascript object id for the collection objects currently being converted.
+ * Scalars can't contain anything, so they bypass the cache entirely.
+ *
+ * Dictionary keys are also cached (interned), so that the same key appearing
+ * in many dictionaries, as in a list of records, is only converted once. The
+ * interned keys are kept alive until the end of the conversion, so their
+ * addresses can't be reused by other objects in the meantime.
+ *
+ * Both caches are PointerMaps: open-addressed hash tables keyed by pointer,
+ * using linear probing. The collections cache only ever holds the chain of
+ * collections from the root down to the object being converted, so it is
+ * usually tiny, and lives in `inline_keys`/`inline_values` without any
+ * allocation.
+ *
+ * The caches only live for each invocation of python2js.
+ */
+
+#define POINTER_MAP_INLINE_BITS 4
+
+typedef struct
+{
+  PyObject** keys;
+  int* values;
+  int bits;
+  size_t size;
+  PyObject* inline_keys[1 << POINTER_MAP_INLINE_BITS];
+  int inline_values[1 << POINTER_MAP_INLINE_BITS];
+} PointerMap;
+
+typedef struct
+{
+  PointerMap collections;
+  PointerMap keys;
+  // The conversion policy: lists and dicts nested max_depth levels deep, or
+  // with more than max_size items, are passed as proxies. -1 means no limit.
+  int depth;
+  int max_depth;
+  Py_ssize_t max_size;
+} ConversionCache;
+
+static int
+_python2js_add_to_cache(ConversionCache* cache,
+                        PyObject* pyparent,
+                        int jsparent);
+
+static void
+_python2js_remove_from_cache(ConversionCache* cache, PyObject* pyparent);
+
+static int
+_python2js_cache(PyObject* x, ConversionCache* cache);
+
+static int
+_python2js_key(PyObject* pykey, ConversionCache* cache);
+
+static int
+_python2js_builtin(PyObject* x, ConversionCache* cache);
+
+static void
+_pointer_map_init(PointerMap* map);
+
+static void
+_pointer_map_free(PointerMap* map);
+
+static int
+_pointer_map_add(PointerMap* map, PyObject* key, int value);
+
+static int
+_pointer_map_get(PointerMap* map, PyObject* key, int* value);
+
+static void
+_pointer_map_remove(PointerMap* map, PyObject* key);
+
+static int
+_python2js_sequence(PyObject* x, ConversionCache* cache)
+{
+  int jsarray = hiwire_array();
+  if (_python2js_add_to_cache(cache, x, jsarray)) {
+    hiwire_decref(jsarray);
+    return -1;
+  }
+  size_t length = PySequence_Size(x);
+  for (size_t i = 0; i < length; ++i) {
+    PyObject* pyitem = PySequence_GetItem(x, i);
+    if (pyitem == NULL) {
+      // If something goes wrong converting the sequence (as is the case with
+      // Pandas data frames), fallback to the Python object proxy
+      _python2js_remove_from_cache(cache, x);
+      hiwire_decref(jsarray);
+      PyErr_Clear();
+      return pyproxy_new((int)x);
     }
-  } else {
-    PyObject* format_exception;
-    if (traceback == NULL || traceback == Py_None) {
-      no_traceback = 1;
-      format_exception = PyObject_GetAttrString(tbmod, "format_exception_only");
-    } else {
-      format_exception = PyObject_GetAttrString(tbmod, "format_exception");
+    int jsitem = _python2js_cache(pyitem, cache);
+    if (jsitem == -1) {
+      _python2js_remove_from_cache(cache, x);
+      Py_DECREF(pyitem);
+      hiwire_decref(jsarray);
+      return -1;
     }
-    if (format_exception == NULL) {
-      excval =
-        hiwire_string_ascii((int)"Could not get format_exception function");
+    Py_DECREF(pyitem);
+    hiwire_push_array(jsarray, jsitem);
+    hiwire_decref(jsitem);
+  }
+  _python2js_remove_from_cache(cache, x);
+  return jsarray;
+}
+
+/* Returned by the fast-path converters when the object can't be handled by
+ * them, and the generic conversion should be used instead. No Python
+ * exception is set in that case. */
+#define PY2JS_UNSUPPORTED -2
+
+/* Maps a buffer protocol format string to one of the *_TYPE constants in
+ * hiwire.h. Returns 0 if there is no matching Javascript TypedArray. */
+static int
+_python2js_buffer_dtype(const char* format, Py_ssize_t itemsize)
+{
+  if (format == NULL) {
+    return UINT8_TYPE;
+  }
+
+  // Native and little-endian byte orders are the same on WebAssembly
+  if (format[0] == '@' || format[0] == '=' || format[0] == '<') {
+    format++;
+  }
+  if (format[0] == '\0' || format[1] != '\0') {
+    return 0;
+  }
+
+  switch (format[0]) {
+    case 'b':
+      return INT8_TYPE;
+    case 'B':
+      return UINT8_TYPE;
+    case 'h':
+      return INT16_TYPE;
+    case 'H':
+      return UINT16_TYPE;
+    case 'i':
+    case 'l':
+      return itemsize == 4 ? INT32_TYPE : itemsize == 8 ? INT64_TYPE : 0;
+    case 'I':
+    case 'L':
+      return itemsize == 4 ? UINT32_TYPE : itemsize == 8 ? UINT64_TYPE : 0;
+    case 'q':
+      return INT64_TYPE;
+    case 'Q':
+      return UINT64_TYPE;
+    case 'f':
+      return FLOAT32_TYPE;
+    case 'd':
+      return FLOAT64_TYPE;
+    default:
+      return 0;
+  }
+}
+
+static int
+_python2js_shape_array(Py_ssize_t ndim, Py_ssize_t* values)
+{
+  int jsarray = hiwire_array();
+  for (Py_ssize_t i = 0; i < ndim; ++i) {
+    int jsitem = hiwire_int(values[i]);
+    hiwire_push_array(jsarray, jsitem);
+    hiwire_decref(jsitem);
+  }
+  return jsarray;
+}
+
+/* Converts a C-contiguous buffer of a numeric data type (such as a Numpy
+ * array) to a TypedArray.
+ *
+ * If copy is true, the data is copied out of the WASM heap with a single bulk
+ * copy. Otherwise the TypedArray is a view on the WASM heap, which is only
+ * valid as long as the buffer is, and until the heap grows. Buffers that are
+ * not aligned to their item size can't be viewed, and are always copied.
+ *
+ * The result is always flat. Its `shape` and `strides` members hold the shape
+ * and strides of the original buffer, with the strides measured in elements
+ * rather than bytes so they can be used to index the TypedArray directly.
+ *
+ * Returns PY2JS_UNSUPPORTED if the buffer is not contiguous, or its data type
+ * has no matching TypedArray. */
+static int
+_python2js_buffer(PyObject* x, int copy)
+{
+  Py_buffer view;
+  if (PyObject_GetBuffer(x, &view, PyBUF_FULL_RO)) {
+    PyErr_Clear();
+    return PY2JS_UNSUPPORTED;
+  }
+
+  int result = PY2JS_UNSUPPORTED;
+  int dtype = _python2js_buffer_dtype(view.format, view.itemsize);
+  if (dtype == 0 || view.ndim < 1 || view.ndim > PyBUF_MAX_NDIM ||
+      !PyBuffer_IsContiguous(&view, 'C')) {
+    goto exit;
+  }
+
+  int jsarray;
+  if (copy || (size_t)view.buf % view.itemsize != 0) {
+    jsarray = hiwire_typedarray_copy(dtype, (int)view.buf, view.len);
+  } else {
+    jsarray = hiwire_typedarray_view(dtype, (int)view.buf, view.len);
+  }
+  if (jsarray == -1) {
+    goto exit;
+  }
+
+  Py_ssize_t strides[PyBUF_MAX_NDIM];
+  Py_ssize_t stride = 1;
+  for (int i = view.ndim - 1; i >= 0; --i) {
+    strides[i] = stride;
+    stride *= view.shape[i];
+  }
+
+  int jsshape = _python2js_shape_array(view.ndim, view.shape);
+  hiwire_set_member_string(jsarray, (int)"shape", jsshape);
+  hiwire_decref(jsshape);
+  int jsstrides = _python2js_shape_array(view.ndim, strides);
+  hiwire_set_member_string(jsarray, (int)"strides", jsstrides);
+  hiwire_decref(jsstrides);
+
+  result = jsarray;
+
+exit:
+  PyBuffer_Release(&view);
+  return result;
+}
+
+/* Lists of at least this many elements are candidates for conversion to a
+ * TypedArray. 0 disables the conversion. */
+static Py_ssize_t typed_array_threshold = 4096;
+
+/* Called by pyodide.set_typed_array_threshold */
+static PyObject*
+_python2js_set_typed_array_threshold(PyObject* self, PyObject* threshold)
+{
+  Py_ssize_t value = PyLong_AsSsize_t(threshold);
+  if (value == -1 && PyErr_Occurred()) {
+    return NULL;
+  }
+  typed_array_threshold = value;
+  Py_RETURN_NONE;
+}
+
+/* Converts a list whose elements are all floats to a Float64Array, or whose
+ * elements are all ints in the 32-bit range to an Int32Array. The list is
+ * scanned and copied into a temporary buffer in a single pass, which is then
+ * copied to Javascript in one call.
+ *
+ * Returns PY2JS_UNSUPPORTED if the list is of any other kind. */
+static int
+_python2js_homogeneous_list(PyObject* x)
+{
+  Py_ssize_t length = PyList_GET_SIZE(x);
+  if (length == 0) {
+    return PY2JS_UNSUPPORTED;
+  }
+
+  int is_float = PyFloat_CheckExact(PyList_GET_ITEM(x, 0));
+  if (!is_float && !PyLong_CheckExact(PyList_GET_ITEM(x, 0))) {
+    return PY2JS_UNSUPPORTED;
+  }
+
+  size_t itemsize = is_float ? sizeof(double) : sizeof(int32_t);
+  void* buffer = PyMem_Malloc(length * itemsize);
+  if (buffer == NULL) {
+    PyErr_NoMemory();
+    return -1;
+  }
+
+  int result = PY2JS_UNSUPPORTED;
+  for (Py_ssize_t i = 0; i < length; ++i) {
+    PyObject* item = PyList_GET_ITEM(x, i);
+    if (is_float) {
+      if (!PyFloat_CheckExact(item)) {
+        goto exit;
+      }
+      ((double*)buffer)[i] = PyFloat_AS_DOUBLE(item);
     } else {
-      PyObject* pylines;
-      if (no_traceback) {
-        pylines =
-          PyObject_CallFunctionObjArgs(format_exception, type, value, NULL);
-      } else {
-        pylines = PyObject_CallFunctionObjArgs(
-          format_exception, type, value, traceback, NULL);
+      if (!PyLong_CheckExact(item)) {
+        goto exit;
       }
-      if (pylines == NULL) {
-        excval =
-          hiwire_string_ascii((int)"Error calling traceback.format_exception");
-        PyErr_Print();
-        PyErr_Clear();
+      int overflow;
+      long value = PyLong_AsLongAndOverflow(item, &overflow);
+      if (overflow || value < INT32_MIN || value > INT32_MAX) {
         goto exit;
-      } else {
-        PyObject* newline = PyUnicode_FromString("");
-        PyObject* pystr = PyUnicode_Join(newline, pylines);
-        printf("Python exception:\n");
-        printf("%s\n", PyUnicode_AsUTF8(pystr));
-        excval = python2js(pystr);
-        Py_DECREF(pystr);
-        Py_DECREF(newline);
-        Py_DECREF(pylines);
       }
-      Py_DECREF(format_exception);
+      ((int32_t*)buffer)[i] = (int32_t)value;
     }
-    Py_DECREF(tbmod);
   }
 
+  result = hiwire_typedarray_copy(
+    is_float ? FLOAT64_TYPE : INT32_TYPE, (int)buffer, length * itemsize);
+
 exit:
-  Py_XDECREF(type);
-  Py_XDECREF(value);
-  Py_XDECREF(traceback);
+  PyMem_Free(buffer);
+  return result;
+}
 
-  PyErr_Clear();
+static int
+_python2js_list(PyObject* x, ConversionCache* cache)
+{
+  if (typed_array_threshold > 0 &&
+      PyList_GET_SIZE(x) >= typed_array_threshold) {
+    int jsarray = _python2js_homogeneous_list(x);
+    if (jsarray != PY2JS_UNSUPPORTED) {
+      return jsarray;
+    }
+  }
+  return _python2js_sequence(x, cache);
+}
 
-  hiwire_throw_error(excval);
+static int
+_python2js_ndarray(PyObject* x, ConversionCache* cache)
+{
+  int jsarray = _python2js_buffer(x, 1);
+  if (jsarray != PY2JS_UNSUPPORTED) {
+    return jsarray;
+  }
+  return _python2js_sequence(x, cache);
+}
 
-  return -1;
+/* Used for any other object supporting the buffer protocol, such as bytearray,
+ * memoryview and array.array */
+static int
+_python2js_buffer_view(PyObject* x, ConversionCache* cache)
+{
+  int jsarray = _python2js_buffer(x, 0);
+  if (jsarray != PY2JS_UNSUPPORTED) {
+    return jsarray;
+  }
+  return pyproxy_new((int)x);
 }
 
+/* Used for pyodide.BufferCopy */
 static int
-is_type_name(PyObject* x, const char* name)
+_python2js_buffer_copy(PyObject* x, ConversionCache* cache)
 {
-  PyObject* x_type = PyObject_Type(x);
-  if (x_type == NULL) {
-    // If we can't get a type, that's probably ok in this case...
-    PyErr_Clear();
-    return 0;
+  PyObject* buffer = PyObject_GetAttrString(x, "buffer");
+  if (buffer == NULL) {
+    return -1;
   }
+  int jsarray = _python2js_buffer(buffer, 1);
+  Py_DECREF(buffer);
+  if (jsarray == PY2JS_UNSUPPORTED) {
+    PyErr_SetString(PyExc_TypeError,
+                    "Only C-contiguous buffers of a numeric type can be "
+                    "converted to a typed array");
+    return -1;
+  }
+  return jsarray;
+}
 
-  PyObject* x_type_name = PyObject_Repr(x_type);
-  Py_DECREF(x_type);
+/* Conversion of types other than the basic built-in ones is dispatched through
+ * a converter registry.
+ *
+ * Converters written in Python are registered with
+ * `pyodide.register_converter`, which stores them in the
+ * `pyodide._python2js_converters` dictionary. Converters written in C are
+ * listed in `builtin_converters` below and matched by the names of the types
+ * in the MRO, so that the modules defining those types don't need to be
+ * imported up front.
+ *
+ * Registered converters also apply to subclasses of the built-in types that
+ * are converted by value, such as int and dict. Those subclasses which have no
+ * registered converter are converted like their built-in base.
+ *
+ * The converter for a given type is resolved once, the first time an instance
+ * of the type is converted, and stored in `converter_cache` keyed by the type
+ * pointer, so that looking it up doesn't allocate anything. The cache also
+ * records types with no converter (as None), which are converted using a
+ * PyProxy. It doesn't keep the types alive: each type has a weak reference
+ * whose callback evicts its entry, so that classes created dynamically can
+ * still be freed. Registering a new converter clears the cache.
+ */
 
-  int result = (PyUnicode_CompareWithASCIIString(x_type_name, name) == 0);
+typedef int (*python2js_converter)(PyObject* x, ConversionCache* cache);
 
-  Py_DECREF(x_type_name);
-  return result;
+typedef struct
+{
+  const char* tp_name;
+  python2js_converter converter;
+  PyObject* capsule;
+} BuiltinConverter;
+
+static BuiltinConverter builtin_converters[] = {
+  { "numpy.ndarray", _python2js_ndarray, NULL },
+  { NULL, NULL, NULL }
+};
+
+// Not matched by name: used for types supporting the buffer protocol that
+// don't have a more specific converter.
+static BuiltinConverter buffer_view_converter = { NULL,
+                                                  _python2js_buffer_view,
+                                                  NULL };
+
+// Not matched by name: used for subclasses of the built-in types converted by
+// value that don't have a registered converter.
+static BuiltinConverter builtin_subclass_converter = { NULL,
+                                                       _python2js_builtin,
+                                                       NULL };
+
+// Registered for pyodide.BufferCopy at initialization
+static BuiltinConverter buffer_copy_converter = { NULL,
+                                                  _python2js_buffer_copy,
+                                                  NULL };
+
+static PyObject* converters = NULL;
+// Maps type pointers to new references to their converters
+static PointerMap converter_cache;
+// Maps the weak reference to each type in converter_cache to its address
+static PyObject* converter_cache_refs = NULL;
+static PyObject* converter_cache_evict = NULL;
+
+/* The callback of the weak references in converter_cache_refs, called when
+ * their type is freed */
+static PyObject*
+_python2js_evict_converter(PyObject* self, PyObject* ref)
+{
+  PyObject* address = PyDict_GetItem(converter_cache_refs, ref);
+  if (address == NULL) {
+    Py_RETURN_NONE;
+  }
+  PyObject* type = PyLong_AsVoidPtr(address);
+  if (PyDict_DelItem(converter_cache_refs, ref)) {
+    return NULL;
+  }
+  int converter;
+  if (_pointer_map_get(&converter_cache, type, &converter)) {
+    _pointer_map_remove(&converter_cache, type);
+    Py_DECREF((PyObject*)converter);
+  }
+  Py_RETURN_NONE;
 }
 
-int
-_python2js_add_to_cache(PyObject* map, PyObject* pyparent, int jsparent);
+static PyMethodDef evict_converter_def = { "_python2js_evict_converter",
+                                           _python2js_evict_converter,
+                                           METH_O,
+                                           NULL };
 
-int
-_python2js_remove_from_cache(PyObject* map, PyObject* pyparent);
+/* Adds the converter for a type to the cache, which takes a new reference to
+ * it */
+static int
+_python2js_cache_converter(PyTypeObject* type, PyObject* converter)
+{
+  PyObject* ref = PyWeakref_NewRef((PyObject*)type, converter_cache_evict);
+  if (ref == NULL) {
+    return -1;
+  }
+  PyObject* address = PyLong_FromVoidPtr(type);
+  if (address == NULL) {
+    Py_DECREF(ref);
+    return -1;
+  }
+  int failed = PyDict_SetItem(converter_cache_refs, ref, address);
+  Py_DECREF(ref);
+  Py_DECREF(address);
+  if (failed) {
+    return -1;
+  }
+  if (_pointer_map_add(&converter_cache, (PyObject*)type, (int)converter)) {
+    return -1;
+  }
+  Py_INCREF(converter);
+  return 0;
+}
 
-int
-_python2js_cache(PyObject* x, PyObject* map);
+/* Called by pyodide.register_converter */
+static PyObject*
+_python2js_clear_converter_cache(PyObject* self, PyObject* args)
+{
+  // Dropping the weak references cancels their callbacks
+  PyDict_Clear(converter_cache_refs);
+  // Releasing the converters may run arbitrary code, so the cache is emptied
+  // before
+  PointerMap old = converter_cache;
+  if (old.keys == converter_cache.inline_keys) {
+    old.keys = old.inline_keys;
+    old.values = old.inline_values;
+  }
+  _pointer_map_init(&converter_cache);
+  size_t capacity = (size_t)1 << old.bits;
+  for (size_t i = 0; i < capacity; ++i) {
+    if (old.keys[i] != NULL) {
+      Py_DECREF((PyObject*)old.values[i]);
+    }
+  }
+  _pointer_map_free(&old);
+  Py_RETURN_NONE;
+}
+
+/* Returns a new reference to the converter for the given type: a PyCapsule
+ * wrapping a C converter, a Python callable, or None. */
+static PyObject*
+_python2js_resolve_converter(PyTypeObject* type)
+{
+  // The most specific base class with a converter wins, so that the C
+  // converters also apply to subclasses, such as numpy.matrix
+  PyObject* mro = type->tp_mro;
+  Py_ssize_t n = mro == NULL ? 0 : PyTuple_GET_SIZE(mro);
+  for (Py_ssize_t i = 0; i < n; ++i) {
+    PyObject* base = PyTuple_GET_ITEM(mro, i);
+    PyObject* converter = PyDict_GetItem(converters, base);
+    if (converter != NULL) {
+      Py_INCREF(converter);
+      return converter;
+    }
+
+    const char* tp_name = ((PyTypeObject*)base)->tp_name;
+    for (BuiltinConverter* entry = builtin_converters; entry->tp_name != NULL;
+         ++entry) {
+      if (strcmp(tp_name, entry->tp_name) == 0) {
+        Py_INCREF(entry->capsule);
+        return entry->capsule;
+      }
+    }
+  }
+
+  unsigned long builtin_flags =
+    Py_TPFLAGS_LONG_SUBCLASS | Py_TPFLAGS_UNICODE_SUBCLASS |
+    Py_TPFLAGS_BYTES_SUBCLASS | Py_TPFLAGS_LIST_SUBCLASS |
+    Py_TPFLAGS_DICT_SUBCLASS;
+  if (PyType_FastSubclass(type, builtin_flags) ||
+      PyType_IsSubtype(type, &PyFloat_Type)) {
+    Py_INCREF(builtin_subclass_converter.capsule);
+    return builtin_subclass_converter.capsule;
+  }
+
+  if (type->tp_as_buffer != NULL && type->tp_as_buffer->bf_getbuffer != NULL) {
+    Py_INCREF(buffer_view_converter.capsule);
+    return buffer_view_converter.capsule;
+  }
+
+  Py_INCREF(Py_None);
+  return Py_None;
+}
 
 static int
-_python2js(PyObject* x, PyObject* map)
+_python2js_convert_registered(PyObject* x, ConversionCache* cache)
 {
-  if (x == Py_None) {
-    return hiwire_undefined();
-  } else if (x == Py_True) {
-    return hiwire_true();
-  } else if (x == Py_False) {
-    return hiwire_false();
-  } else if (PyLong_Check(x)) {
+  PyObject* converter;
+  int cached;
+  if (_pointer_map_get(&converter_cache, (PyObject*)Py_TYPE(x), &cached)) {
+    converter = (PyObject*)cached;
+  } else {
+    converter = _python2js_resolve_converter(Py_TYPE(x));
+    int failed = _python2js_cache_converter(Py_TYPE(x), converter);
+    // The cache now holds a reference
+    Py_DECREF(converter);
+    if (failed) {
+      return -1;
+    }
+  }
+
+  if (converter == Py_None) {
+    return pyproxy_new((int)x);
+  } else if (PyCapsule_CheckExact(converter)) {
+    python2js_converter func =
+      (python2js_converter)PyCapsule_GetPointer(converter, NULL);
+    return func(x, cache);
+  }
+
+  PyObject* pyresult = PyObject_CallFunctionObjArgs(converter, x, NULL);
+  if (pyresult == NULL) {
+    return -1;
+  }
+  int jsresult;
+  if (pyresult == x) {
+    // The converter declined to convert the object
+    jsresult = pyproxy_new((int)x);
+  } else if (Py_TYPE(pyresult) == Py_TYPE(x)) {
+    // Converting the result would call the same converter again, forever
+    PyErr_Format(PyExc_TypeError,
+                 "The converter for '%.200s' returned another instance of "
+                 "the same type",
+                 Py_TYPE(x)->tp_name);
+    jsresult = -1;
+  } else if (Py_EnterRecursiveCall(" while converting to Javascript")) {
+    // Converters which return instances of each other's types
+    jsresult = -1;
+  } else {
+    jsresult = _python2js_cache(pyresult, cache);
+    Py_LeaveRecursiveCall();
+  }
+  Py_DECREF(pyresult);
+  return jsresult;
+}
+
+#define DICT_INLINE_SIZE 16
+
+/* Converts a dictionary. The keys and values are converted first, collecting
+ * their ids in contiguous arrays, and then added to the Javascript object with
+ * a single call. */
+static int
+_python2js_dict(PyObject* x, ConversionCache* cache)
+{
+  int jsdict = hiwire_object();
+  if (_python2js_add_to_cache(cache, x, jsdict)) {
+    hiwire_decref(jsdict);
+    return -1;
+  }
+
+  Py_ssize_t size = PyDict_Size(x);
+  int inline_ids[DICT_INLINE_SIZE * 2];
+  int* jskeys = inline_ids;
+  if (size > DICT_INLINE_SIZE) {
+    jskeys = PyMem_Malloc(size * 2 * sizeof(int));
+    if (jskeys == NULL) {
+      _python2js_remove_from_cache(cache, x);
+      hiwire_decref(jsdict);
+      PyErr_NoMemory();
+      return -1;
+    }
+  }
+  int* jsvals = jskeys + size;
+
+  PyObject *pykey, *pyval;
+  Py_ssize_t pos = 0;
+  Py_ssize_t n = 0;
+  int result = jsdict;
+  while (n < size && PyDict_Next(x, &pos, &pykey, &pyval)) {
+    int jskey = _python2js_key(pykey, cache);
+    if (jskey == -1) {
+      result = -1;
+      break;
+    }
+    int jsval = _python2js_cache(pyval, cache);
+    if (jsval == -1) {
+      result = -1;
+      break;
+    }
+    jskeys[n] = jskey;
+    jsvals[n] = jsval;
+    n++;
+  }
+
+  // This also releases the values, so it is needed on error too
+  hiwire_push_object_pairs(jsdict, (int)jskeys, (int)jsvals, n);
+
+  if (jskeys != inline_ids) {
+    PyMem_Free(jskeys);
+  }
+  _python2js_remove_from_cache(cache, x);
+  if (result == -1) {
+    hiwire_decref(jsdict);
+  }
+  return result;
+}
+
+/* Whether a list or dict should be passed as a proxy, rather than converted,
+ * under the conversion policy */
+static int
+_python2js_is_lazy(PyObject* x, ConversionCache* cache)
+{
+  if (cache->max_depth != -1 && cache->depth >= cache->max_depth) {
+    return 1;
+  }
+  if (cache->max_size != -1) {
+    Py_ssize_t size = PyList_Check(x) ? PyList_GET_SIZE(x) : PyDict_Size(x);
+    return size > cache->max_size;
+  }
+  return 0;
+}
+
+/* The depth limit for converting the items of a list or dict passed as a
+ * proxy, when they are accessed, so that they are converted as they would
+ * have been as part of the whole. The items of proxies past the depth limit
+ * are converted one level at a time. */
+static int
+_python2js_item_depth(ConversionCache* cache)
+{
+  if (cache->max_depth == -1) {
+    return -1;
+  } else if (cache->depth >= cache->max_depth) {
+    return 1;
+  }
+  return cache->max_depth - cache->depth - 1;
+}
+
+/* Converts the built-in types that are converted by value, and their
+ * subclasses that have no registered converter */
+static int
+_python2js_builtin(PyObject* x, ConversionCache* cache)
+{
+  if (PyLong_Check(x)) {
     long x_long = PyLong_AsLongLong(x);
     if (x_long == -1 && PyErr_Occurred()) {
       return -1;
@@ -160,143 +890,275 @@ _python2js(PyObject* x, PyObject* map)
       return -1;
     }
     return hiwire_bytes((int)(void*)x_buff, length);
+  } else if (PyList_Check(x) || PyDict_Check(x)) {
+    if (_python2js_is_lazy(x, cache)) {
+      return pyproxy_new_lazy(
+        (int)x, _python2js_item_depth(cache), (int)cache->max_size);
+    }
+    cache->depth++;
+    int result =
+      PyList_Check(x) ? _python2js_list(x, cache) : _python2js_dict(x, cache);
+    cache->depth--;
+    return result;
+  }
+  PyErr_Format(PyExc_TypeError,
+               "No built-in conversion for '%.200s'",
+               Py_TYPE(x)->tp_name);
+  return -1;
+}
+
+/* Whether x is exactly one of the built-in types converted by value. Instances
+ * of their subclasses go through the converter registry, so that registered
+ * converters take precedence over the built-in conversion. */
+static int
+_python2js_is_builtin(PyObject* x)
+{
+  return PyLong_CheckExact(x) || PyFloat_CheckExact(x) ||
+         PyUnicode_CheckExact(x) || PyBytes_CheckExact(x) ||
+         PyList_CheckExact(x) || PyDict_CheckExact(x);
+}
+
+static int
+_python2js(PyObject* x, ConversionCache* cache)
+{
+  if (x == Py_None) {
+    return hiwire_undefined();
+  } else if (x == Py_True) {
+    return hiwire_true();
+  } else if (x == Py_False) {
+    return hiwire_false();
+  } else if (_python2js_is_builtin(x)) {
+    return _python2js_builtin(x, cache);
   } else if (JsProxy_Check(x)) {
     return JsProxy_AsJs(x);
-  } else if (PyList_Check(x) || is_type_name(x, "<class 'numpy.ndarray'>")) {
-    int jsarray = hiwire_array();
-    if (_python2js_add_to_cache(map, x, jsarray)) {
-      hiwire_decref(jsarray);
-      return -1;
-    }
-    size_t length = PySequence_Size(x);
-    for (size_t i = 0; i < length; ++i) {
-      PyObject* pyitem = PySequence_GetItem(x, i);
-      if (pyitem == NULL) {
-        // If something goes wrong converting the sequence (as is the case with
-        // Pandas data frames), fallback to the Python object proxy
-        _python2js_remove_from_cache(map, x);
-        hiwire_decref(jsarray);
-        PyErr_Clear();
-        Py_INCREF(x);
-        return pyproxy_new((int)x);
-      }
-      int jsitem = _python2js_cache(pyitem, map);
-      if (jsitem == -1) {
-        _python2js_remove_from_cache(map, x);
-        Py_DECREF(pyitem);
-        hiwire_decref(jsarray);
-        return -1;
+  } else {
+    return _python2js_convert_registered(x, cache);
+  }
+}
+
+static void
+_pointer_map_init(PointerMap* map)
+{
+  map->keys = map->inline_keys;
+  map->values = map->inline_values;
+  map->bits = POINTER_MAP_INLINE_BITS;
+  map->size = 0;
+  memset(map->inline_keys, 0, sizeof(map->inline_keys));
+}
+
+static void
+_pointer_map_free(PointerMap* map)
+{
+  if (map->keys != map->inline_keys) {
+    PyMem_Free(map->keys);
+    PyMem_Free(map->values);
+  }
+}
+
+static size_t
+_pointer_map_slot(PointerMap* map, PyObject* x)
+{
+  // Fibonacci hashing: the top bits of the product are well mixed
+  uint32_t hash = (uint32_t)((uintptr_t)x >> 3) * 2654435769u;
+  return hash >> (32 - map->bits);
+}
+
+static int
+_pointer_map_grow(PointerMap* map)
+{
+  PyObject** old_keys = map->keys;
+  int* old_values = map->values;
+  size_t old_capacity = (size_t)1 << map->bits;
+  size_t capacity = old_capacity * 2;
+
+  PyObject** keys = PyMem_Calloc(capacity, sizeof(PyObject*));
+  int* values = PyMem_Malloc(capacity * sizeof(int));
+  if (keys == NULL || values == NULL) {
+    PyMem_Free(keys);
+    PyMem_Free(values);
+    PyErr_NoMemory();
+    return -1;
+  }
+
+  map->keys = keys;
+  map->values = values;
+  map->bits++;
+  for (size_t i = 0; i < old_capacity; ++i) {
+    if (old_keys[i] != NULL) {
+      size_t slot = _pointer_map_slot(map, old_keys[i]);
+      while (keys[slot] != NULL) {
+        slot = (slot + 1) & (capacity - 1);
       }
-      Py_DECREF(pyitem);
-      hiwire_push_array(jsarray, jsitem);
-      hiwire_decref(jsitem);
+      keys[slot] = old_keys[i];
+      values[slot] = old_values[i];
     }
-    if (_python2js_remove_from_cache(map, x)) {
-      hiwire_decref(jsarray);
+  }
+
+  if (old_keys != map->inline_keys) {
+    PyMem_Free(old_keys);
+    PyMem_Free(old_values);
+  }
+  return 0;
+}
+
+/* Adds a key, which must not already be in the map. */
+static int
+_pointer_map_add(PointerMap* map, PyObject* key, int value)
+{
+  size_t capacity = (size_t)1 << map->bits;
+  // Keep the load factor at or below 1/2
+  if ((map->size + 1) * 2 > capacity) {
+    if (_pointer_map_grow(map)) {
       return -1;
     }
-    return jsarray;
-  } else if (PyDict_Check(x)) {
-    int jsdict = hiwire_object();
-    if (_python2js_add_to_cache(map, x, jsdict)) {
-      hiwire_decref(jsdict);
-      return -1;
+    capacity *= 2;
+  }
+
+  size_t slot = _pointer_map_slot(map, key);
+  while (map->keys[slot] != NULL) {
+    slot = (slot + 1) & (capacity - 1);
+  }
+  map->keys[slot] = key;
+  map->values[slot] = value;
+  map->size++;
+  return 0;
+}
+
+/* Returns 1 and sets *value if the key is in the map, 0 otherwise. */
+static int
+_pointer_map_get(PointerMap* map, PyObject* key, int* value)
+{
+  if (map->size == 0) {
+    return 0;
+  }
+  size_t mask = ((size_t)1 << map->bits) - 1;
+  for (size_t slot = _pointer_map_slot(map, key); map->keys[slot] != NULL;
+       slot = (slot + 1) & mask) {
+    if (map->keys[slot] == key) {
+      *value = map->values[slot];
+      return 1;
     }
-    PyObject *pykey, *pyval;
-    Py_ssize_t pos = 0;
-    while (PyDict_Next(x, &pos, &pykey, &pyval)) {
-      int jskey = _python2js_cache(pykey, map);
-      if (jskey == -1) {
-        _python2js_remove_from_cache(map, x);
-        hiwire_decref(jsdict);
-        return -1;
-      }
-      int jsval = _python2js_cache(pyval, map);
-      if (jsval == -1) {
-        _python2js_remove_from_cache(map, x);
-        hiwire_decref(jskey);
-        hiwire_decref(jsdict);
-        return -1;
-      }
-      hiwire_push_object_pair(jsdict, jskey, jsval);
-      hiwire_decref(jskey);
-      hiwire_decref(jsval);
+  }
+  return 0;
+}
+
+static void
+_pointer_map_remove(PointerMap* map, PyObject* key)
+{
+  size_t mask = ((size_t)1 << map->bits) - 1;
+  size_t slot = _pointer_map_slot(map, key);
+  while (map->keys[slot] != key) {
+    if (map->keys[slot] == NULL) {
+      return;
     }
-    if (_python2js_remove_from_cache(map, x)) {
-      hiwire_decref(jsdict);
-      return -1;
+    slot = (slot + 1) & mask;
+  }
+
+  // Shift later entries of the same probe sequence back into the hole, so
+  // that lookups never need tombstones.
+  size_t hole = slot;
+  for (slot = (hole + 1) & mask; map->keys[slot] != NULL;
+       slot = (slot + 1) & mask) {
+    size_t home = _pointer_map_slot(map, map->keys[slot]);
+    // Can the entry at `slot` move to `hole` without being placed before its
+    // home slot (taking wrap-around into account)?
+    if (((slot - home) & mask) >= ((slot - hole) & mask)) {
+      map->keys[hole] = map->keys[slot];
+      map->values[hole] = map->values[slot];
+      hole = slot;
     }
-    return jsdict;
-  } else {
-    Py_INCREF(x);
-    return pyproxy_new((int)x);
   }
+  map->keys[hole] = NULL;
+  map->size--;
 }
 
-/* During conversion of collection types (lists and dicts) from Python to
- * Javascript, we need to make sure that those collections don't include
- * themselves, otherwise infinite recursion occurs.
- *
- * The solution is to maintain a cache mapping from the PyObject* to the
- * Javascript object id for all collection objects. (One could do this for
- * scalars as well, but that would imply a larger cache, and identical scalars
- * are probably interned for deduplication on the Javascript side anyway).
- *
- * This cache only lives for each invocation of python2js.
- */
+static int
+_python2js_add_to_cache(ConversionCache* cache,
+                        PyObject* pyparent,
+                        int jsparent)
+{
+  return _pointer_map_add(&cache->collections, pyparent, jsparent);
+}
 
-int
-_python2js_add_to_cache(PyObject* map, PyObject* pyparent, int jsparent)
-{
-  /* Use the pointer converted to an int so cache is by identity, not hash */
-  PyObject* pyparentid = PyLong_FromSize_t((size_t)pyparent);
-  PyObject* jsparentid = PyLong_FromLong(jsparent);
-  if (PyDict_SetItem(map, pyparentid, jsparentid)) {
-    Py_DECREF(pyparentid);
-    Py_DECREF(jsparentid);
-    return -1;
+static void
+_python2js_remove_from_cache(ConversionCache* cache, PyObject* pyparent)
+{
+  _pointer_map_remove(&cache->collections, pyparent);
+}
+
+static int
+_python2js_cache(PyObject* x, ConversionCache* cache)
+{
+  // Scalars can't contain themselves, so don't bother looking them up
+  if (cache->collections.size != 0 && x != Py_None && !PyLong_Check(x) &&
+      !PyFloat_Check(x) && !PyUnicode_Check(x) && !PyBytes_Check(x)) {
+    int jsx;
+    if (_pointer_map_get(&cache->collections, x, &jsx)) {
+      return hiwire_incref(jsx);
+    }
   }
-  Py_DECREF(pyparentid);
-  Py_DECREF(jsparentid);
-  return 0;
+  return _python2js(x, cache);
 }
 
-int
-_python2js_remove_from_cache(PyObject* map, PyObject* pyparent)
+/* Returns a borrowed id for a dictionary key, which remains valid until the
+ * end of the conversion. */
+static int
+_python2js_key(PyObject* pykey, ConversionCache* cache)
 {
-  PyObject* pyparentid = PyLong_FromSize_t((size_t)pyparent);
-  if (PyDict_DelItem(map, pyparentid)) {
+  int jskey;
+  if (_pointer_map_get(&cache->keys, pykey, &jskey)) {
+    return jskey;
+  }
+  jskey = _python2js_cache(pykey, cache);
+  if (jskey == -1) {
     return -1;
   }
-  Py_DECREF(pyparentid);
-  return 0;
+  if (_pointer_map_add(&cache->keys, pykey, jskey)) {
+    hiwire_decref(jskey);
+    return -1;
+  }
+  Py_INCREF(pykey);
+  return jskey;
 }
 
-int
-_python2js_cache(PyObject* x, PyObject* map)
-{
-  PyObject* id = PyLong_FromSize_t((size_t)x);
-  PyObject* val = PyDict_GetItem(map, id);
-  int result;
-  if (val) {
-    result = PyLong_AsLong(val);
-    if (result != -1) {
-      result = hiwire_incref(result);
+static void
+_python2js_cache_init(ConversionCache* cache, int max_depth, int max_size)
+{
+  _pointer_map_init(&cache->collections);
+  _pointer_map_init(&cache->keys);
+  cache->depth = 0;
+  cache->max_depth = max_depth;
+  cache->max_size = max_size;
+}
+
+static void
+_python2js_cache_free(ConversionCache* cache)
+{
+  PointerMap* keys = &cache->keys;
+  size_t capacity = (size_t)1 << keys->bits;
+  for (size_t i = 0; i < capacity; ++i) {
+    if (keys->keys[i] != NULL) {
+      hiwire_decref(keys->values[i]);
+      Py_DECREF(keys->keys[i]);
     }
-    Py_DECREF(val);
-  } else {
-    result = _python2js(x, map);
   }
-  Py_DECREF(id);
-  return result;
+  _pointer_map_free(&cache->collections);
+  _pointer_map_free(keys);
 }
 
 int
 python2js(PyObject* x)
 {
-  PyObject* map = PyDict_New();
-  int result = _python2js_cache(x, map);
-  Py_DECREF(map);
+  return python2js_with_policy(x, -1, -1);
+}
+
+int
+python2js_with_policy(PyObject* x, int max_depth, int max_size)
+{
+  ConversionCache cache;
+  _python2js_cache_init(&cache, max_depth, max_size);
+  int result = _python2js_cache(x, &cache);
+  _python2js_cache_free(&cache);
 
   if (result == -1) {
     return pythonexc2js();
@@ -305,8 +1167,153 @@ python2js(PyObject* x)
   return result;
 }
 
+EM_JS(int, python2js_init_js, (), {
+  // clang-format off
+  // The Javascript error for Python exceptions. The type name, message and
+  // frames are filled in by pythonexc2js, and the traceback is only
+  // formatted from them when it is needed.
+  function PythonError(type, message, frames) {
+    this.pythonType = type;
+    this.pythonMessage = message;
+    this.frames = frames;
+    this.jsError = new Error();
+    this.formatted = undefined;
+  }
+  PythonError.prototype = Object.create(Error.prototype);
+  PythonError.prototype.constructor = PythonError;
+  PythonError.prototype.name = 'PythonError';
+  PythonError.prototype.format = function() {
+    if (this.formatted === undefined) {
+      var lines = [];
+      if (this.frames.length > 0) {
+        lines.push('Traceback (most recent call last):');
+      }
+      for (var i = 0; i < this.frames.length; ++i) {
+        var frame = this.frames[i];
+        lines.push('  File "' + frame.filename + '", line ' + frame.lineno +
+                   ', in ' + frame.name);
+      }
+      if (this.pythonMessage === '') {
+        lines.push(this.pythonType);
+      } else {
+        lines.push(this.pythonType + ': ' + this.pythonMessage);
+      }
+      this.formatted = lines.join('\n');
+    }
+    return this.formatted;
+  };
+  var getMessage = function() {
+    return this.format();
+  };
+  var getStack = function() {
+    var jsstack = (this.jsError.stack || '').split('\n');
+    if (jsstack[0] === 'Error') {
+      jsstack.shift();
+    }
+    return this.name + ': ' + this.format() + '\n' + jsstack.join('\n');
+  };
+  Object.defineProperty(PythonError.prototype, 'message', {get: getMessage});
+  Object.defineProperty(PythonError.prototype, 'stack', {get: getStack});
+  Module.PythonError = PythonError;
+
+  // Turns the conversion options accepted by runPython and pyimport into the
+  // max_depth and max_size arguments of python2js_with_policy
+  Module.python2js_policy = function(options) {
+    if (options === undefined || options === 'deep') {
+      return [-1, -1];
+    } else if (options === 'shallow') {
+      return [1, -1];
+    } else if (options === 'proxy') {
+      return [0, -1];
+    } else if (typeof options !== 'object' || options === null) {
+      throw new TypeError("Unknown conversion policy: " + options);
+    }
+    var limit = function(value) {
+      if (value === undefined || value === Infinity) {
+        return -1;
+      } else if (!(value >= 0)) {
+        throw new RangeError("Invalid conversion limit: " + value);
+      }
+      return Math.min(value, 0x7fffffff) | 0;
+    };
+    return [limit(options.depth), limit(options.maxSize)];
+  };
+  // clang-format on
+
+  return 0;
+});
+
+static int
+_python2js_init_converter(BuiltinConverter* entry)
+{
+  entry->capsule = PyCapsule_New((void*)entry->converter, NULL, NULL);
+  return entry->capsule == NULL;
+}
+
+// Functions added to the pyodide module
+static PyMethodDef python2js_module_methods[] = {
+  { "_python2js_clear_converter_cache",
+    _python2js_clear_converter_cache,
+    METH_NOARGS,
+    "Clears the cache of converters by type. Used by register_converter." },
+  { "_python2js_set_typed_array_threshold",
+    _python2js_set_typed_array_threshold,
+    METH_O,
+    "Sets the typed array threshold. Used by set_typed_array_threshold." },
+  { "_python2js_set_error_logging",
+    _python2js_set_error_logging,
+    METH_O,
+    "Sets whether errors are logged. Used by set_error_logging." },
+  { NULL }
+};
+
 int
 python2js_init()
 {
-  return 0;
+  for (BuiltinConverter* entry = builtin_converters; entry->tp_name != NULL;
+       ++entry) {
+    if (_python2js_init_converter(entry)) {
+      return 1;
+    }
+  }
+  if (_python2js_init_converter(&buffer_view_converter) ||
+      _python2js_init_converter(&builtin_subclass_converter) ||
+      _python2js_init_converter(&buffer_copy_converter)) {
+    return 1;
+  }
+
+  PyObject* m = PyImport_ImportModule("pyodide");
+  if (m == NULL) {
+    return 1;
+  }
+
+  // Replaces the placeholders for these functions in pyodide.py
+  if (PyModule_AddFunctions(m, python2js_module_methods)) {
+    Py_DECREF(m);
+    return 1;
+  }
+
+  converters = PyObject_GetAttrString(m, "_python2js_converters");
+  PyObject* buffer_copy_type = PyObject_GetAttrString(m, "BufferCopy");
+  Py_DECREF(m);
+  if (converters == NULL || buffer_copy_type == NULL) {
+    return 1;
+  }
+
+  _pointer_map_init(&converter_cache);
+  converter_cache_refs = PyDict_New();
+  converter_cache_evict = PyCFunction_New(&evict_converter_def, NULL);
+  if (converter_cache_refs == NULL || converter_cache_evict == NULL) {
+    Py_DECREF(buffer_copy_type);
+    return 1;
+  }
+
+  PyObject* capsule = buffer_copy_converter.capsule;
+  int failed = PyDict_SetItem(converters, buffer_copy_type, capsule);
+  Py_DECREF(buffer_copy_type);
+  if (failed) {
+    return 1;
+  }
+
+  return python2js_init_js();
 }
@@ -20,6 +20,20 @@ pythonexc2js();
 int
 python2js(PyObject* x);
 
+/** Convert a Python object to a Javascript object, passing lists and dicts
+ *  as proxies rather than converting them under the given policy.
+ *  \param The Python object
+ *  \param max_depth Lists and dicts nested this many levels deep are passed
+ *     as proxies. 0 passes a top-level list or dict as a proxy, -1 converts
+ *     everything.
+ *  \param max_size Lists and dicts with more items than this are passed as
+ *     proxies. -1 for no limit.
+ *  \return The Javascript object -- might be an Error object in the case of an
+ *     exception.
+ */
+int
+python2js_with_policy(PyObject* x, int max_depth, int max_size);
+
 /** Set up the global state for this module.
  */
 int
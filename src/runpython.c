@@ -12,7 +12,7 @@ extern PyObject* globals;
 PyObject* eval_code;
 
 int
-_runPython(char* code)
+_runPython(char* code, int max_depth, int max_size)
 {
   PyObject* py_code;
   py_code = PyUnicode_FromString(code);
@@ -27,16 +27,19 @@ _runPython(char* code)
     return pythonexc2js();
   }
 
-  int id = python2js(ret);
+  int id = python2js_with_policy(ret, max_depth, max_size);
   Py_DECREF(ret);
   return id;
 }
 
 EM_JS(int, runpython_init_js, (), {
-  Module.runPython = function(code)
+  Module.runPython = function(code, options)
   {
-    var pycode = allocate(intArrayFromString(code), 'i8', ALLOC_NORMAL);
-    var idresult = Module.__runPython(pycode);
+    var policy = Module.python2js_policy(options);
+    var length = lengthBytesUTF8(code) + 1;
+    var pycode = _malloc(length);
+    stringToUTF8(code, pycode, length);
+    var idresult = Module.__runPython(pycode, policy[0], policy[1]);
     jsresult = Module.hiwire_get_value(idresult);
     Module.hiwire_decref(idresult);
     _free(pycode);
@@ -0,0 +1,113 @@
+/**
+ * The entry point for running pyodide in a web worker. It is driven by the
+ * `PyodideWorker` client in webworker_client.js, through messages of the form
+ * `{id, type, args}`, and replies with `{id, result}` or `{id, error}`.
+ */
+
+// Pyodide is loaded when the first message arrives, so that an `init` message
+// can pass in a WebAssembly module that was already compiled, by another
+// worker of a PyodideWorkerPool.
+let loaded = undefined;
+let load = (wasmModule) => {
+  if (loaded === undefined) {
+    self.pyodideWasmModule = wasmModule;
+    importScripts('{{DEPLOY}}pyodide.js');
+    loaded = languagePluginLoader;
+  }
+  return loaded;
+};
+
+// Typed arrays that view the WebAssembly memory, such as those converted from
+// bytes and Numpy arrays, are copied, since that memory can't be transferred.
+// The buffers of those copies are then transferred, rather than copied again,
+// to the main thread. Other typed arrays and ArrayBuffers may still be used by
+// the worker, so they are cloned as usual.
+let prepareResult = (value, transfer, seen) => {
+  if (value === null || typeof value !== 'object') {
+    if (typeof value === 'function') {
+      throw new Error('Python objects that are not converted to Javascript ' +
+                      'can not be sent to the main thread');
+    }
+    return value;
+  }
+  if (seen.has(value)) {
+    return seen.get(value);
+  }
+  let proto = Object.getPrototypeOf(value);
+
+  let result = value;
+  if (ArrayBuffer.isView(value)) {
+    if (value.buffer === pyodide._module.HEAPU8.buffer) {
+      result = value.slice();
+      transfer.push(result.buffer);
+    }
+    seen.set(value, result);
+  } else if (Array.isArray(value)) {
+    result = [];
+    seen.set(value, result);
+    for (let item of value) {
+      result.push(prepareResult(item, transfer, seen));
+    }
+  } else if (proto === Object.prototype || proto === null) {
+    result = {};
+    seen.set(value, result);
+    for (let key of Object.keys(value)) {
+      result[key] = prepareResult(value[key], transfer, seen);
+    }
+  }
+  return result;
+};
+
+let handlers = {
+  runPython : (args) => {
+    // The globals are made available to Python with `from js import ...`
+    Object.assign(self, args.globals);
+    return pyodide.runPython(args.code);
+  },
+  loadPackage : (args) => pyodide.loadPackage(args.names),
+  init : (args) => undefined,
+  wasmModule : (args) => self.pyodideWasmModule,
+  // Runs a call pickled by pyodide.WorkerPoolExecutor, and returns the
+  // pickled result
+  call : (args) => {
+    self.pyodideCall = args.data;
+    try {
+      return pyodide.runPython(
+          'import _pyodide_workers\n_pyodide_workers._worker_call()');
+    } finally {
+      delete self.pyodideCall;
+    }
+  },
+};
+
+let handle = ({id, type, args}) => {
+  let wasmModule = type === 'init' ? args.wasmModule : undefined;
+  return Promise.resolve()
+      .then(() => load(wasmModule))
+      .then(() => handlers[type](args))
+      .then((result) => {
+        let transfer = [];
+        result = prepareResult(result, transfer, new Map());
+        self.postMessage({id : id, result : result}, transfer);
+      })
+      .catch((error) => {
+        self.postMessage({
+          id : id,
+          error : {
+            name : error.name,
+            message : error.message !== undefined ? error.message
+                                                  : String(error),
+            stack : error.stack,
+            pythonType : error.pythonType,
+            pythonMessage : error.pythonMessage,
+          }
+        });
+      });
+};
+
+// Messages are handled one at a time, in the order they arrive, so that a
+// message only starts once the packages loaded and the code run by the
+// messages before it are done.
+let queue = Promise.resolve();
+
+self.onmessage = (event) => { queue = queue.then(() => handle(event.data)); };
@@ -0,0 +1,135 @@
+/**
+ * A client for running pyodide in a web worker from the main thread, so that
+ * long computations don't block the page. See
+ * docs/using_pyodide_from_javascript.md.
+ */
+
+class PyodideWorker {
+  // `wasmModule` is an optional WebAssembly module for pyodide, compiled
+  // beforehand, which saves the worker from compiling it again.
+  constructor(url = 'webworker.js', wasmModule = undefined) {
+    this._worker = new Worker(url);
+    this._pending = new Map();
+    this._nextId = 0;
+    this._worker.onmessage = (event) => { this._receive(event.data); };
+    this._worker.onerror = (event) => {
+      this._rejectAll(new Error(`Error in pyodide worker: ${event.message}`));
+    };
+    if (wasmModule !== undefined) {
+      this._send('init', {wasmModule : wasmModule});
+    }
+  }
+
+  // Runs Python code in the worker, and returns a promise of its result.
+  // The properties of `globals` are set as globals of the worker beforehand,
+  // for Python to import from the `js` module. The ArrayBuffers listed in
+  // `transfer` are moved to the worker rather than copied.
+  runPython(code, globals = {}, transfer = []) {
+    return this._send('runPython', {code : code, globals : globals}, transfer);
+  }
+
+  loadPackage(names) { return this._send('loadPackage', {names : names}); }
+
+  terminate() {
+    this._worker.terminate();
+    this._rejectAll(new Error('The pyodide worker was terminated'));
+  }
+
+  _send(type, args, transfer = []) {
+    let id = this._nextId++;
+    return new Promise((resolve, reject) => {
+      this._pending.set(id, {resolve : resolve, reject : reject});
+      this._worker.postMessage({id : id, type : type, args : args}, transfer);
+    });
+  }
+
+  _receive(data) {
+    let pending = this._pending.get(data.id);
+    this._pending.delete(data.id);
+    if (data.error === undefined) {
+      pending.resolve(data.result);
+    } else {
+      let error = new Error(data.error.message);
+      Object.assign(error, data.error);
+      pending.reject(error);
+    }
+  }
+
+  _rejectAll(error) {
+    for (let pending of this._pending.values()) {
+      pending.reject(error);
+    }
+    this._pending.clear();
+  }
+}
+
+/**
+ * A pool of pyodide web workers, each with its own Python interpreter, for
+ * running Python code in parallel. Each call is sent to the worker with the
+ * fewest calls in progress.
+ */
+class PyodideWorkerPool {
+  constructor(size = navigator.hardwareConcurrency || 4, url = 'webworker.js') {
+    let first = new PyodideWorker(url);
+    this._workers = [ first ];
+    // The other workers are started with the WebAssembly module compiled by
+    // the first one. The package data comes from the browser cache.
+    this._started = first._send('wasmModule', {}).then((wasmModule) => {
+      for (let i = 1; i < size; ++i) {
+        this._workers.push(new PyodideWorker(url, wasmModule));
+      }
+    });
+  }
+
+  get size() { return this._workers.length; }
+
+  runPython(code, globals = {}, transfer = []) {
+    return this._dispatch((worker) =>
+                              worker.runPython(code, globals, transfer));
+  }
+
+  // Runs a call pickled by pyodide.WorkerPoolExecutor, given as a typed array
+  // whose buffer is transferred to the worker
+  call(data) {
+    return this._dispatch(
+        (worker) => worker._send('call', {data : data}, [ data.buffer ]));
+  }
+
+  // Runs code in every worker, for example to define functions or import
+  // modules that later calls use. It runs before any later call.
+  runPythonOnAll(code) {
+    return this._started.then(() => {
+      return Promise.all(this._workers.map((w) => w.runPython(code)));
+    });
+  }
+
+  loadPackageOnAll(names) {
+    return this._started.then(() => {
+      return Promise.all(this._workers.map((w) => w.loadPackage(names)));
+    });
+  }
+
+  terminate() {
+    return this._started.then(() => {
+      for (let worker of this._workers) {
+        worker.terminate();
+      }
+    });
+  }
+
+  _dispatch(send) {
+    return this._started.then(() => {
+      let worker = this._workers[0];
+      for (let other of this._workers) {
+        if (other._pending.size < worker._pending.size) {
+          worker = other;
+        }
+      }
+      return send(worker);
+    });
+  }
+}
+
+// Classes are not properties of the global object, which Python imports from
+self.PyodideWorker = PyodideWorker;
+self.PyodideWorkerPool = PyodideWorkerPool;
@@ -3,6 +3,7 @@ Various common utilities for testing.
 """
 
 import contextlib
+import io
 import multiprocessing
 import textwrap
 import tempfile
@@ -268,6 +269,34 @@ def run_web_server(q, log_filepath):
                 return True
             return False
 
+        def send_head(self):
+            # Serves single byte ranges of static files, for HttpRangeFile
+            byte_range = self.headers.get('Range', '')
+            if not byte_range.startswith('bytes=') or self.is_cgi():
+                return super(Handler, self).send_head()
+            path = self.translate_path(self.path)
+            try:
+                f = open(path, 'rb')
+            except OSError:
+                self.send_error(404, "File not found")
+                return None
+            with f:
+                size = os.fstat(f.fileno()).st_size
+                start, _, end = byte_range[6:].partition('-')
+                start = int(start)
+                end = min(int(end), size - 1) if end else size - 1
+                if start >= size:
+                    self.send_error(416, "Range not satisfiable")
+                    return None
+                f.seek(start)
+                data = f.read(end - start + 1)
+            self.send_response(206)
+            self.send_header('Content-Type', self.guess_type(str(path)))
+            self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            return io.BytesIO(data)
+
         def log_message(self, format_, *args):
             print("[%s] source: %s:%s - %s"
                   % (self.log_date_time_string(),
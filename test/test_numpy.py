@@ -2,10 +2,15 @@ def test_numpy(selenium):
     selenium.load_package("numpy")
     selenium.run("import numpy")
     x = selenium.run("numpy.zeros((32, 64))")
-    assert len(x) == 32
-    assert all(len(y) == 64 for y in x)
-    for y in x:
-        assert all(z == 0 for z in y)
+    assert len(x) == 32 * 64
+    assert all(z == 0 for z in x)
+    assert selenium.run_js(
+        """
+        let x = pyodide.runPython("numpy.zeros((32, 64))");
+        return ((x instanceof Float64Array) &&
+                (x.shape[0] === 32) && (x.shape[1] === 64) &&
+                (x.strides[0] === 64) && (x.strides[1] === 1));
+        """)
 
 
 def test_typed_arrays(selenium):
@@ -29,3 +34,100 @@ def test_typed_arrays(selenium):
             'npyarray = numpy.asarray(array)\n'
             f'npyarray.dtype.name == "{npytype}" '
             'and npyarray == [1, 2, 3, 4]')
+
+
+def test_python2js_numpy_dtype(selenium):
+    selenium.load_package("numpy")
+    selenium.run("import numpy")
+    for (npytype, jstype) in (
+            ('int8', 'Int8Array'),
+            ('uint8', 'Uint8Array'),
+            ('int16', 'Int16Array'),
+            ('uint16', 'Uint16Array'),
+            ('int32', 'Int32Array'),
+            ('uint32', 'Uint32Array'),
+            ('float32', 'Float32Array'),
+            ('float64', 'Float64Array')):
+        print(npytype, jstype)
+        assert selenium.run_js(
+            f"""
+            let x = pyodide.runPython(
+                "numpy.arange(6, dtype='{npytype}').reshape((2, 3))");
+            return ((x instanceof {jstype}) &&
+                    (x.length === 6) && (x[5] == 5) &&
+                    (x.shape.join() === '2,3'));
+            """)
+    # Non-contiguous arrays, and data types without a TypedArray equivalent,
+    # are still converted to nested Arrays
+    assert selenium.run(
+        "numpy.arange(6).reshape((2, 3)).T.astype('float64')"
+    ) == [[0, 3], [1, 4], [2, 5]]
+    assert selenium.run(
+        "numpy.array(['a', 'b'])") == ['a', 'b']
+
+
+def test_python2js_numpy_subclass(selenium):
+    selenium.load_package("numpy")
+    selenium.run(
+        """
+        import numpy
+        class Sub(numpy.ndarray):
+          pass
+        """)
+    # Subclasses of ndarray are copied like ndarray, rather than viewing the
+    # WebAssembly memory as other buffers do
+    for expr in ("numpy.arange(6.0).reshape((2, 3)).view(Sub)",
+                 "numpy.matrix([[0.0, 1, 2], [3, 4, 5]])"):
+        assert selenium.run_js(
+            f"""
+            let x = pyodide.runPython("{expr}");
+            return ((x instanceof Float64Array) &&
+                    (x.buffer !== pyodide._module.HEAPU8.buffer) &&
+                    (x[5] === 5) && (x.shape.join() === '2,3'));
+            """)
+
+
+def test_as_nparray(selenium):
+    selenium.load_package("numpy")
+    selenium.run("import numpy")
+    selenium.run("import pyodide")
+    selenium.run_js(
+        """
+        let buffer = new Float32Array([0, 1, 2, 3, 4, 5, 6, 7]);
+        window.array = buffer.subarray(2);
+        window.array.shape = [2, 3];
+        """)
+    assert selenium.run(
+        """
+        from js import array
+        x = pyodide.as_nparray(array)
+        (x.dtype.name == 'float32' and x.shape == (2, 3)
+         and x.tolist() == [[2, 3, 4], [5, 6, 7]])
+        """)
+    selenium.run(
+        """
+        x[1, 2] = 42
+        pyodide.sync(x)
+        """)
+    assert selenium.run_js("return window.array[5] === 42")
+    # Shapes and strides round trip through Javascript
+    assert selenium.run(
+        """
+        y = numpy.arange(6, dtype='int32').reshape((2, 3))
+        from js import window
+        window.y = y
+        z = pyodide.as_nparray(window.y)
+        z.shape == (2, 3) and (z == y).all()
+        """)
+    selenium.run_js("window.array.strides = [1, 100]")
+    assert selenium.run(
+        """
+        try:
+            from js import array
+            pyodide.as_nparray(array)
+        except BufferError:
+            result = True
+        else:
+            result = False
+        result
+        """)
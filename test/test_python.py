@@ -36,6 +36,8 @@ def test_python2js(selenium):
         'return pyodide.runPython("\'ιωδιούχο\'") === "ιωδιούχο"')
     assert selenium.run_js(
         'return pyodide.runPython("\'碘化物\'") === "碘化物"')
+    assert selenium.run_js(
+        'return pyodide.runPython("\'🐍\'") === "🐍"')
     assert selenium.run_js(
         'let x = pyodide.runPython("b\'bytes\'");\n'
         'return (x instanceof window.Uint8ClampedArray) && '
@@ -59,6 +61,161 @@ def test_python2js(selenium):
         """)
 
 
+def test_python2js_long_strings(selenium):
+    # Long enough to be converted in several chunks
+    for char in ('a', 'ι', '碘', '🐍'):
+        selenium.run(f"x = '{char}' * 100000 + '!'")
+        assert selenium.run_js(
+            f"""
+            let x = pyodide.runPython('x');
+            return x === '{char}'.repeat(100000) + '!';
+            """)
+        selenium.run_js(f"window.y = '{char}'.repeat(100000) + '!';")
+        assert selenium.run(
+            """
+            from js import y
+            y == x
+            """)
+
+
+def test_python2js_buffer(selenium):
+    selenium.run("import array")
+    selenium.run("import pyodide")
+    selenium.run("x = array.array('d', [1.5, 2.5, 3.5])")
+    selenium.run("y = bytearray(b'abc')")
+    assert selenium.run_js(
+        """
+        let x = pyodide.runPython("x");
+        let y = pyodide.runPython("y");
+        let z = pyodide.runPython("memoryview(y).cast('B', (1, 3))");
+        return ((x instanceof Float64Array) && (x[2] === 3.5) &&
+                (x.buffer === pyodide._module.HEAPU8.buffer) &&
+                (y instanceof Uint8Array) && (y[0] === 97) &&
+                (z.shape[0] === 1) && (z.shape[1] === 3));
+        """)
+    assert selenium.run_js(
+        """
+        let x = pyodide.runPython("x");
+        x[0] = 4.5;
+        let c = pyodide.runPython("pyodide.BufferCopy(x)");
+        c[1] = 0;
+        return ((c instanceof Float64Array) &&
+                (c.buffer !== pyodide._module.HEAPU8.buffer) &&
+                (pyodide.runPython("x[0]") === 4.5) &&
+                (pyodide.runPython("x[1]") === 2.5));
+        """)
+
+
+def test_python2js_homogeneous_list(selenium):
+    selenium.run("import pyodide")
+    assert selenium.run_js(
+        """
+        let x = pyodide.runPython("[float(i) for i in range(5000)]");
+        let y = pyodide.runPython("list(range(5000))");
+        let z = pyodide.runPython("[1.5] * 4999 + [1]");
+        return ((x instanceof Float64Array) && (x[4999] === 4999) &&
+                (y instanceof Int32Array) && (y[4999] === 4999) &&
+                (z instanceof Array));
+        """)
+    assert selenium.run_js(
+        """
+        let x = pyodide.runPython("[2 ** 40] * 5000");
+        return (x instanceof Array);
+        """)
+    selenium.run("pyodide.set_typed_array_threshold(1)")
+    try:
+        assert selenium.run_js(
+            """
+            let x = pyodide.runPython("[1.5, 2.5]");
+            let y = pyodide.runPython("[True, False]");
+            return ((x instanceof Float64Array) && (x[1] === 2.5) &&
+                    (y instanceof Array));
+            """)
+        selenium.run("pyodide.set_typed_array_threshold(0)")
+        assert selenium.run_js(
+            """
+            let x = pyodide.runPython("[1.5] * 5000");
+            return (x instanceof Array);
+            """)
+    finally:
+        selenium.run("pyodide.set_typed_array_threshold(4096)")
+    assert selenium.run_js(
+        "return pyodide.runPython('[1.5, 2.5]') instanceof Array")
+
+
+def test_python2js_dict(selenium):
+    assert selenium.run(
+        "[{'x': i, 'y': str(i)} for i in range(3)]"
+    ) == [{'x': 0, 'y': '0'}, {'x': 1, 'y': '1'}, {'x': 2, 'y': '2'}]
+    assert selenium.run(
+        "{str(i): i for i in range(100)}") == {str(i): i for i in range(100)}
+    assert selenium.run_js(
+        """
+        let x = pyodide.runPython("x = {'a': 1}; x['self'] = x; x");
+        return (x.a === 1) && (x.self === x);
+        """)
+
+
+def test_register_converter(selenium):
+    selenium.run(
+        """
+        import pyodide
+        class Point:
+          def __init__(self, x, y):
+            self.x = x
+            self.y = y
+        class Point3D(Point):
+          pass
+        pyodide.register_converter(Point, lambda p: [p.x, p.y])
+        """)
+    assert selenium.run("Point(1, 2)") == [1, 2]
+    assert selenium.run("Point3D(3, 4)") == [3, 4]
+    assert selenium.run("{'a': Point(5, 6)}") == {'a': [5, 6]}
+    selenium.run("pyodide.register_converter(Point, lambda p: p)")
+    assert selenium.run_js(
+        "return pyodide.runPython('Point(1, 2)').x === 1")
+
+    # Converters for subclasses of built-in types take precedence
+    selenium.run(
+        """
+        class Record(dict):
+          pass
+        class Count(int):
+          pass
+        pyodide.register_converter(Record, lambda r: sorted(r))
+        """)
+    assert selenium.run("Record(b=1, a=2)") == ['a', 'b']
+    assert selenium.run("Count(3)") == 3
+    assert selenium.run("{'a': 1}") == {'a': 1}
+
+    # A converter returning an instance of its own type would never finish
+    selenium.run("pyodide.register_converter(Point, lambda p: Point(0, 0))")
+    assert selenium.run_js(
+        """
+        try {
+          pyodide.runPython('Point(1, 2)');
+        } catch (e) {
+          return e.message.includes('same type');
+        }
+        return false;
+        """)
+    selenium.run("pyodide.register_converter(Point, lambda p: p)")
+
+    # The converter cache doesn't keep the classes it has seen alive
+    assert selenium.run(
+        """
+        import gc, weakref
+        from js import window
+        class Temporary(int):
+          pass
+        window.temporary = Temporary(1)
+        ref = weakref.ref(Temporary)
+        del Temporary
+        gc.collect()
+        ref() is None
+        """)
+
+
 def test_pythonexc2js(selenium):
     try:
         selenium.run_js('return pyodide.runPython("5 / 0")')
@@ -68,6 +225,72 @@ def test_pythonexc2js(selenium):
         assert False, 'Expected exception'
 
 
+def test_python_error(selenium):
+    selenium.run(
+        """
+        def f():
+            raise ValueError('bad value')
+        """)
+    assert selenium.run_js(
+        """
+        try {
+          pyodide.runPython('f()');
+        } catch (e) {
+          return (e instanceof Error && e.name === 'PythonError' &&
+                  e.pythonType === 'ValueError' &&
+                  e.pythonMessage === 'bad value' &&
+                  e.frames[e.frames.length - 1].name === 'f' &&
+                  e.message.startsWith('Traceback (most recent call last):') &&
+                  e.message.endsWith('ValueError: bad value') &&
+                  e.stack.includes('ValueError: bad value'));
+        }
+        return false;
+        """)
+
+
+def test_error_logging(selenium):
+    selenium.run(
+        """
+        import pyodide
+        def f():
+            raise ValueError('bad value')
+        """)
+    raise_error = (
+        """
+        try {
+          pyodide.runPython('f()');
+        } catch (e) {
+        }
+        """)
+    selenium.clean_logs()
+    selenium.run_js(raise_error)
+    assert 'Python exception' not in selenium.logs
+    selenium.run("pyodide.set_error_logging(True)")
+    try:
+        selenium.run_js(raise_error)
+        assert 'Python exception' in selenium.logs
+        assert 'ValueError: bad value' in selenium.logs
+    finally:
+        selenium.run("pyodide.set_error_logging(False)")
+    selenium.clean_logs()
+
+
+def test_code_cache(selenium):
+    selenium.run(
+        """
+        import pyodide
+        pyodide.set_code_cache_size(2)
+        """)
+    assert selenium.run("pyodide.code_cache_info()") == [0, 1, 2, 1]
+    for i in range(3):
+        assert selenium.run("x = 1\nx + 1") == 2
+    assert selenium.run("pyodide.code_cache_info()") == [3, 2, 2, 2]
+    selenium.run("y = 1")
+    selenium.run("z = 1")
+    assert selenium.run("pyodide.code_cache_info().currsize") == 2
+    selenium.run("pyodide.set_code_cache_size(128)")
+
+
 def test_js2python(selenium):
     selenium.run_js(
         """
@@ -161,10 +384,121 @@ def test_typed_arrays(selenium, wasm_heap, jstype, pytype):
          ((array.format == "{pytype}")
           and array.tolist() == [1, 2, 3, 4]
           and array.tobytes() == expected
-          and array.obj._has_bytes() is {not wasm_heap})
+          and array.obj._has_bytes() is {not wasm_heap}
+          and array.readonly is {not wasm_heap})
          """)
 
 
+def test_jsproxy_buffer_write_back(selenium):
+    selenium.run_js("window.array = new Float32Array([1, 2, 3]);")
+    selenium.run(
+        """
+        import pyodide
+        from js import array
+        view = pyodide.writable_view(array)
+        view[0] = 10
+        """)
+    # Written back when the last writable view is released
+    assert selenium.run_js("return window.array[0]") == 1
+    selenium.run("del view")
+    assert selenium.run_js("return window.array[0]") == 10
+    selenium.run("del array")
+
+    selenium.run("from js import array\nx = pyodide.writable_view(array)")
+    selenium.run_js("window.array[1] = 20;")
+    # The copy isn't replaced while x still uses it...
+    assert selenium.run("from js import array\narray[1]") == 2
+    # ...unless the typed array has been marked as changed
+    selenium.run_js("pyodide.markDirty(window.array);")
+    assert selenium.run("from js import array\narray[1]") == 20
+    assert selenium.run("x[1]") == 20
+    selenium.run("x[2] = 30\npyodide.sync(x)")
+    assert selenium.run_js("return window.array[2]") == 30
+    selenium.run("del x, array")
+
+
+def test_jsproxy_buffer_read_only(selenium):
+    selenium.run_js("window.array = new Float32Array([1, 2, 3]);")
+    # Typed arrays that are copied are passed to Python as read-only views,
+    # which are never written back
+    assert selenium.run("from js import array\narray.readonly")
+    selenium.run_js("window.array[0] = 5;")
+    selenium.run("del array")
+    assert selenium.run_js("return window.array[0]") == 5
+
+
+def test_conversion_policy(selenium):
+    selenium.run(
+        "x = {'a': [1, [2, 3]], 'b': {'c': 'd'}, 'e': list(range(10))}")
+    assert selenium.run_js(
+        """
+        let deep = pyodide.runPython('x', 'deep');
+        let shallow = pyodide.runPython('x', 'shallow');
+        let proxy = pyodide.pyimport('x', 'proxy');
+        let sized = pyodide.runPython('x', {maxSize: 5});
+        return (Array.isArray(deep.a[1]) &&
+                !Array.isArray(shallow.e) && !Array.isArray(shallow.a) &&
+                shallow.a[1][0] === 2 && shallow.a.length === 2 &&
+                Array.isArray(proxy.a) && !Array.isArray(proxy.a[1]) &&
+                proxy.b.c === 'd' &&
+                Array.isArray(sized.a) && !Array.isArray(sized.e) &&
+                sized.e[9] === 9 && sized.e[10] === undefined);
+        """)
+    assert selenium.run_js(
+        """
+        let x = pyodide.runPython('x', {depth: 1, maxSize: 100});
+        return Array.isArray(x.e) && !Array.isArray(x.a);
+        """)
+    assert selenium.run_js(
+        """
+        let x = pyodide.runPython('x', 'shallow');
+        let keys = Reflect.ownKeys(x.b);
+        return ('c' in x.b && !('d' in x.b) && '1' in x.e && 'length' in x.e &&
+                !('10' in x.e) && keys.includes('c') && !keys.includes('d') &&
+                Reflect.ownKeys(x.e).includes('9') &&
+                [...x.e].join() === '0,1,2,3,4,5,6,7,8,9');
+        """)
+    # The items of proxies are converted under the rest of the policy
+    selenium.run(
+        """
+        e = [[[1]]]
+        y = {'big': [e] * 4, 'small': [e], 'wide': [list(range(5))] * 4}
+        """)
+    assert selenium.run_js(
+        """
+        let y = pyodide.runPython('y', {depth: 4, maxSize: 3});
+        return (Array.isArray(y.small[0][0]) &&
+                !Array.isArray(y.small[0][0][0]) &&
+                !Array.isArray(y.big) && Array.isArray(y.big[0][0]) &&
+                !Array.isArray(y.big[0][0][0]) && y.big[0][0][0][0] === 1 &&
+                !Array.isArray(y.wide[0]) && y.wide[0][4] === 4);
+        """)
+    assert selenium.run_js(
+        """
+        try {
+          pyodide.runPython('x', 'lazy');
+        } catch (e) {
+          return e instanceof TypeError;
+        }
+        return false;
+        """)
+
+
+def test_hiwire_stats(selenium):
+    selenium.run("x = {'a': [1, 2, 3]}")
+    before = selenium.run_js("return pyodide.hiwireStats()")
+    selenium.run_js(
+        """
+        for (let i = 0; i < 100; ++i) {
+          pyodide.runPython('x');
+        }
+        """)
+    after = selenium.run_js("return pyodide.hiwireStats()")
+    assert after['live'] == before['live']
+    assert after['highWaterMark'] >= after['live']
+    assert after['capacity'] >= after['highWaterMark']
+
+
 def test_import_js(selenium):
     result = selenium.run(
         """
@@ -188,6 +522,7 @@ def test_pyproxy(selenium):
     assert selenium.run_js("return pyodide.pyimport('f').get_value(2)") == 128
     assert selenium.run_js("return pyodide.pyimport('f').bar") == 42
     assert selenium.run_js("return ('bar' in pyodide.pyimport('f'))")
+    assert not selenium.run_js("return ('qux' in pyodide.pyimport('f'))")
     selenium.run_js("f = pyodide.pyimport('f'); f.baz = 32")
     assert selenium.run("f.baz") == 32
     assert set(selenium.run_js(
@@ -206,6 +541,62 @@ def test_pyproxy(selenium):
         "return pyodide.pyimport('f').toString()").startswith('<Foo')
 
 
+def test_pyproxy_call(selenium):
+    selenium.run(
+        """
+        calls = []
+        def f(*args, **kwargs):
+            calls.append((args, kwargs))
+            return len(calls)
+        """)
+    assert selenium.run_js(
+        "return pyodide.pyimport('f')(1, 'a', null, true, [2])") == 1
+    assert selenium.run("calls[-1]") == [[1, 'a', None, True, [2]], {}]
+    assert selenium.run_js(
+        "return pyodide.pyimport('f').callKwargs(1, {x: 'y', z: 2})") == 2
+    assert selenium.run("calls[-1]") == [[1], {'x': 'y', 'z': 2}]
+    assert selenium.run_js(
+        "return pyodide.pyimport('f').callVoid(3)") is None
+    assert selenium.run("calls[-1]") == [[3], {}]
+    assert selenium.run_js(
+        """
+        let f = pyodide.pyimport('f');
+        return f.callVoid === f.callVoid && f.callKwargs === f.callKwargs;
+        """)
+    assert selenium.run_js(
+        """
+        try {
+          pyodide.pyimport('f').callKwargs(1, 2);
+        } catch (e) {
+          return e.pythonType;
+        }
+        """) == 'TypeError'
+
+
+def test_pyproxy_key_cache(selenium):
+    selenium.run(
+        """
+        class Foo:
+          bar = 42
+        f = Foo()
+        """)
+    assert selenium.run_js(
+        """
+        let f = pyodide.pyimport('f');
+        let before = pyodide.hiwireStats().live;
+        let total = 0;
+        for (let i = 0; i < 1000; ++i) {
+          total += f.bar;
+          'bar' in f;
+          f['attr' + i] = i;
+        }
+        return (total === 42000 && f.attr999 === 999 &&
+                f[Symbol.iterator] === undefined &&
+                pyodide.hiwireStats().live === before);
+        """)
+    assert selenium.run("f.attr500") == 500
+
+
 def test_pyproxy_destroy(selenium):
     selenium.run(
         """
@@ -230,6 +621,26 @@ def test_pyproxy_destroy(selenium):
         assert False, 'Expected exception'
 
 
+def test_pyproxy_cache(selenium):
+    selenium.run(
+        """
+        class Foo:
+          bar = 42
+        f = Foo()
+        """
+    )
+    assert selenium.run_js(
+        "return pyodide.pyimport('f') === pyodide.pyimport('f')")
+    assert selenium.run_js(
+        """
+        let f = pyodide.pyimport('f');
+        f.destroy();
+        let g = pyodide.pyimport('f');
+        return (f !== g) && (g.bar === 42);
+        """)
+    assert selenium.run("import sys; sys.getrefcount(f)") == 3
+
+
 def test_jsproxy(selenium):
     assert selenium.run(
         """
@@ -293,6 +704,82 @@ def test_jsproxy(selenium):
         """)
 
 
+def test_jsproxy_call_kwargs(selenium):
+    selenium.run_js(
+        """
+        window.f = function() { return Array.from(arguments); };
+        window.obj = { f: window.f };
+        window.Point = function(x, options) {
+          this.x = x;
+          this.y = options.y;
+        };
+        """)
+    assert selenium.run(
+        """
+        from js import f, obj, Point
+        f(1, 'a', b=2, c=[3])
+        """) == [1, 'a', {'b': 2, 'c': [3]}]
+    assert selenium.run("obj.f(*range(20))") == list(range(20))
+    assert selenium.run("f()") == []
+    assert selenium.run("obj.f(x=1)") == [{'x': 1}]
+    assert selenium.run("p = Point.new(1, y=2)\np.x + p.y") == 3
+
+
+def test_jsproxy_method_cache(selenium):
+    selenium.run_js(
+        """
+        window.counter = {
+          count: 0,
+          add: function(a, b) { this.count += a + b; return this.count; }
+        };
+        """)
+    assert selenium.run(
+        """
+        from js import counter
+        for i in range(100):
+            counter.add(i, 1)
+        counter.add is counter.add and counter.count == 5050
+        """)
+    selenium.run_js(
+        "window.counter.add = function() { return 'replaced'; };")
+    assert selenium.run("counter.add(1, 2)") == 'replaced'
+    selenium.run_js("window.counter.add = 42;")
+    assert selenium.run("counter.add") == 42
+
+
+def test_jsproxy_identity(selenium):
+    selenium.run_js(
+        """
+        window.TEST = {};
+        window.getTest = function() { return window.TEST; };
+        """)
+    assert selenium.run(
+        """
+        from js import TEST, getTest
+        TEST is getTest()
+        """)
+    assert selenium.run(
+        """
+        from js import document
+        document.body is document.body
+        """)
+    assert selenium.run(
+        """
+        del TEST
+        from js import TEST
+        TEST is getTest()
+        """)
+    selenium.run_js("pyodide._module.JsProxyCache.enabled = false;")
+    try:
+        assert selenium.run(
+            """
+            from js import TEST
+            TEST is not getTest() and TEST == getTest()
+            """)
+    finally:
+        selenium.run_js("pyodide._module.JsProxyCache.enabled = true;")
+
+
 def test_jsproxy_iter(selenium):
     selenium.run_js(
         """
@@ -312,6 +799,84 @@ def test_jsproxy_iter(selenium):
         "list(ITER)") == [1, 2, 3]
 
 
+def test_jsproxy_iter_chunks(selenium):
+    selenium.run_js(
+        """
+        window.ARRAY = [];
+        for (let i = 0; i < 1000; ++i) {
+          ARRAY.push(i % 2 ? i : String(i));
+        }
+        window.TYPED = new Int16Array([1, 2, 3]);
+        window.MAP = new Map([['a', 1], ['b', 2]]);
+        window.counter = 0;
+        window.GEN = (function*() {
+          while (true) {
+            yield window.counter++;
+          }
+        })();
+        """)
+    assert selenium.run(
+        """
+        from js import ARRAY
+        list(ARRAY) == [i if i % 2 else str(i) for i in range(1000)]
+        """)
+    assert selenium.run("from js import TYPED\nlist(TYPED)") == [1, 2, 3]
+    assert selenium.run(
+        "from js import MAP\n[k for k in MAP.keys()]") == ['a', 'b']
+    selenium.run("import pyodide\npyodide.set_iteration_chunk_size(1)")
+    try:
+        assert selenium.run(
+            """
+            from js import GEN
+            for x in GEN:
+                if x == 4:
+                    break
+            x
+            """) == 4
+        assert selenium.run_js("return window.counter") == 5
+    finally:
+        selenium.run("pyodide.set_iteration_chunk_size(256)")
+
+
+def test_jsproxy_to_py(selenium):
+    selenium.run_js(
+        """
+        window.DATA = {
+          name: 'a',
+          flags: [true, false, null],
+          points: [0, 1, 2, 3, 4, 5, 6, 7.5],
+          nested: {inner: {x: 1}},
+          map: new Map([['k', 'v'], [1, 'one']]),
+          set: new Set(['s', 't']),
+          typed: new Uint8Array([1, 2]),
+        };
+        DATA.self = DATA;
+        DATA.shared = [DATA.nested, DATA.nested];
+        """)
+    selenium.run(
+        """
+        from js import DATA
+        data = DATA.to_py()
+        """)
+    assert selenium.run("data['name']") == 'a'
+    assert selenium.run("data['flags']") == [True, False, None]
+    assert selenium.run("data['points']") == [0, 1, 2, 3, 4, 5, 6, 7.5]
+    assert selenium.run("type(data['points'][0]).__name__") == 'float'
+    assert selenium.run("data['nested']") == {'inner': {'x': 1}}
+    assert selenium.run("data['map'] == {'k': 'v', 1.0: 'one'}")
+    assert selenium.run("data['set'] == {'s', 't'}")
+    assert selenium.run("isinstance(data['typed'], memoryview)")
+    assert selenium.run("data['self'] is data")
+    assert selenium.run("data['shared'][0] is data['nested']")
+    assert selenium.run("data['shared'][1] is data['nested']")
+    assert selenium.run(
+        """
+        shallow = DATA.to_py(depth=1)
+        (type(shallow).__name__, type(shallow['nested']).__name__,
+         shallow['nested'].inner.x)
+        """) == ['dict', 'JsProxy', 1]
+
+
 def test_open_url(selenium):
     assert selenium.run(
         """
@@ -328,6 +893,65 @@ def test_open_url_cgi(selenium):
         """) == 'HELLO\n'
 
 
+def test_fetch_bytes(selenium):
+    selenium.run(
+        """
+        import pyodide
+        task = pyodide.run_async(pyodide.gather(
+            pyodide.fetch_bytes('test/data.txt'),
+            pyodide.open_url_async('test/data.cgi'),
+        ))
+        missing = pyodide.run_async(pyodide.fetch_bytes('test/missing.txt'))
+        """)
+    for i in range(100):
+        if selenium.run("task.done() and missing.done()"):
+            break
+        time.sleep(0.1)
+    assert selenium.run("task.result()[0] == b'HELLO\\n'")
+    assert selenium.run("task.result()[1].read() == b'HELLO\\n'")
+    assert selenium.run("isinstance(missing.exception(), OSError)")
+
+
+def test_http_range_file(selenium):
+    selenium.run(
+        """
+        import pyodide
+        f = pyodide.HttpRangeFile('test/data.txt', block_size=2, max_blocks=2,
+                                  prefetch_blocks=0)
+        """)
+    assert selenium.run("f.size") == 6
+    assert selenium.run("f.seek(3)\nf.read(2) == b'LO'")
+    assert selenium.run("len(f._blocks)") == 2
+    assert selenium.run("f.seek(0)\nf.read() == b'HELLO\\n'")
+    # CGI scripts don't support ranges, so the whole file is downloaded
+    assert selenium.run(
+        """
+        f = pyodide.HttpRangeFile('test/data.cgi', block_size=2)
+        f.seek(1)
+        f.read() == b'ELLO\\n'
+        """)
+    # Every byte value survives the download, including those above 0x7f
+    selenium.run(
+        """
+        expected = bytes(range(256))
+        f = pyodide.HttpRangeFile('test/data.bin', block_size=7, max_blocks=4)
+        """)
+    assert selenium.run("f.size") == 256
+    assert selenium.run("f.read() == expected")
+    for start, length in ((0, 256), (120, 16), (127, 2), (250, 10), (255, 1)):
+        assert selenium.run(
+            f"""
+            f.seek({start})
+            f.read({length}) == expected[{start}:{start} + {length}]
+            """)
+    assert selenium.run(
+        """
+        buffer = bytearray(20)
+        f.seek(200)
+        f.readinto(buffer) == 20 and buffer == expected[200:220]
+        """)
+
+
 def test_run_core_python_test(python_test, selenium, request):
 
     name, error_flags = python_test
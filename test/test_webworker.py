@@ -0,0 +1,138 @@
+def wait_for(selenium, code):
+    # Runs a Javascript snippet that returns a promise, and waits for it to
+    # settle, storing its result in `window.result` or `window.error`
+    selenium.run_js(
+        f"""
+        window.done = false;
+        window.result = window.error = undefined;
+        Promise.resolve().then(() => {{ {code} }})
+          .then((result) => {{ window.result = result; }})
+          .catch((error) => {{ window.error = error; }})
+          .finally(() => {{ window.done = true; }});
+        """)
+    selenium.wait_until_packages_loaded()
+
+
+def load_client(selenium):
+    selenium.run_js(
+        """
+        window.done = self.PyodideWorkerPool !== undefined;
+        if (!window.done) {
+          let script = document.createElement('script');
+          script.src = 'webworker_client.js';
+          script.onload = () => { window.done = true; };
+          document.head.appendChild(script);
+        }
+        """)
+    selenium.wait_until_packages_loaded()
+
+
+def test_webworker(selenium):
+    load_client(selenium)
+    selenium.run_js("window.worker = new PyodideWorker('webworker_dev.js')")
+
+    wait_for(selenium, "return worker.runPython('1 + 2')")
+    assert selenium.run_js("return window.result") == 3
+
+    # Globals are passed in, and typed arrays on the WebAssembly heap are
+    # copied and transferred out
+    wait_for(
+        selenium,
+        """
+        let buffer = new Float64Array([1, 2, 3]).buffer;
+        return worker.runPython(
+          'from js import data\\n' +
+          'import struct\\n' +
+          'x = [v * 2 for v in struct.unpack("3d", data)]\\n' +
+          'x = struct.pack("3d", *x)\\n' +
+          'x',
+          {data: buffer}, [buffer]);
+        """)
+    assert selenium.run_js(
+        "return Array.from(new Float64Array(window.result.buffer))"
+    ) == [2, 4, 6]
+
+    # Typed arrays the worker keeps using are cloned rather than transferred,
+    # so returning one twice gives the same data
+    wait_for(
+        selenium,
+        """
+        return worker.runPython(
+          'from js import holder\\nholder',
+          {holder: {data: new Float64Array([1, 2, 3])}});
+        """)
+    assert selenium.run_js("return Array.from(window.result.data)") == [
+        1, 2, 3]
+    wait_for(
+        selenium, "return worker.runPython('from js import holder\\nholder')")
+    assert selenium.run_js("return Array.from(window.result.data)") == [
+        1, 2, 3]
+
+    wait_for(selenium, "return worker.runPython('1 / 0')")
+    assert selenium.run_js(
+        "return window.error.pythonType") == 'ZeroDivisionError'
+
+    wait_for(selenium, "return worker.loadPackage('pyparsing')")
+    wait_for(
+        selenium, "return worker.runPython('import pyparsing\\nTrue')")
+    assert selenium.run_js("return window.result") is True
+    selenium.run_js("worker.terminate()")
+
+
+def test_worker_pool_executor(selenium):
+    load_client(selenium)
+
+    selenium.run(
+        """
+        import pyodide
+        setup = 'def square(x):\\n    return x * x\\n'
+        exec(setup)
+        executor = pyodide.WorkerPoolExecutor(2, url='webworker_dev.js',
+                                              setup=setup)
+        squares = pyodide.run_async(
+            executor.map_async(square, range(10), chunksize=3))
+        error = executor.submit(divmod, 1, 0)
+        """)
+    wait_for(selenium, "return pyodide.pyimport('error')._promise")
+    assert selenium.run("type(error.exception()).__name__") == (
+        'ZeroDivisionError')
+    wait_for(selenium, "return pyodide.pyimport('squares')._promise")
+    assert selenium.run("squares.result()") == [x * x for x in range(10)]
+    assert selenium.run_js(
+        "return pyodide.pyimport('executor')._pool.size") == 2
+    selenium.run("executor.shutdown()")
+
+
+def test_worker_pool_executor_setup(selenium):
+    load_client(selenium)
+    selenium.load_package('numpy')
+
+    # Calls only run once the packages are loaded and the setup code, which
+    # uses them, has run
+    selenium.run(
+        """
+        import pyodide
+        setup = (
+            'import numpy as np\\n'
+            'def total(n):\\n'
+            '    return int(np.arange(n).sum())\\n')
+        exec(setup)
+        executor = pyodide.WorkerPoolExecutor(
+            2, url='webworker_dev.js', setup=setup, packages=['numpy'])
+        totals = pyodide.run_async(executor.map_async(total, range(6)))
+        """)
+    wait_for(selenium, "return pyodide.pyimport('totals')._promise")
+    assert selenium.run("totals.result()") == [0, 0, 1, 3, 6, 10]
+    selenium.run("executor.shutdown()")
+
+    # Errors in the setup code fail the calls
+    selenium.run(
+        """
+        broken = pyodide.WorkerPoolExecutor(
+            1, url='webworker_dev.js', setup='import not_a_module')
+        error = broken.submit(abs, -1)
+        """)
+    wait_for(selenium, "return pyodide.pyimport('error')._promise")
+    assert selenium.run("type(error.exception()).__name__") == 'RuntimeError'
+    assert 'not_a_module' in selenium.run("str(error.exception())")
+    selenium.run("broken.shutdown()")